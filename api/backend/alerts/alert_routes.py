@@ -1,41 +1,89 @@
+import datetime
+import time
+
 from flask import Blueprint, jsonify, request, current_app
 from backend.db_connection import db
-from mysql.connector import Error
+from backend.common import bulk
+from backend.common.pagination import Keyset
+from backend.common.streaming import stream_rows, wants_stream
+from pymysql import Error
 
 alerts = Blueprint("alerts", __name__)
 
+# Sort key for keyset pagination of get_alerts
+ALERT_KEYSET = Keyset(("a.triggerTime", "a.AlertID"), ("triggerTime", "AlertID"), descending=True)
+
+# Base query of get_alerts; filters and the page clause are appended
+LIST_ALERTS_SQL = """
+SELECT a.AlertID, a.triggerTime, a.Message, a.Status, a.alertRuleID,
+       a.portfolioID, r.Name, r.Severity
+FROM Alert a
+JOIN AlertRule r ON r.alertRuleID = a.alertRuleID
+WHERE 1=1
+"""
+
+INSERT_ALERT_SQL = """
+INSERT INTO Alert (triggerTime, Message, Status, alertRuleID, portfolioID)
+VALUES (%s, %s, %s, %s, %s)
+"""
+# Status of alerts created without one
+DEFAULT_ALERT_STATUS = "Active"
+
 
 @alerts.route("/alerts", methods=["GET"])
 def get_alerts():
-    """Get alerts with optional portfolio and severity filters."""
+    """
+    Get alerts, newest first, with optional portfolio and severity filters.
+
+    Query parameters:
+    - portfolioID (int, optional): Only this portfolio's alerts.
+    - severity (str, optional): Only alerts whose rule has this Severity.
+    - after (str, optional): next_cursor of the previous page.
+    - limit (int, optional): Page size (default 100, at most 1000).
+
+    Returns:
+    - JSON: Alerts with their rule's Name and Severity, and next_cursor.
+    """
     try:
         current_app.logger.info("Starting get_alerts request")
+        try:
+            page = ALERT_KEYSET.page(request.args)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
         cursor = db.get_db().cursor()
 
         portfolio_id = request.args.get("portfolioID")
         severity = request.args.get("severity")
 
-        query = """
-            SELECT alertID, name, alertType, severity, message, portfolioID, createdAt
-            FROM Alert
-            WHERE 1=1
-        """
+        query = LIST_ALERTS_SQL
         params = []
         if portfolio_id:
-            query += " AND portfolioID = %s"
+            query += " AND a.portfolioID = %s"
             params.append(int(portfolio_id))
         if severity:
-            query += " AND severity = %s"
+            query += " AND r.Severity = %s"
             params.append(severity)
 
-        query += " ORDER BY createdAt DESC"
+        if wants_stream():
+            # Whole result set as NDJSON, read through a server-side cursor
+            cursor.close()
+            page_sql, page_params = page.clause(limit=False)
+            return stream_rows(query + page_sql, params + page_params)
+
+        page_sql, page_params = page.clause()
+        query += page_sql
+        params += page_params
         current_app.logger.debug(f"Executing query: {query} with params: {params}")
         cursor.execute(query, params)
-        rows = cursor.fetchall()
+        rows, next_cursor = page.finish(cursor.fetchall())
         cursor.close()
 
         current_app.logger.info(f"Successfully retrieved {len(rows)} alerts")
-        return jsonify({"success": True, "data": rows}), 200
+        return jsonify({"success": True, "data": rows, "next_cursor": next_cursor}), 200
     except Error as e:
         current_app.logger.error(f"Database error in get_alerts: {str(e)}")
         return jsonify({
@@ -95,3 +143,90 @@ def create_alert():
             "status_code": 500
         }), 500
 
+
+def _parse_alert(item):
+    # One item of a create_alerts batch, in Alert's columns
+    bulk.require_fields(item, ("alertRuleID", "Message"))
+    try:
+        alert = {
+            "alertRuleID": int(item["alertRuleID"]),
+            "portfolioID": int(item["portfolioID"]) if item.get("portfolioID") is not None else None,
+            "Message": str(item["Message"]),
+            "Status": str(item.get("Status") or DEFAULT_ALERT_STATUS),
+            "triggerTime": None,
+        }
+    except (TypeError, ValueError):
+        raise ValueError("alertRuleID and portfolioID must be integers")
+    if len(alert["Status"]) > 20:
+        raise ValueError("Status must be at most 20 characters")
+    if item.get("triggerTime"):
+        try:
+            trigger = datetime.datetime.fromisoformat(str(item["triggerTime"]))
+        except ValueError:
+            raise ValueError(f"Invalid triggerTime: {item['triggerTime']}")
+        alert["triggerTime"] = trigger.strftime("%Y-%m-%d %H:%M:%S")
+    return alert
+
+
+@alerts.route("/alerts:bulk", methods=["POST"])
+def create_alerts():
+    """
+    Create many alerts in one transaction.
+
+    Every item is validated before anything is written; one invalid item
+    rejects the whole batch.
+
+    Request body (JSON):
+    - A list of alerts, or {"alerts": [...]}; at most 5000. Each has
+      alertRuleID (int), Message (str), optional portfolioID (int),
+      Status (str, default 'Active') and triggerTime (ISO 8601, default now).
+
+    Returns:
+    - JSON: 201 with one {"index", "alertID"} result per item in request
+      order and the rows written per second, or 400 listing the invalid
+      items by index.
+    """
+    started = time.perf_counter()
+    try:
+        current_app.logger.info("Starting create_alerts request")
+        try:
+            items = bulk.read_items(request.get_json(silent=True), "alerts")
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
+        parsed, errors = bulk.parse_items(items, _parse_alert)
+
+        conn = db.get_db()
+        cursor = conn.cursor()
+        bulk.check_exists(cursor, parsed, errors, "alertRuleID", "AlertRule", "Alert rule")
+        bulk.check_exists(cursor, parsed, errors, "portfolioID", "Portfolio", "Portfolio")
+        if errors:
+            cursor.close()
+            return bulk.invalid(errors, len(items))
+
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [
+            (a["triggerTime"] or now, a["Message"], a["Status"], a["alertRuleID"], a["portfolioID"])
+            for a in parsed
+        ]
+        new_ids = bulk.insert_many(cursor, INSERT_ALERT_SQL, rows)
+        conn.commit()
+        cursor.close()
+
+        current_app.logger.info(f"Successfully created {len(new_ids)} alerts")
+        return bulk.created(
+            "Alerts created successfully",
+            [{"index": index, "alertID": new_id} for index, new_id in enumerate(new_ids)],
+            started,
+        )
+    except Error as e:
+        db.get_db().rollback()
+        current_app.logger.error(f"Database error in create_alerts: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
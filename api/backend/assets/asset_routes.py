@@ -1,13 +1,62 @@
+import io
+import time
+
 from flask import Blueprint, jsonify, request
 from backend.db_connection import db
-from mysql.connector import Error
+from backend.common.pagination import Keyset
+from backend.common.streaming import stream_rows, wants_stream
+from backend.common.columnar import result_columns, stream_table, table_response, wants_columnar
+from backend.common.conditional import versioned
+from backend.common import bulk
+from backend.prices.price_store import price_store
+from backend.portfolios.valuation import valuations
+from backend.assets.quotes import quotes
+from backend.assets.reference import reference
+from backend.prices.downsample import INTERVAL_BUCKETS, MAX_POINTS_LIMIT, ohlcv_query, downsample_rows
+from backend.prices.ingest import DEFAULT_BATCH_SIZE, FORMATS, append_to_store, detect_format, ingest, read_records
+from pymysql import Error
 from flask import current_app
 
 # Create a Blueprint for Asset routes
 assets = Blueprint("assets", __name__)
 
+# Sort key for keyset pagination of get_all_assets
+ASSET_KEYSET = Keyset(("a.TickerSymbol", "a.assetID"), ("TickerSymbol", "assetID"))
+# Sort key for keyset pagination of raw and aggregated price history;
+# (assetID, Date) is PriceHistory's primary key, so Date alone is unique here
+PRICE_HISTORY_KEYSET = Keyset(("Date",), ("Date",), descending=True)
+
+# Base queries of get_all_assets (streamed) and get_price_history (daily
+# bars); filters and the page clause are appended
+LIST_ASSETS_SQL = """
+SELECT a.assetID, a.TickerSymbol, a.AssetName, a.AssetType, a.CurrentPrice,
+       a.sectorID, s.sectorName
+FROM Asset a
+JOIN Sector s ON a.sectorID = s.sectorID
+WHERE 1=1
+"""
+PRICE_HISTORY_SQL = """
+SELECT Date, openPrice, highPrice, lowPrice, closePrice, adjClosePrice, Volume, assetID
+FROM PriceHistory
+WHERE assetID = %s
+"""
+# Upper bound on ids + tickers resolved by one get_assets_batch call
+MAX_BATCH_LOOKUP = 1000
+# Seconds clients may reuse asset and sector responses without revalidating
+REFERENCE_MAX_AGE = 30
+# Asset fields returned by the list endpoints
+ASSET_LIST_FIELDS = ("assetID", "TickerSymbol", "AssetName", "AssetType", "CurrentPrice", "sectorID", "sectorName")
+
+# VARCHAR widths of Asset's text columns
+ASSET_TEXT_WIDTHS = {"TickerSymbol": 10, "AssetName": 50, "AssetType": 30}
+INSERT_ASSET_SQL = """
+INSERT INTO Asset (TickerSymbol, AssetName, AssetType, CurrentPrice, sectorID)
+VALUES (%s, %s, %s, %s, %s)
+"""
+
 
 @assets.route("/assets", methods=["GET"])
+@versioned("reference", max_age=REFERENCE_MAX_AGE)
 def get_all_assets():
     """
     Retrieve all assets with optional filtering by sector or ticker.
@@ -15,51 +64,66 @@ def get_all_assets():
     Query parameters:
     - sectorID (int, optional): Filter by sector ID.
     - ticker (str, optional): Filter by ticker symbol.
+    - after (str, optional): next_cursor from the previous page.
+    - limit (int, optional): Page size (default 100, max 1000).
+    - stream (str, optional): '1' streams every matching row as NDJSON (also selected by Accept: application/x-ndjson).
 
     Returns:
-    - JSON: Success response with asset data or error details.
+    - JSON: Success response with asset data sorted by ticker plus next_cursor, or error details.
 
     Raises:
     - DatabaseError: If query execution fails.
     """
     try:
         current_app.logger.info('Starting get_all_assets request')
-        cursor = db.get_db().cursor()
-
+        try:
+            page = ASSET_KEYSET.page(request.args)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
         # Get query parameters for filtering
         sector_id = request.args.get("sectorID")
         ticker = request.args.get("ticker")
 
-        # Prepare the base query
-        query = """
-        SELECT a.assetID, a.TickerSymbol, a.AssetName, a.AssetType, a.CurrentPrice, 
-               a.sectorID, s.sectorName
-        FROM Asset a
-        JOIN Sector s ON a.sectorID = s.sectorID
-        WHERE 1=1
-        """
-        params = []
+        if wants_stream():
+            # Prepare the base query
+            query = LIST_ASSETS_SQL
+            params = []
 
-        # Add filters if provided
-        if sector_id:
-            query += " AND a.sectorID = %s"
-            params.append(int(sector_id))
-        
-        if ticker:
-            query += " AND a.TickerSymbol = %s"
-            params.append(ticker)
+            # Add filters if provided
+            if sector_id:
+                query += " AND a.sectorID = %s"
+                params.append(int(sector_id))
 
-        query += " ORDER BY a.TickerSymbol"
+            if ticker:
+                query += " AND a.TickerSymbol = %s"
+                params.append(ticker)
 
-        current_app.logger.debug(f'Executing query: {query} with params: {params}')
-        cursor.execute(query, params)
-        assets_data = cursor.fetchall()
-        cursor.close()
+            # Whole result set as NDJSON, read through a server-side cursor
+            page_sql, page_params = page.clause(limit=False)
+            return stream_rows(query + page_sql, params + page_params)
+
+        # Pages come from the reference cache, already in (TickerSymbol, assetID) order
+        rows = reference.assets(
+            db.get_db(), int(sector_id) if sector_id else None, ticker or None, ASSET_LIST_FIELDS
+        )
+        try:
+            assets_data, next_cursor = page.select(rows)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
 
         current_app.logger.info(f'Successfully retrieved {len(assets_data)} assets')
         return jsonify({
             "success": True,
-            "data": assets_data
+            "data": assets_data,
+            "next_cursor": next_cursor
         }), 200
     except Error as e:
         current_app.logger.error(f'Database error in get_all_assets: {str(e)}')
@@ -70,7 +134,110 @@ def get_all_assets():
         }), 500
 
 
+@assets.route("/assets:batch", methods=["GET"])
+def get_assets_batch():
+    """
+    Resolve many assets by ID and/or ticker in one request.
+
+    Query parameters:
+    - ids (str, optional): Comma-separated asset IDs; may be repeated.
+    - tickers (str, optional): Comma-separated ticker symbols; may be repeated.
+    - mode (str, optional): 'quote' returns only ticker, price and day change
+      from the in-memory quote cache instead of full asset rows.
+
+    Returns:
+    - JSON: Success response with the assets in request order and the IDs and
+      tickers that matched nothing, or error details.
+
+    Raises:
+    - DatabaseError: If query execution fails.
+    """
+    try:
+        current_app.logger.info("Starting get_assets_batch request")
+        try:
+            asset_ids = [int(v) for v in _list_arg("ids")]
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "ids must be integers",
+                "status_code": 400
+            }), 400
+        tickers = _list_arg("tickers")
+        if not asset_ids and not tickers:
+            return jsonify({
+                "success": False,
+                "error": "Pass ids and/or tickers",
+                "status_code": 400
+            }), 400
+        if len(asset_ids) + len(tickers) > MAX_BATCH_LOOKUP:
+            return jsonify({
+                "success": False,
+                "error": f"At most {MAX_BATCH_LOOKUP} ids and tickers per request",
+                "status_code": 400
+            }), 400
+
+        if request.args.get("mode") == "quote":
+            rows, missing_ids, missing_tickers = quotes.quotes(db.get_db(), asset_ids, tickers)
+        else:
+            cursor = db.get_db().cursor()
+            conditions, params = [], []
+            if asset_ids:
+                conditions.append(f"a.assetID IN ({', '.join(['%s'] * len(asset_ids))})")
+                params += asset_ids
+            if tickers:
+                conditions.append(f"a.TickerSymbol IN ({', '.join(['%s'] * len(tickers))})")
+                params += tickers
+            query = f"""
+            SELECT a.assetID, a.TickerSymbol, a.AssetName, a.AssetType, a.CurrentPrice,
+                   a.sectorID, s.sectorName, s.sectorDescription
+            FROM Asset a
+            JOIN Sector s ON a.sectorID = s.sectorID
+            WHERE {" OR ".join(conditions)}
+            """
+            current_app.logger.debug(f"Executing query: {query} with params: {params}")
+            cursor.execute(query, params)
+            fetched = cursor.fetchall()
+            cursor.close()
+
+            by_id = {row["assetID"]: row for row in fetched}
+            by_ticker = {row["TickerSymbol"]: row for row in fetched}
+            requested = [(by_id.get(i), i) for i in asset_ids] + [(by_ticker.get(t), t) for t in tickers]
+            rows, seen = [], set()
+            for row, _ in requested:
+                if row is not None and row["assetID"] not in seen:
+                    seen.add(row["assetID"])
+                    rows.append(row)
+            missing_ids = [i for i in asset_ids if i not in by_id]
+            missing_tickers = [t for t in tickers if t not in by_ticker]
+
+        current_app.logger.info(f"Successfully resolved {len(rows)} assets")
+        return jsonify({
+            "success": True,
+            "data": rows,
+            "missing": {"ids": missing_ids, "tickers": missing_tickers}
+        }), 200
+    except Error as e:
+        current_app.logger.error(f"Database error in get_assets_batch: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
+
+
+def _list_arg(name):
+    """Values of a repeatable, comma-separated query parameter, de-duplicated in order."""
+    values = []
+    for raw in request.args.getlist(name):
+        for value in raw.split(","):
+            value = value.strip()
+            if value and value not in values:
+                values.append(value)
+    return values
+
+
 @assets.route("/assets/<int:asset_id>", methods=["GET"])
+@versioned("reference", max_age=REFERENCE_MAX_AGE)
 def get_asset(asset_id):
     """
     Retrieve detailed information about a specific asset.
@@ -86,18 +253,8 @@ def get_asset(asset_id):
     """
     try:
         current_app.logger.info(f'Starting get_asset request for ID: {asset_id}')
-        cursor = db.get_db().cursor()
-
         # Get asset details with sector information
-        query = """
-        SELECT a.assetID, a.TickerSymbol, a.AssetName, a.AssetType, a.CurrentPrice, 
-               a.sectorID, s.sectorName, s.sectorDescription
-        FROM Asset a
-        JOIN Sector s ON a.sectorID = s.sectorID
-        WHERE a.assetID = %s
-        """
-        cursor.execute(query, (asset_id,))
-        asset = cursor.fetchone()
+        asset = reference.asset(db.get_db(), asset_id)
 
         if not asset:
             return jsonify({
@@ -106,7 +263,6 @@ def get_asset(asset_id):
                 "status_code": 404
             }), 404
 
-        cursor.close()
         current_app.logger.info(f'Successfully retrieved asset {asset_id}')
         return jsonify({
             "success": True,
@@ -122,6 +278,7 @@ def get_asset(asset_id):
 
 
 @assets.route("/assets/<int:asset_id>/price-history", methods=["GET"])
+@versioned("prices")
 def get_price_history(asset_id):
     """
     Retrieve price history for a specific asset with optional date filtering.
@@ -132,15 +289,35 @@ def get_price_history(asset_id):
     Query parameters:
     - start_date (str, optional): Filter records from this date onwards (YYYY-MM-DD format).
     - end_date (str, optional): Filter records up to this date (YYYY-MM-DD format).
+    - interval (str, optional): Aggregate into OHLCV bars per day, week or month ('1d', '1w', '1M').
+    - max_points (int, optional): Downsample the series to at most this many rows with LTTB (3 to 10000).
+      Downsampled responses cover the whole range and are not paginated.
+    - after (str, optional): next_cursor from the previous page.
+    - limit (int, optional): Page size (default 100, max 1000).
+    - stream (str, optional): '1' streams every matching row as NDJSON (also selected by Accept: application/x-ndjson).
+    - format (str, optional): 'arrow' or 'parquet' returns every matching row as an Arrow IPC stream or
+      Parquet file (also selected by Accept: application/vnd.apache.arrow.stream or application/vnd.apache.parquet).
 
     Returns:
-    - JSON: Success response with price history data sorted by date descending, or error details if asset not found.
+    - JSON: Success response with price history data sorted by date descending plus next_cursor,
+      or error details if asset not found.
+      Aggregated bars carry Date (bucket start), openPrice, highPrice, lowPrice, closePrice, Volume and bars.
+      Columnar responses carry the same columns, unpaginated.
 
     Raises:
     - DatabaseError: If query execution fails.
     """
     try:
         current_app.logger.info(f'Starting get_price_history request for asset ID: {asset_id}')
+        interval = request.args.get("interval")
+        try:
+            page = PRICE_HISTORY_KEYSET.page(request.args)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
         cursor = db.get_db().cursor()
 
         # Check if asset exists
@@ -156,35 +333,82 @@ def get_price_history(asset_id):
         # Get query parameters for date filtering
         start_date = request.args.get("start_date")
         end_date = request.args.get("end_date")
+        max_points = request.args.get("max_points", type=int)
 
-        # Prepare the base query
-        query = """
-        SELECT priceID, Date, openPrice, closePrice, Volume, assetID
-        FROM PriceHistory
-        WHERE assetID = %s
-        """
-        params = [asset_id]
-
-        # Add date filters if provided
-        if start_date:
-            query += " AND Date >= %s"
-            params.append(start_date)
-        
-        if end_date:
-            query += " AND Date <= %s"
-            params.append(end_date)
-
-        query += " ORDER BY Date DESC"
+        if interval and interval not in INTERVAL_BUCKETS:
+            cursor.close()
+            return jsonify({
+                "success": False,
+                "error": f"interval must be one of: {', '.join(INTERVAL_BUCKETS)}",
+                "status_code": 400
+            }), 400
+        if max_points is not None and not 3 <= max_points <= MAX_POINTS_LIMIT:
+            cursor.close()
+            return jsonify({
+                "success": False,
+                "error": f"max_points must be between 3 and {MAX_POINTS_LIMIT}",
+                "status_code": 400
+            }), 400
+
+        # Downsampling needs the whole range, so it replaces pagination and streaming;
+        # columnar responses are streamed unless downsampled
+        fmt = wants_columnar()
+        streaming = max_points is None and (fmt is not None or wants_stream())
+        paginate = max_points is None and not streaming
+
+        if interval:
+            # Build OHLCV bars in the database so only one row per bucket is fetched
+            before = page.after[0] if max_points is None and page.after else None
+            query, filter_params = ohlcv_query(interval, start_date, end_date, before)
+            params = [asset_id] + filter_params
+            if paginate:
+                query += " LIMIT %s"
+                params.append(page.limit + 1)
+        else:
+            # Prepare the base query
+            query = PRICE_HISTORY_SQL
+            params = [asset_id]
+
+            # Add date filters if provided
+            if start_date:
+                query += " AND Date >= %s"
+                params.append(start_date)
+
+            if end_date:
+                query += " AND Date <= %s"
+                params.append(end_date)
+
+            if paginate or streaming:
+                page_sql, page_params = page.clause(limit=paginate)
+                query += page_sql
+                params += page_params
+            else:
+                query += " ORDER BY Date DESC"
+
+        if streaming:
+            cursor.close()
+            if fmt is not None:
+                return stream_table(query, params, fmt)
+            return stream_rows(query, params)
 
         current_app.logger.debug(f'Executing query: {query} with params: {params}')
         cursor.execute(query, params)
         price_history = cursor.fetchall()
+        columns = result_columns(cursor.description)
         cursor.close()
 
+        if paginate:
+            price_history, next_cursor = page.finish(price_history)
+        else:
+            price_history, next_cursor = downsample_rows(price_history, max_points), None
+            if fmt is not None:
+                return table_response(price_history, columns, fmt)
+
         current_app.logger.info(f'Successfully retrieved {len(price_history)} price history records')
         return jsonify({
             "success": True,
-            "data": price_history
+            "data": price_history,
+            "next_cursor": next_cursor
         }), 200
     except Error as e:
         current_app.logger.error(f'Database error in get_price_history: {str(e)}')
@@ -195,7 +419,99 @@ def get_price_history(asset_id):
         }), 500
 
 
+@assets.route("/assets/price-history:bulk", methods=["POST"])
+@assets.route("/assets/<int:asset_id>/price-history:bulk", methods=["POST"])
+def bulk_upsert_price_history(asset_id=None):
+    """
+    Upsert many price bars at once from a CSV, NDJSON or Parquet body.
+
+    Bars are written in batched transactions keyed on (assetID, Date), so
+    sending the same bars again corrects them rather than duplicating them.
+    On the per-asset route bars may omit the asset; on the collection route
+    each bar names its assetID or ticker. Bars for unknown assets are
+    skipped and reported.
+
+    Args:
+    - asset_id (int, optional): Asset the bars belong to.
+
+    Query parameters:
+    - format (str, optional): csv, ndjson or parquet; defaults to the Content-Type.
+    - batch_size (int, optional): Bars per transaction (default 5000).
+
+    Request body:
+    - Bars with Date, openPrice and closePrice, plus optional highPrice,
+      lowPrice, adjClosePrice and Volume (short names such as open/close
+      are accepted too).
+
+    Returns:
+    - JSON: Success response with rows written, batches, skipped bars and throughput.
+    """
+    try:
+        current_app.logger.info(f"Starting bulk_upsert_price_history request for asset: {asset_id}")
+        fmt = request.args.get("format") or detect_format(request.content_type)
+        if fmt not in FORMATS:
+            return jsonify({
+                "success": False,
+                "error": "Body must be CSV, NDJSON or Parquet (set Content-Type or ?format=)",
+                "status_code": 400
+            }), 400
+        batch_size = request.args.get("batch_size", DEFAULT_BATCH_SIZE, type=int)
+        if batch_size < 1:
+            return jsonify({
+                "success": False,
+                "error": "batch_size must be positive",
+                "status_code": 400
+            }), 400
+
+        conn = db.get_db()
+        if asset_id is not None:
+            cursor = conn.cursor()
+            cursor.execute("SELECT assetID FROM Asset WHERE assetID = %s", (asset_id,))
+            found = cursor.fetchone()
+            cursor.close()
+            if not found:
+                return jsonify({
+                    "success": False,
+                    "error": "Asset not found",
+                    "status_code": 404
+                }), 404
+
+        # Parquet readers need to seek; CSV and NDJSON are read as they arrive
+        body = io.BytesIO(request.get_data()) if fmt == "parquet" else request.stream
+        try:
+            stats = ingest(
+                conn, read_records(body, fmt), asset_id, batch_size,
+                on_commit=append_to_store,
+            )
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
+        finally:
+            # Batches may have committed before a failure; previous closes can change
+            quotes.invalidate()
+
+        current_app.logger.info(
+            f"Upserted {stats['rows']} bars in {stats['batches']} batches ({stats['rows_per_sec']} rows/s)"
+        )
+        return jsonify({
+            "success": True,
+            "data": stats
+        }), 200
+    except Error as e:
+        db.get_db().rollback()
+        current_app.logger.error(f"Database error in bulk_upsert_price_history: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
+
+
 @assets.route("/assets/sector/<int:sector_id>", methods=["GET"])
+@versioned("reference", max_age=REFERENCE_MAX_AGE)
 def get_assets_by_sector(sector_id):
     """
     Retrieve all assets that belong to a specific sector.
@@ -211,14 +527,12 @@ def get_assets_by_sector(sector_id):
     """
     try:
         current_app.logger.info(f'Starting get_assets_by_sector request for sector ID: {sector_id}')
-        cursor = db.get_db().cursor()
+        conn = db.get_db()
 
         # Check if sector exists
-        cursor.execute("SELECT sectorID, sectorName FROM Sector WHERE sectorID = %s", (sector_id,))
-        sector = cursor.fetchone()
-        
+        sector = reference.sector(conn, sector_id)
+
         if not sector:
-            cursor.close()
             return jsonify({
                 "success": False,
                 "error": "Sector not found",
@@ -226,17 +540,8 @@ def get_assets_by_sector(sector_id):
             }), 404
 
         # Get all assets in this sector
-        query = """
-        SELECT a.assetID, a.TickerSymbol, a.AssetName, a.AssetType, a.CurrentPrice, 
-               a.sectorID, s.sectorName
-        FROM Asset a
-        JOIN Sector s ON a.sectorID = s.sectorID
-        WHERE a.sectorID = %s
-        ORDER BY a.TickerSymbol
-        """
-        cursor.execute(query, (sector_id,))
-        assets_data = cursor.fetchall()
-        cursor.close()
+        sector = {"sectorID": sector["sectorID"], "sectorName": sector["sectorName"]}
+        assets_data = reference.assets(conn, sector_id=sector_id, fields=ASSET_LIST_FIELDS)
 
         current_app.logger.info(f'Successfully retrieved {len(assets_data)} assets for sector {sector_id}')
         return jsonify({
@@ -271,10 +576,6 @@ def create_asset():
                 }), 400
 
         cursor = db.get_db().cursor()
-        insert_sql = """
-            INSERT INTO Asset (TickerSymbol, AssetName, AssetType, CurrentPrice, sectorID)
-            VALUES (%s, %s, %s, %s, %s)
-        """
         params = (
             data["TickerSymbol"],
             data["AssetName"],
@@ -282,11 +583,13 @@ def create_asset():
             float(data["CurrentPrice"]),
             int(data["sectorID"])
         )
-        current_app.logger.debug(f"Executing query: {insert_sql} with params: {params}")
-        cursor.execute(insert_sql, params)
-        db.get_db().commit()
+        current_app.logger.debug(f"Executing query: {INSERT_ASSET_SQL} with params: {params}")
+        cursor.execute(INSERT_ASSET_SQL, params)
         new_id = cursor.lastrowid
+        reference.invalidate(cursor)
+        db.get_db().commit()
         cursor.close()
+        quotes.invalidate()
 
         current_app.logger.info(f"Successfully created asset {new_id}")
         return jsonify({
@@ -306,6 +609,95 @@ def create_asset():
         }), 500
 
 
+def _parse_asset(item):
+    # One item of a create_assets batch
+    bulk.require_fields(item, ("TickerSymbol", "AssetName", "AssetType", "CurrentPrice", "sectorID"))
+    try:
+        asset = {
+            "TickerSymbol": str(item["TickerSymbol"]).strip(),
+            "AssetName": str(item["AssetName"]),
+            "AssetType": str(item["AssetType"]),
+            "CurrentPrice": round(float(item["CurrentPrice"]), 2),
+            "sectorID": int(item["sectorID"]),
+        }
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("CurrentPrice and sectorID must be numbers")
+    if not asset["TickerSymbol"]:
+        raise ValueError("TickerSymbol must not be empty")
+    for field, width in ASSET_TEXT_WIDTHS.items():
+        if len(asset[field]) > width:
+            raise ValueError(f"{field} must be at most {width} characters")
+    if asset["CurrentPrice"] < 0:
+        raise ValueError("CurrentPrice must not be negative")
+    return asset
+
+
+@assets.route("/assets:bulk", methods=["POST"])
+def create_assets():
+    """
+    Create many assets in one transaction.
+
+    Every item is validated before anything is written; one invalid item
+    rejects the whole batch.
+
+    Request body (JSON):
+    - A list of create_asset bodies (TickerSymbol, AssetName, AssetType,
+      CurrentPrice, sectorID), or {"assets": [...]}; at most 5000.
+
+    Returns:
+    - JSON: 201 with one {"index", "assetID", "TickerSymbol"} result per item
+      in request order and the rows written per second, or 400 listing the
+      invalid items by index.
+    """
+    started = time.perf_counter()
+    try:
+        current_app.logger.info("Starting create_assets request")
+        try:
+            items = bulk.read_items(request.get_json(silent=True), "assets")
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
+        parsed, errors = bulk.parse_items(items, _parse_asset)
+
+        conn = db.get_db()
+        cursor = conn.cursor()
+        bulk.check_exists(cursor, parsed, errors, "sectorID", "Sector", "Sector")
+        if errors:
+            cursor.close()
+            return bulk.invalid(errors, len(items))
+
+        rows = [
+            (a["TickerSymbol"], a["AssetName"], a["AssetType"], a["CurrentPrice"], a["sectorID"])
+            for a in parsed
+        ]
+        new_ids = bulk.insert_many(cursor, INSERT_ASSET_SQL, rows)
+        reference.invalidate(cursor)
+        conn.commit()
+        cursor.close()
+        quotes.invalidate()
+
+        current_app.logger.info(f"Successfully created {len(new_ids)} assets")
+        return bulk.created(
+            "Assets created successfully",
+            [
+                {"index": index, "assetID": new_id, "TickerSymbol": a["TickerSymbol"]}
+                for index, (new_id, a) in enumerate(zip(new_ids, parsed))
+            ],
+            started,
+        )
+    except Error as e:
+        db.get_db().rollback()
+        current_app.logger.error(f"Database error in create_assets: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
+
+
 @assets.route("/assets/<int:asset_id>", methods=["PUT"])
 def update_asset(asset_id):
     """Update an existing asset."""
@@ -348,8 +740,19 @@ def update_asset(asset_id):
         update_sql = f"UPDATE Asset SET {', '.join(update_fields)} WHERE assetID = %s"
         current_app.logger.debug(f"Executing query: {update_sql} with params: {params}")
         cursor.execute(update_sql, params)
+        reference.invalidate(cursor)
+        version = None
+        if "CurrentPrice" in data or "TickerSymbol" in data:
+            version = valuations.bump(cursor)
         db.get_db().commit()
         cursor.close()
+        # Reprice cached valuations holding this asset instead of reloading them
+        if "CurrentPrice" in data:
+            valuations.on_price(asset_id, data["CurrentPrice"], version=version)
+            quotes.on_price(asset_id, data["CurrentPrice"])
+        if "TickerSymbol" in data:
+            valuations.invalidate(asset_id=asset_id, version=version)
+            quotes.invalidate()
 
         current_app.logger.info(f"Successfully updated asset {asset_id}")
         return jsonify({
@@ -384,9 +787,23 @@ def delete_asset(asset_id):
                 "status_code": 404
             }), 404
 
+        # PriceHistory is partitioned and cannot hold a foreign key, so check by hand
+        cursor.execute("SELECT 1 FROM PriceHistory WHERE assetID = %s LIMIT 1", (asset_id,))
+        if cursor.fetchone():
+            cursor.close()
+            return jsonify({
+                "success": False,
+                "error": "Asset has price history and cannot be deleted",
+                "status_code": 409
+            }), 409
+
         cursor.execute("DELETE FROM Asset WHERE assetID = %s", (asset_id,))
+        reference.invalidate(cursor)
         db.get_db().commit()
         cursor.close()
+        # Its column drops out of the PriceHistory matrix
+        price_store.invalidate()
+        quotes.invalidate()
 
         current_app.logger.info(f"Successfully deleted asset {asset_id}")
         return jsonify({
@@ -0,0 +1,114 @@
+# In-memory quote cache.
+#
+# Quote lookups (ticker, price and day change) for whole watchlists are
+# served from one per-process table of every asset, refreshed from MySQL in
+# a single query once it is older than QUOTE_CACHE_TTL seconds. Price edits
+# made through this process are applied immediately via on_price().
+import threading
+import time
+
+QUOTES_QUERY = """
+SELECT a.assetID, a.TickerSymbol, a.CurrentPrice, prev.closePrice AS previousClose
+FROM Asset a
+LEFT JOIN PriceHistory prev
+       ON prev.assetID = a.assetID
+      AND prev.Date = (SELECT MAX(Date) FROM PriceHistory
+                       WHERE assetID = a.assetID AND Date < CURDATE())
+"""
+
+
+class QuoteCache:
+    """Per-process ticker, price and previous close for every asset."""
+
+    def __init__(self):
+        self.ttl = 5.0
+        self._by_id = {}
+        self._by_ticker = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Read QUOTE_CACHE_TTL (seconds).
+
+        Args:
+        - app (Flask): The Flask application instance to attach to.
+        """
+        app.config.setdefault("QUOTE_CACHE_TTL", 5.0)
+        self.ttl = app.config["QUOTE_CACHE_TTL"]
+
+    def quotes(self, conn, asset_ids=(), tickers=()):
+        """
+        Quotes for the requested assets, refreshing the cache if it is stale.
+
+        Args:
+        - conn (Connection): Connection used when the cache needs a refresh.
+        - asset_ids (list): assetIDs to quote.
+        - tickers (list): Ticker symbols to quote.
+
+        Returns:
+        - tuple: (quotes in request order without duplicates, missing ids, missing tickers).
+        """
+        with self._lock:
+            stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+        if stale:
+            self._load(conn)
+
+        found, seen = [], set()
+        missing_ids, missing_tickers = [], []
+        with self._lock:
+            for key, index, missing in (
+                [(i, self._by_id, missing_ids) for i in asset_ids]
+                + [(t, self._by_ticker, missing_tickers) for t in tickers]
+            ):
+                quote = index.get(key)
+                if quote is None:
+                    missing.append(key)
+                elif quote["assetID"] not in seen:
+                    seen.add(quote["assetID"])
+                    found.append(_with_change(quote))
+        return found, missing_ids, missing_tickers
+
+    def on_price(self, asset_id, price):
+        """Apply a new CurrentPrice to the cached quote."""
+        with self._lock:
+            quote = self._by_id.get(asset_id)
+            if quote is not None:
+                quote["price"] = float(price)
+
+    def invalidate(self):
+        """Reload every quote on next use."""
+        with self._lock:
+            self._loaded_at = None
+
+    def _load(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(QUOTES_QUERY)
+        rows = cursor.fetchall()
+        cursor.close()
+
+        by_id = {}
+        for row in rows:
+            by_id[row["assetID"]] = {
+                "assetID": row["assetID"],
+                "TickerSymbol": row["TickerSymbol"],
+                "price": float(row["CurrentPrice"]),
+                "previousClose": float(row["previousClose"]) if row["previousClose"] is not None else None,
+            }
+        with self._lock:
+            self._by_id = by_id
+            self._by_ticker = {q["TickerSymbol"]: q for q in by_id.values()}
+            self._loaded_at = time.monotonic()
+
+
+def _with_change(quote):
+    previous = quote["previousClose"]
+    change = round(quote["price"] - previous, 2) if previous else None
+    return {
+        **quote,
+        "change": change,
+        "changePct": round(change / previous * 100, 2) if previous else None,
+    }
+
+
+quotes = QuoteCache()
@@ -0,0 +1,201 @@
+# Process-local cache of Asset and Sector reference data.
+#
+# Asset metadata and sectors change rarely but are joined into most asset,
+# position and portfolio reads. Each worker keeps both tables in memory and
+# polls the 'reference' CacheVersion counter (a primary-key lookup) at most
+# once per REFERENCE_CACHE_POLL seconds; asset writes bump the counter in
+# their own transaction, so every worker reloads shortly after a change.
+# REFERENCE_CACHE_TTL bounds staleness after out-of-band edits made
+# directly in MySQL.
+import threading
+import time
+
+from backend.common import versions
+
+VERSION_NAME = "reference"
+
+ASSET_FIELDS = (
+    "assetID", "TickerSymbol", "AssetName", "AssetType", "CurrentPrice",
+    "sectorID", "sectorName", "sectorDescription",
+)
+
+# Asset fields joined onto position rows
+POSITION_ASSET_FIELDS = ("TickerSymbol", "AssetName", "AssetType", "CurrentPrice")
+
+ASSETS_QUERY = """
+SELECT a.assetID, a.TickerSymbol, a.AssetName, a.AssetType, a.CurrentPrice,
+       a.sectorID, s.sectorName, s.sectorDescription
+FROM Asset a
+JOIN Sector s ON a.sectorID = s.sectorID
+ORDER BY a.TickerSymbol, a.assetID
+"""
+
+
+class ReferenceCache:
+    """Per-process copy of Asset (with its sector) and Sector."""
+
+    def __init__(self):
+        self.ttl = 300.0
+        self.poll_interval = 1.0
+        self._assets = {}
+        self._ordered = []
+        self._sectors = {}
+        self._version = None
+        self._loaded_at = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Read REFERENCE_CACHE_TTL and REFERENCE_CACHE_POLL (seconds).
+
+        Args:
+        - app (Flask): The Flask application instance to attach to.
+        """
+        app.config.setdefault("REFERENCE_CACHE_TTL", 300.0)
+        app.config.setdefault("REFERENCE_CACHE_POLL", 1.0)
+        self.ttl = app.config["REFERENCE_CACHE_TTL"]
+        self.poll_interval = app.config["REFERENCE_CACHE_POLL"]
+
+    def asset(self, conn, asset_id, fields=ASSET_FIELDS):
+        """
+        One asset with its sector, or None if it does not exist.
+
+        A miss re-checks the version immediately, so an asset created by
+        another worker a moment ago is still found.
+        """
+        self._refresh(conn)
+        row = self._assets.get(asset_id)
+        if row is None:
+            self._refresh(conn, check_now=True)
+            row = self._assets.get(asset_id)
+        return _project(row, fields) if row is not None else None
+
+    def assets(self, conn, sector_id=None, ticker=None, fields=ASSET_FIELDS):
+        """
+        Assets ordered by TickerSymbol, assetID, optionally filtered.
+
+        Args:
+        - conn (Connection): Connection used when the cache needs a refresh.
+        - sector_id (int, optional): Only assets in this sector.
+        - ticker (str, optional): Only the asset with this ticker.
+        - fields (tuple): Keys to include in each row.
+
+        Returns:
+        - list: New dicts, safe for the caller to modify.
+        """
+        self._refresh(conn)
+        return [
+            _project(row, fields) for row in self._ordered
+            if (sector_id is None or row["sectorID"] == sector_id)
+            and (ticker is None or row["TickerSymbol"] == ticker)
+        ]
+
+    def sector(self, conn, sector_id):
+        """A sector's ID, name and description, or None if it does not exist."""
+        self._refresh(conn)
+        row = self._sectors.get(sector_id)
+        if row is None:
+            self._refresh(conn, check_now=True)
+            row = self._sectors.get(sector_id)
+        return dict(row) if row is not None else None
+
+    def snapshot(self, conn, require=()):
+        """
+        The current assetID -> asset mapping, for joining onto other rows.
+
+        Args:
+        - conn (Connection): Connection used when the cache needs a refresh.
+        - require (iterable): assetIDs the caller expects; if any is missing
+          the version is re-checked once.
+
+        Returns:
+        - dict: Read-only mapping; rows must not be modified.
+        """
+        self._refresh(conn)
+        assets = self._assets
+        if any(asset_id not in assets for asset_id in require):
+            self._refresh(conn, check_now=True)
+            assets = self._assets
+        return assets
+
+    def invalidate(self, cursor=None):
+        """
+        Drop the cached tables after an Asset or Sector write.
+
+        Args:
+        - cursor (Cursor, optional): Cursor of the writing transaction; when
+          given, the shared version is bumped so other workers reload too.
+        """
+        if cursor is not None:
+            versions.bump(cursor, VERSION_NAME)
+        with self._lock:
+            self._loaded_at = None
+
+    def stats(self):
+        """Cached row counts, version and age in seconds."""
+        with self._lock:
+            return {
+                "assets": len(self._assets),
+                "sectors": len(self._sectors),
+                "version": self._version,
+                "age": round(time.monotonic() - self._loaded_at, 3) if self._loaded_at else None,
+            }
+
+    def _refresh(self, conn, check_now=False):
+        now = time.monotonic()
+        with self._lock:
+            loaded_at, checked_at, version = self._loaded_at, self._checked_at, self._version
+        expired = loaded_at is None or now - loaded_at > self.ttl
+        if not expired and not check_now and now - checked_at < self.poll_interval:
+            return
+
+        cursor = conn.cursor()
+        try:
+            latest = versions.current(cursor, [VERSION_NAME])[VERSION_NAME]
+            if expired or latest != version:
+                self._load(cursor, latest)
+            else:
+                with self._lock:
+                    self._checked_at = now
+        finally:
+            cursor.close()
+
+    def _load(self, cursor, version):
+        cursor.execute(ASSETS_QUERY)
+        ordered = cursor.fetchall()
+        cursor.execute("SELECT sectorID, sectorName, sectorDescription FROM Sector")
+        sectors = {row["sectorID"]: row for row in cursor.fetchall()}
+        now = time.monotonic()
+        with self._lock:
+            self._ordered = list(ordered)
+            self._assets = {row["assetID"]: row for row in ordered}
+            self._sectors = sectors
+            self._version = version
+            self._loaded_at = self._checked_at = now
+
+
+def _project(row, fields):
+    return {field: row[field] for field in fields}
+
+
+def add_asset_fields(rows, assets, fields):
+    """
+    Copy asset fields onto rows that carry an assetID.
+
+    Args:
+    - rows (list): Dicts with an assetID key; modified in place.
+    - assets (dict): A ReferenceCache.snapshot().
+    - fields (tuple): Asset keys to add; None where the asset is unknown.
+
+    Returns:
+    - list: The same rows.
+    """
+    for row in rows:
+        asset = assets.get(row["assetID"])
+        for field in fields:
+            row[field] = asset[field] if asset is not None else None
+    return rows
+
+
+reference = ReferenceCache()
@@ -1,15 +1,48 @@
 from flask import Blueprint, jsonify, request, current_app
 from backend.db_connection import db
-from mysql.connector import Error
+from backend.common.pagination import Keyset
+from backend.common.streaming import stream_rows, wants_stream
+from pymysql import Error
 
 audit = Blueprint("audit", __name__)
 
+# Sort key for keyset pagination of get_audit_events
+AUDIT_KEYSET = Keyset(("eventTime", "AuditEventID"), ("eventTime", "AuditEventID"), descending=True)
+
+# Base query of get_audit_events; filters and the page clause are appended
+LIST_AUDIT_EVENTS_SQL = """
+SELECT AuditEventID, eventType, eventTime, resourceType, resourceID, UserID
+FROM AuditEvent
+WHERE 1=1
+"""
+
 
 @audit.route("/events", methods=["GET"])
 def get_audit_events():
-    """Get audit events with optional filters."""
+    """
+    Get audit events, newest first, with optional filters.
+
+    Query parameters:
+    - startDate (str, optional): Only events at or after this time.
+    - endDate (str, optional): Only events at or before this time.
+    - eventType (str, optional): Only events of this type.
+    - userID (int, optional): Only events by this user.
+    - after (str, optional): next_cursor of the previous page.
+    - limit (int, optional): Page size (default 100, at most 1000).
+
+    Returns:
+    - JSON: The events and next_cursor.
+    """
     try:
         current_app.logger.info("Starting get_audit_events request")
+        try:
+            page = AUDIT_KEYSET.page(request.args)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
         cursor = db.get_db().cursor()
 
         start_date = request.args.get("startDate")
@@ -17,34 +50,38 @@ def get_audit_events():
         event_type = request.args.get("eventType")
         user_id = request.args.get("userID")
 
-        query = """
-            SELECT auditID, eventType, userID, details, createdAt
-            FROM AuditEvent
-            WHERE 1=1
-        """
+        query = LIST_AUDIT_EVENTS_SQL
         params = []
         if start_date:
-            query += " AND createdAt >= %s"
+            query += " AND eventTime >= %s"
             params.append(start_date)
         if end_date:
-            query += " AND createdAt <= %s"
+            query += " AND eventTime <= %s"
             params.append(end_date)
         if event_type:
             query += " AND eventType = %s"
             params.append(event_type)
         if user_id:
-            query += " AND userID = %s"
+            query += " AND UserID = %s"
             params.append(int(user_id))
 
-        query += " ORDER BY createdAt DESC"
+        if wants_stream():
+            # Whole result set as NDJSON, read through a server-side cursor
+            cursor.close()
+            page_sql, page_params = page.clause(limit=False)
+            return stream_rows(query + page_sql, params + page_params)
+
+        page_sql, page_params = page.clause()
+        query += page_sql
+        params += page_params
 
         current_app.logger.debug(f"Executing query: {query} with params: {params}")
         cursor.execute(query, params)
-        rows = cursor.fetchall()
+        rows, next_cursor = page.finish(cursor.fetchall())
         cursor.close()
 
         current_app.logger.info(f"Successfully retrieved {len(rows)} audit events")
-        return jsonify({"success": True, "data": rows}), 200
+        return jsonify({"success": True, "data": rows, "next_cursor": next_cursor}), 200
     except Error as e:
         current_app.logger.error(f"Database error in get_audit_events: {str(e)}")
         return jsonify({
@@ -1,61 +1,184 @@
 from flask import Blueprint, request, jsonify, current_app
+import datetime
 import logging
-import random
-from datetime import datetime, timedelta
+from pymysql import Error
+
+from backend.db_connection import db, use_primary
+from backend.backtests import engine, jobs, sweep
+from backend.backtests.jobs import backtest_jobs
+from backend.common.columnar import pa, table_response, wants_columnar
 
 backtests = Blueprint('backtests', __name__)
 logger = logging.getLogger('backtests')
 
-@backtests.route('/results/<backtest_id>', methods=['GET'])
+# Tables a columnar /results response can carry
+RESULT_FRAMES = ("equity", "trades")
+
+# Query parameters that only pick the response format, not the run
+FORMAT_ARGS = {"format", "frame"}
+
+@backtests.route('/results/<int:backtest_id>', methods=['GET'])
+@use_primary
 def get_backtest_results(backtest_id):
     """
-    Get detailed results for a specific backtest.
+    Run a stored backtest and return its detailed results.
+
+    Prices for the portfolio's assets are loaded into a date x asset matrix
+    and simulated by the vectorized engine; the resulting final value is
+    written back to Backtest.finalValue, so this GET always runs on the
+    primary. If the backtest was queued through POST /backtests, the stored
+    result is returned instead (202 while the job is still queued or
+    running).
+
+    Args:
+    - backtest_id (int): The ID of the backtest to run.
+
+    Query parameters:
+    - rebalance (str, optional): none/daily/weekly/monthly/quarterly/yearly.
+      Defaults to the frequency implied by the strategy's investment term.
+    - initial_capital (float, optional): Starting value (default 100000).
+    - max_trades (int, optional): Most recent trades to return (default 500).
+    - format (str, optional): 'arrow' or 'parquet' returns one table of the
+      report as an Arrow IPC stream or Parquet file (also selected by Accept).
+    - frame (str, optional): Table for columnar responses: 'equity' (date,
+      equity; the default) or 'trades' (the trade log).
+
+    Returns:
+    - JSON: Equity curve, metrics and trade log, or error details if the
+      backtest is not found or has no price data. Columnar responses carry
+      the rest of the report (metrics, final value, ...) as JSON values in
+      the schema metadata; the equity frame's metadata includes the trade
+      log, so one request returns the whole report.
     """
-    # Mock data generation
-    dates = [datetime.now() - timedelta(days=x) for x in range(30)]
-    dates.reverse()
-    
-    equity_curve = []
-    base_value = 100000
-    current_value = base_value
-    
-    for _ in dates:
-        change = random.uniform(-0.02, 0.03)
-        current_value *= (1 + change)
-        equity_curve.append(current_value)
-        
-    data = {
-        "id": backtest_id,
-        "strategy": "Momentum Alpha v2",
-        "dates": [d.strftime("%Y-%m-%d") for d in dates],
-        "equity_curve": equity_curve,
-        "metrics": {
-            "total_return": f"{(current_value - base_value) / base_value * 100:.2f}%",
-            "sharpe_ratio": 1.85,
-            "max_drawdown": "-12.4%",
-            "win_rate": "62%"
-        },
-        "trades": [
-            {"date": "2024-10-01", "symbol": "AAPL", "side": "BUY", "price": 175.20, "qty": 100},
-            {"date": "2024-10-05", "symbol": "AAPL", "side": "SELL", "price": 182.50, "qty": 100},
-            {"date": "2024-10-10", "symbol": "NVDA", "side": "BUY", "price": 450.00, "qty": 50}
+    try:
+        current_app.logger.info(f"Starting get_backtest_results for ID: {backtest_id}")
+        rebalance = request.args.get("rebalance")
+        if rebalance and rebalance not in engine.REBALANCE_FREQUENCIES:
+            return jsonify({
+                "success": False,
+                "error": f"Invalid rebalance frequency: {rebalance}",
+                "status_code": 400
+            }), 400
+        initial_capital = float(request.args.get("initial_capital", engine.DEFAULT_INITIAL_CAPITAL))
+        max_trades = int(request.args.get("max_trades", 500))
+        fmt = wants_columnar()
+        frame = request.args.get("frame", "equity")
+        if frame not in RESULT_FRAMES:
+            return jsonify({
+                "success": False,
+                "error": f"frame must be one of: {', '.join(RESULT_FRAMES)}",
+                "status_code": 400
+            }), 400
+
+        # Serve the stored result of a queued run unless the caller overrides its inputs
+        job = backtest_jobs.get(backtest_id)
+        if job is not None and not set(request.args) - FORMAT_ARGS:
+            view = backtest_jobs.describe(job)
+            if view["status"] in (jobs.QUEUED, jobs.RUNNING):
+                return jsonify({"success": True, "data": view}), 202
+            if view["status"] == jobs.DONE:
+                if fmt is not None:
+                    return _report_table(job["result"], frame, fmt)
+                return jsonify(job["result"]), 200
+
+        result = engine.run_saved_backtest(
+            db.get_db(), backtest_id, rebalance=rebalance, initial_capital=initial_capital
+        )
+        if result is None:
+            return jsonify({
+                "success": False,
+                "error": "Backtest not found",
+                "status_code": 404
+            }), 404
+
+        current_app.logger.info(
+            f"Backtest {backtest_id} finished with final value {result['final_value']:.2f}"
+        )
+        report = engine.serialize_result(result, max_trades=max_trades)
+        if fmt is not None:
+            return _report_table(report, frame, fmt)
+        return jsonify(report), 200
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 400
+        }), 400
+    except Error as e:
+        db.get_db().rollback()
+        current_app.logger.error(f"Database error in get_backtest_results: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
+
+
+def _report_table(report, frame, fmt):
+    """One table of a serialize_result() report, with the rest as schema metadata."""
+    # The trade log is capped at max_trades rows, small enough to ride along
+    # with the equity curve instead of costing a second run
+    tabled = ("trades",) if frame == "trades" else ("dates", "equity_curve")
+    metadata = {key: value for key, value in report.items() if key not in tabled}
+    if frame == "trades":
+        columns = [
+            ("date", pa.date32()), ("symbol", pa.string()), ("side", pa.string()),
+            ("price", pa.float64()), ("qty", pa.float64()),
         ]
-    }
-    return jsonify(data), 200
+        rows = report["trades"]
+    else:
+        columns = [("date", pa.date32()), ("equity", pa.float64())]
+        rows = [
+            {"date": date, "equity": equity}
+            for date, equity in zip(report["dates"], report["equity_curve"])
+        ]
+    return table_response(rows, columns, fmt, metadata=metadata), 200
 
 
 @backtests.route('/backtests', methods=['GET'])
 def list_backtests():
-    """List backtests (placeholder)."""
+    """
+    List stored backtests with the status of their most recent run.
+
+    Query parameters:
+    - portfolioID (int, optional): Filter by portfolio ID.
+
+    Returns:
+    - JSON: Success response with backtests sorted newest first. Backtests
+      without a job tracked by this API process report the status stored on
+      their row ('unknown' when none was stored); GET /results/<id> runs
+      them again.
+    """
     try:
         current_app.logger.info("Starting list_backtests request")
-        data = [
-            {"backtestID": 1, "name": "Momentum Alpha v2", "status": "COMPLETED"},
-            {"backtestID": 2, "name": "Value Tilt", "status": "PENDING"}
-        ]
-        return jsonify({"success": True, "data": data}), 200
-    except Exception as e:
-        current_app.logger.error(f"Error in list_backtests: {str(e)}")
+        cursor = db.get_db().cursor()
+
+        portfolio_id = request.args.get("portfolioID")
+        query = """
+            SELECT b.backtestID, b.startDate, b.endDate, b.finalValue, b.portfolioID,
+                   b.strategyID, s.strategyName, b.runStatus, b.runError
+            FROM Backtest b
+            JOIN InvestmentStrategy s ON b.strategyID = s.strategyID
+            WHERE 1=1
+        """
+        params = []
+        if portfolio_id:
+            query += " AND b.portfolioID = %s"
+            params.append(int(portfolio_id))
+        query += " ORDER BY b.backtestID DESC"
+
+        current_app.logger.debug(f"Executing query: {query} with params: {params}")
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+
+        for row in rows:
+            row.update(_job_status(row))
+
+        current_app.logger.info(f"Successfully retrieved {len(rows)} backtests")
+        return jsonify({"success": True, "data": rows}), 200
+    except Error as e:
+        current_app.logger.error(f"Database error in list_backtests: {str(e)}")
         return jsonify({
             "success": False,
             "error": str(e),
@@ -65,27 +188,283 @@ def list_backtests():
 
 @backtests.route('/backtests', methods=['POST'])
 def create_backtest():
-    """Create a backtest (skeleton)."""
+    """
+    Store a backtest definition and queue it for background execution.
+
+    Request body (JSON):
+    - name (str, required): Display name for the run.
+    - portfolioID (int, required): Portfolio whose positions seed the weights.
+    - strategyID (int, required): Investment strategy to apply.
+    - startDate (str, required): First date of the backtest (YYYY-MM-DD).
+    - endDate (str, required): Last date of the backtest (YYYY-MM-DD).
+    - rebalance (str, optional): Rebalance frequency override.
+    - initial_capital (float, optional): Starting value (default 100000).
+
+    Returns:
+    - JSON: 202 response with the backtest/job ID and a status URL to poll,
+      or error details if validation fails.
+    """
     try:
         current_app.logger.info("Starting create_backtest request")
         payload = request.get_json() or {}
-        name = payload.get("name")
-        if not name:
+        required_fields = ["name", "portfolioID", "strategyID", "startDate", "endDate"]
+        for field in required_fields:
+            if not payload.get(field):
+                return jsonify({
+                    "success": False,
+                    "error": f"Missing required field: {field}",
+                    "status_code": 400
+                }), 400
+
+        rebalance = payload.get("rebalance")
+        if rebalance and rebalance not in engine.REBALANCE_FREQUENCIES:
             return jsonify({
                 "success": False,
-                "error": "Missing required field: name",
+                "error": f"Invalid rebalance frequency: {rebalance}",
                 "status_code": 400
             }), 400
 
-        response = {
-            "message": "Backtest created successfully",
-            "backtestID": 999,
-            "status": "PENDING",
-            "note": "TODO: persist backtest configuration"
-        }
-        return jsonify({"success": True, "data": response}), 201
-    except Exception as e:
-        current_app.logger.error(f"Error in create_backtest: {str(e)}")
+        # Parse everything before the Backtest row is written, so bad input
+        # cannot leave behind a row that has no job
+        try:
+            portfolio_id = int(payload["portfolioID"])
+            strategy_id = int(payload["strategyID"])
+        except (TypeError, ValueError):
+            return jsonify({
+                "success": False,
+                "error": "portfolioID and strategyID must be integers",
+                "status_code": 400
+            }), 400
+        try:
+            start_date = datetime.date.fromisoformat(payload["startDate"])
+            end_date = datetime.date.fromisoformat(payload["endDate"])
+        except (TypeError, ValueError):
+            return jsonify({
+                "success": False,
+                "error": "startDate and endDate must be dates (YYYY-MM-DD)",
+                "status_code": 400
+            }), 400
+        if end_date < start_date:
+            return jsonify({
+                "success": False,
+                "error": "endDate must not be before startDate",
+                "status_code": 400
+            }), 400
+        try:
+            initial_capital = float(payload.get("initial_capital", engine.DEFAULT_INITIAL_CAPITAL))
+        except (TypeError, ValueError):
+            initial_capital = None
+        if initial_capital is None or not 0 < initial_capital < float("inf"):
+            return jsonify({
+                "success": False,
+                "error": "initial_capital must be a positive number",
+                "status_code": 400
+            }), 400
+
+        cursor = db.get_db().cursor()
+
+        cursor.execute("SELECT portfolioID FROM Portfolio WHERE portfolioID = %s", (portfolio_id,))
+        if not cursor.fetchone():
+            cursor.close()
+            return jsonify({
+                "success": False,
+                "error": "Portfolio not found",
+                "status_code": 404
+            }), 404
+
+        cursor.execute("SELECT strategyID FROM InvestmentStrategy WHERE strategyID = %s", (strategy_id,))
+        if not cursor.fetchone():
+            cursor.close()
+            return jsonify({
+                "success": False,
+                "error": "Strategy not found",
+                "status_code": 404
+            }), 404
+
+        # finalValue and runStatus are filled in by the worker as the run proceeds
+        insert_sql = """
+            INSERT INTO Backtest (startDate, endDate, finalValue, portfolioID, strategyID, runStatus)
+            VALUES (%s, %s, 0, %s, %s, %s)
+        """
+        params = (
+            start_date,
+            end_date,
+            portfolio_id,
+            strategy_id,
+            jobs.QUEUED
+        )
+        current_app.logger.debug(f"Executing query: {insert_sql} with params: {params}")
+        cursor.execute(insert_sql, params)
+        db.get_db().commit()
+        backtest_id = cursor.lastrowid
+        cursor.close()
+
+        job = backtest_jobs.submit(
+            backtest_id,
+            payload["name"],
+            rebalance=rebalance,
+            initial_capital=initial_capital,
+        )
+
+        current_app.logger.info(f"Queued backtest {backtest_id}")
+        return jsonify({
+            "success": True,
+            "data": {
+                "message": "Backtest queued",
+                "backtestID": backtest_id,
+                "jobID": backtest_id,
+                "status": job["status"],
+                "statusUrl": f"/backtest/backtests/{backtest_id}/status"
+            }
+        }), 202
+    except Error as e:
+        db.get_db().rollback()
+        current_app.logger.error(f"Database error in create_backtest: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
+
+
+@backtests.route('/backtests/<int:backtest_id>/status', methods=['GET'])
+def get_backtest_status(backtest_id):
+    """
+    Poll the execution status of a backtest.
+
+    Args:
+    - backtest_id (int): The backtest/job ID returned by POST /backtests.
+
+    Returns:
+    - JSON: Status (queued/running/done/failed), progress between 0 and 1,
+      timestamps and any error message while this API process tracks the
+      job. Otherwise (another worker ran it, or the API restarted since)
+      the status and error stored on the Backtest row, without progress
+      or timestamps; 'unknown' for backtests with no stored status. 404 if
+      the backtest does not exist.
+    """
+    try:
+        job = backtest_jobs.get(backtest_id)
+        if job is not None:
+            return jsonify({"success": True, "data": backtest_jobs.describe(job)}), 200
+
+        cursor = db.get_db().cursor()
+        cursor.execute(
+            "SELECT backtestID, finalValue, runStatus, runError FROM Backtest WHERE backtestID = %s",
+            (backtest_id,)
+        )
+        row = cursor.fetchone()
+        cursor.close()
+        if not row:
+            return jsonify({
+                "success": False,
+                "error": "Backtest not found",
+                "status_code": 404
+            }), 404
+
+        row.update(_job_status(row))
+        return jsonify({"success": True, "data": row}), 200
+    except Error as e:
+        current_app.logger.error(f"Database error in get_backtest_status: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
+
+
+@backtests.route('/backtests/sweep', methods=['POST'])
+def sweep_backtests():
+    """
+    Grid-search strategy parameters for one portfolio and date range.
+
+    The price matrix is loaded from MySQL once and shared with a process
+    pool through a memory-mapped file; each worker runs a slice of the
+    parameter combinations against it.
+
+    Request body (JSON):
+    - portfolioID (int, required): Portfolio whose positions seed the weights.
+    - startDate (str, required): First date of the backtest (YYYY-MM-DD).
+    - endDate (str, required): Last date of the backtest (YYYY-MM-DD).
+    - grid (dict, required): Non-empty lists of values for lookback (trading
+      days), rebalance (frequency) and weight_cap (fraction, null for none).
+    - strategyID (int, optional): Supplies the default weight cap from its
+      'Max Single Position' guideline when the grid has no weight_cap.
+    - rank_by (str, optional): Metric to rank by (default sharpe_ratio).
+    - initial_capital (float, optional): Starting value (default 100000).
+    - top (int, optional): Only return the best N rows.
+
+    Returns:
+    - JSON: Ranked results table with parameters, metrics and final value
+      per combination, or error details if validation fails.
+    """
+    try:
+        current_app.logger.info("Starting sweep_backtests request")
+        payload = request.get_json() or {}
+        required_fields = ["portfolioID", "startDate", "endDate", "grid"]
+        for field in required_fields:
+            if not payload.get(field):
+                return jsonify({
+                    "success": False,
+                    "error": f"Missing required field: {field}",
+                    "status_code": 400
+                }), 400
+
+        grid = payload["grid"]
+        if not isinstance(grid, dict) or not all(isinstance(v, list) and v for v in grid.values()):
+            return jsonify({
+                "success": False,
+                "error": 'grid must be an object of non-empty value lists, e.g. {"lookback": [20, 60]}',
+                "status_code": 400
+            }), 400
+        grid = dict(grid)
+        rank_by = payload.get("rank_by", "sharpe_ratio")
+        cursor = db.get_db().cursor()
+        if payload.get("strategyID") and "weight_cap" not in grid:
+            grid["weight_cap"] = [engine.load_weight_cap(cursor, int(payload["strategyID"]))]
+        combos = sweep.expand_grid(grid)
+
+        asset_ids, _, base_weights = engine.load_portfolio_weights(cursor, int(payload["portfolioID"]))
+        if len(asset_ids) == 0:
+            cursor.close()
+            return jsonify({
+                "success": False,
+                "error": "Portfolio not found or has no positions",
+                "status_code": 404
+            }), 404
+        dates, closes = engine.load_prices(cursor, asset_ids, payload["startDate"], payload["endDate"])
+        cursor.close()
+
+        results = sweep.run_sweep(
+            dates,
+            closes,
+            base_weights,
+            combos,
+            initial_capital=float(payload.get("initial_capital", engine.DEFAULT_INITIAL_CAPITAL)),
+            rank_by=rank_by,
+            workers=current_app.config.get("BACKTEST_SWEEP_WORKERS"),
+        )
+        if payload.get("top"):
+            results = results[: int(payload["top"])]
+
+        current_app.logger.info(f"Sweep finished {len(combos)} combinations")
+        return jsonify({
+            "success": True,
+            "data": {
+                "portfolioID": int(payload["portfolioID"]),
+                "combinations": len(combos),
+                "rank_by": rank_by,
+                "results": results
+            }
+        }), 200
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 400
+        }), 400
+    except Error as e:
+        current_app.logger.error(f"Database error in sweep_backtests: {str(e)}")
         return jsonify({
             "success": False,
             "error": str(e),
@@ -93,6 +472,23 @@ def create_backtest():
         }), 500
 
 
+def _job_status(row):
+    """
+    Status fields for a Backtest row, replacing its runStatus and runError.
+
+    The in-process job is used when there is one; otherwise the stored
+    status, or 'unknown' when none was stored.
+    """
+    status, error = row.pop("runStatus"), row.pop("runError")
+    job = backtest_jobs.get(row["backtestID"])
+    if job is None:
+        return {"status": status or jobs.UNKNOWN, "progress": 1.0 if status == jobs.DONE else None,
+                "error": error}
+    view = backtest_jobs.describe(job)
+    return {"name": view["name"], "status": view["status"],
+            "progress": view["progress"], "error": view["error"]}
+
+
 @backtests.route('/backtests/<backtest_id>', methods=['PUT'])
 def update_backtest(backtest_id):
     """Update a backtest (skeleton)."""
@@ -0,0 +1,601 @@
+# Vectorized backtest engine.
+#
+# Prices are held as a dense date x asset matrix and every step of the
+# simulation (filling gaps, rebalancing, equity curve, trades and metrics)
+# is expressed as NumPy array operations, so the cost grows with the size
+# of the matrix rather than with Python-level loops over days.
+import numpy as np
+
+from backend.prices.price_store import price_store
+
+TRADING_DAYS_PER_YEAR = 252
+DEFAULT_INITIAL_CAPITAL = 100000.0
+
+REBALANCE_FREQUENCIES = ("none", "daily", "weekly", "monthly", "quarterly", "yearly")
+
+# Closes of some assets over a date range, read when the price store is off.
+# No ORDER BY: build_price_matrix sorts the dates itself, and ordering an
+# IN list of assets by Date would force a filesort over the primary key.
+LOAD_PRICES_SQL = """
+SELECT assetID, Date, closePrice
+FROM PriceHistory
+WHERE assetID IN ({placeholders}) AND Date >= %s AND Date <= %s
+"""
+
+# InvestmentStrategy.investmentTerm -> default rebalance frequency
+TERM_REBALANCE = {
+    "Short-term": "weekly",
+    "Medium-term": "monthly",
+    "Long-term": "quarterly",
+}
+
+
+def build_price_matrix(asset_col, date_col, close_col, asset_ids=None):
+    """
+    Pivot long-format price rows into a dense date x asset matrix.
+
+    Args:
+    - asset_col (array-like): Asset ID of each row.
+    - date_col (array-like): Date (datetime or datetime64) of each row.
+    - close_col (array-like): Close price of each row.
+    - asset_ids (array-like, optional): Column order; defaults to the sorted
+      distinct asset IDs found in asset_col.
+
+    Returns:
+    - tuple: (dates datetime64[D] array, asset_ids int64 array,
+      closes float64 matrix with NaN where no bar exists).
+    """
+    asset_col = np.asarray(asset_col, dtype=np.int64)
+    date_col = np.asarray(date_col, dtype="datetime64[s]").astype("datetime64[D]")
+    close_col = np.asarray(close_col, dtype=np.float64)
+
+    if asset_ids is None:
+        asset_ids = np.unique(asset_col)
+    else:
+        asset_ids = np.asarray(asset_ids, dtype=np.int64)
+    order = np.argsort(asset_ids, kind="stable")
+    col = order[np.searchsorted(asset_ids[order], asset_col)]
+
+    dates, row = np.unique(date_col, return_inverse=True)
+    closes = np.full((len(dates), len(asset_ids)), np.nan)
+    closes[row, col] = close_col
+    return dates, asset_ids, closes
+
+
+def fill_prices(closes):
+    """
+    Forward-fill missing prices, then back-fill leading gaps.
+
+    Non-positive prices are treated as missing. Columns with no prices at
+    all are left as NaN so callers can drop them.
+
+    Returns:
+    - ndarray: A filled copy of closes.
+    """
+    closes = np.where(closes > 0, closes, np.nan)
+    n_days, n_assets = closes.shape
+    if n_days == 0:
+        return closes
+    valid = ~np.isnan(closes)
+    cols = np.arange(n_assets)
+
+    last = np.where(valid, np.arange(n_days)[:, None], 0)
+    np.maximum.accumulate(last, axis=0, out=last)
+    filled = closes[last, cols]
+
+    first = valid.argmax(axis=0)
+    leading = np.arange(n_days)[:, None] < first
+    return np.where(leading, closes[first, cols], filled)
+
+
+def rebalance_mask(dates, frequency="monthly"):
+    """
+    Mark the trading days on which the portfolio is rebalanced.
+
+    The first day is always a rebalance (initial allocation); afterwards the
+    first trading day of each new week/month/quarter/year is marked.
+
+    Args:
+    - dates (ndarray): Sorted datetime64[D] trading dates.
+    - frequency (str): One of REBALANCE_FREQUENCIES.
+
+    Returns:
+    - ndarray: Boolean mask with the same length as dates.
+    """
+    if frequency not in REBALANCE_FREQUENCIES:
+        raise ValueError(f"Unknown rebalance frequency: {frequency}")
+    mask = np.zeros(len(dates), dtype=bool)
+    if len(dates) == 0:
+        return mask
+    if frequency == "daily":
+        mask[:] = True
+        return mask
+    if frequency != "none":
+        if frequency == "weekly":
+            # datetime64 day 0 is a Thursday; shift so weeks start on Monday
+            key = (dates.astype(np.int64) + 3) // 7
+        elif frequency == "monthly":
+            key = dates.astype("datetime64[M]").astype(np.int64)
+        elif frequency == "quarterly":
+            key = dates.astype("datetime64[M]").astype(np.int64) // 3
+        else:
+            key = dates.astype("datetime64[Y]").astype(np.int64)
+        mask[1:] = key[1:] != key[:-1]
+    mask[0] = True
+    return mask
+
+
+def cap_weights(weights, cap):
+    """
+    Normalise weights to sum to one with no single weight above cap.
+
+    Excess weight above the cap is redistributed pro rata across the
+    uncapped assets until no weight exceeds the cap. Works row-wise on a
+    2-D array (one row per rebalance).
+
+    Args:
+    - weights (ndarray): Non-negative weights, 1-D or 2-D.
+    - cap (float, optional): Maximum weight per asset as a fraction (0-1].
+
+    Returns:
+    - ndarray: Capped weights with the same shape as the input.
+    """
+    w = np.atleast_2d(np.asarray(weights, dtype=np.float64)).copy()
+    w[~np.isfinite(w) | (w < 0)] = 0.0
+    totals = w.sum(axis=1, keepdims=True)
+    w = np.divide(w, totals, out=np.zeros_like(w), where=totals > 0)
+
+    if cap is not None and 0 < cap < 1:
+        # Each pass pins at least one more asset to the cap, so this ends
+        # within n_assets passes; it is a loop over assets, not over days.
+        for _ in range(w.shape[1]):
+            over = w > cap + 1e-12
+            if not over.any():
+                break
+            pinned = w >= cap - 1e-12
+            excess = np.where(over, w - cap, 0.0).sum(axis=1, keepdims=True)
+            w = np.where(over, cap, w)
+            free = np.where(pinned, 0.0, w)
+            free_total = free.sum(axis=1, keepdims=True)
+            share = np.divide(free, free_total, out=np.zeros_like(free), where=free_total > 0)
+            w = w + share * excess
+    return w if np.ndim(weights) > 1 else w[0]
+
+
+def simulate(closes, weights, mask, initial_capital=DEFAULT_INITIAL_CAPITAL):
+    """
+    Run a rebalanced buy-and-hold simulation over a filled price matrix.
+
+    Between rebalances the share counts are fixed, so the equity on day t in
+    holding period k is E_k * (c_k + sum_i w_ki * P_ti / P_ri), where r is
+    the rebalance day that opened the period and c_k the unallocated cash
+    weight. Period-opening equities E_k are a cumulative product of the
+    period growth factors.
+
+    Args:
+    - closes (ndarray): Filled date x asset price matrix.
+    - weights (ndarray): Target weights, either one row for every rebalance
+      or a single row applied at every rebalance.
+    - mask (ndarray): Boolean rebalance mask from rebalance_mask().
+    - initial_capital (float): Starting portfolio value.
+
+    Returns:
+    - dict: equity (per day), shares (per rebalance x asset),
+      period_growth (per completed holding period) and rebalance_idx.
+    """
+    rebal = np.flatnonzero(mask)
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.ndim == 1:
+        weights = np.broadcast_to(weights, (len(rebal), closes.shape[1]))
+
+    # Weight not allocated to any asset (e.g. when caps bind) is held as cash
+    cash = 1.0 - weights.sum(axis=1)
+
+    period = np.cumsum(mask) - 1
+    anchor = rebal[period]
+
+    daily_growth = np.einsum("ij,ij->i", closes / closes[anchor], weights[period]) + cash[period]
+    period_growth = np.einsum(
+        "ij,ij->i", closes[rebal[1:]] / closes[rebal[:-1]], weights[:-1]
+    ) + cash[:-1]
+    period_start = initial_capital * np.concatenate(([1.0], np.cumprod(period_growth)))
+
+    equity = period_start[period] * daily_growth
+    shares = weights * period_start[:, None] / closes[rebal]
+    return {
+        "equity": equity,
+        "shares": shares,
+        "period_growth": period_growth,
+        "rebalance_idx": rebal,
+    }
+
+
+def extract_trades(shares, rebalance_idx, closes, min_quantity=1e-9):
+    """
+    Derive the trade list implied by consecutive rebalance holdings.
+
+    Returns:
+    - dict: Parallel arrays day_idx, asset_idx, quantity (signed) and price.
+    """
+    previous = np.vstack((np.zeros((1, shares.shape[1])), shares[:-1]))
+    delta = shares - previous
+    k, asset = np.nonzero(np.abs(delta) > min_quantity)
+    day = rebalance_idx[k]
+    return {
+        "day_idx": day,
+        "asset_idx": asset,
+        "quantity": delta[k, asset],
+        "price": closes[day, asset],
+    }
+
+
+def compute_metrics(equity, period_growth):
+    """
+    Summary statistics for an equity curve.
+
+    Sharpe ratio is annualised from daily returns with a zero risk-free
+    rate. Win rate is the share of completed holding periods that gained
+    value, falling back to up-days when there was a single period.
+
+    Returns:
+    - dict: total_return, annualized_return, volatility, sharpe_ratio,
+      max_drawdown (all as fractions) and win_rate.
+    """
+    if len(equity) == 0:
+        return {
+            "total_return": 0.0, "annualized_return": 0.0, "volatility": 0.0,
+            "sharpe_ratio": 0.0, "max_drawdown": 0.0, "win_rate": 0.0,
+        }
+    returns = equity[1:] / equity[:-1] - 1.0
+    total_return = equity[-1] / equity[0] - 1.0
+    years = max(len(returns), 1) / TRADING_DAYS_PER_YEAR
+
+    std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    sharpe = returns.mean() / std * np.sqrt(TRADING_DAYS_PER_YEAR) if std > 0 else 0.0
+    drawdown = equity / np.maximum.accumulate(equity) - 1.0
+
+    outcomes = period_growth - 1.0 if len(period_growth) > 1 else returns
+    win_rate = float((outcomes > 0).mean()) if len(outcomes) else 0.0
+
+    return {
+        "total_return": float(total_return),
+        "annualized_return": float((1.0 + total_return) ** (1.0 / years) - 1.0),
+        "volatility": float(std * np.sqrt(TRADING_DAYS_PER_YEAR)),
+        "sharpe_ratio": float(sharpe),
+        "max_drawdown": float(drawdown.min()),
+        "win_rate": win_rate,
+    }
+
+
+def momentum_weights(closes, mask, base_weights, lookback):
+    """
+    Tilt base weights towards assets with positive trailing returns.
+
+    At each rebalance day r the weight of asset i is proportional to
+    base_i * max(P_ri / P_(r-lookback)i - 1, 0). Rebalances where no asset
+    has a positive trailing return fall back to the base weights.
+
+    Args:
+    - closes (ndarray): Filled date x asset price matrix.
+    - mask (ndarray): Boolean rebalance mask.
+    - base_weights (ndarray): Weight per asset column.
+    - lookback (int): Trailing window in trading days.
+
+    Returns:
+    - ndarray: Unnormalised weights, one row per rebalance.
+    """
+    rebal = np.flatnonzero(mask)
+    past = np.maximum(rebal - lookback, 0)
+    trailing = closes[rebal] / closes[past] - 1.0
+    tilted = base_weights * np.clip(trailing, 0.0, None)
+    empty = ~(tilted > 0).any(axis=1)
+    tilted[empty] = base_weights
+    return tilted
+
+
+def prepare_prices(closes, base_weights):
+    """
+    Fill price gaps and drop assets that never trade in the window.
+
+    Returns:
+    - tuple: (filled matrix with unpriced columns set to 1.0, base weights
+      with unpriced assets zeroed).
+
+    Raises:
+    - ValueError: If no asset with a positive weight has any price.
+    """
+    filled = fill_prices(closes)
+    priced = ~np.isnan(filled).all(axis=0)
+    weights = np.where(priced, np.asarray(base_weights, dtype=np.float64), 0.0)
+    if filled.shape[0] == 0 or not (weights > 0).any():
+        raise ValueError("No price history available for the portfolio's assets in this date range")
+    return np.where(priced, filled, 1.0), weights
+
+
+def run_prepared(dates, filled, base_weights, rebalance="monthly", weight_cap=None,
+                 lookback=0, initial_capital=DEFAULT_INITIAL_CAPITAL, with_trades=True):
+    """
+    Backtest over a matrix already passed through prepare_prices().
+
+    Args:
+    - dates (ndarray): Sorted datetime64[D] trading dates.
+    - filled (ndarray): Filled date x asset price matrix.
+    - base_weights (ndarray): Target weight per asset column.
+    - rebalance (str): Rebalance frequency, see REBALANCE_FREQUENCIES.
+    - weight_cap (float, optional): Maximum weight per asset (0-1].
+    - lookback (int): Momentum lookback in trading days (0 keeps base weights).
+    - initial_capital (float): Starting portfolio value.
+    - with_trades (bool): Derive the trade list (skipped by parameter sweeps).
+
+    Returns:
+    - dict: dates, equity, trades (parallel arrays or None), metrics and final_value.
+    """
+    mask = rebalance_mask(dates, rebalance)
+    if lookback:
+        weights = cap_weights(momentum_weights(filled, mask, base_weights, lookback), weight_cap)
+    else:
+        weights = cap_weights(base_weights, weight_cap)
+
+    sim = simulate(filled, weights, mask, initial_capital)
+    trades = extract_trades(sim["shares"], sim["rebalance_idx"], filled) if with_trades else None
+    return {
+        "dates": dates,
+        "equity": sim["equity"],
+        "trades": trades,
+        "metrics": compute_metrics(sim["equity"], sim["period_growth"]),
+        "final_value": float(sim["equity"][-1]),
+    }
+
+
+def run_backtest(dates, closes, base_weights, rebalance="monthly", weight_cap=None,
+                 lookback=0, initial_capital=DEFAULT_INITIAL_CAPITAL):
+    """
+    Backtest a target-weight strategy over a date x asset price matrix.
+
+    Args:
+    - dates (ndarray): Sorted datetime64[D] trading dates.
+    - closes (ndarray): Raw close matrix (NaN where no bar exists).
+    - base_weights (array-like): Target weight per asset column.
+    - rebalance (str): Rebalance frequency, see REBALANCE_FREQUENCIES.
+    - weight_cap (float, optional): Maximum weight per asset (0-1].
+    - lookback (int): Momentum lookback in trading days (0 keeps base weights).
+    - initial_capital (float): Starting portfolio value.
+
+    Returns:
+    - dict: dates, equity, trades (parallel arrays), metrics and final_value.
+
+    Raises:
+    - ValueError: If there are no prices or no asset with a positive weight.
+    """
+    filled, weights = prepare_prices(closes, base_weights)
+    return run_prepared(
+        dates, filled, weights, rebalance=rebalance, weight_cap=weight_cap,
+        lookback=lookback, initial_capital=initial_capital,
+    )
+
+
+def load_portfolio_weights(cursor, portfolio_id):
+    """
+    Starting weights for a portfolio, taken from its positions' cost basis.
+
+    Returns:
+    - tuple: (asset_ids int64 array, tickers list, base_weights float64 array)
+      ordered by asset ID.
+    """
+    cursor.execute(
+        """
+        SELECT pos.assetID, pos.Quantity, pos.AvgCostBasis, a.TickerSymbol
+        FROM Position pos
+        JOIN Asset a ON pos.assetID = a.assetID
+        WHERE pos.portfolioID = %s
+        ORDER BY pos.assetID
+        """,
+        (portfolio_id,),
+    )
+    positions = cursor.fetchall()
+    asset_ids = np.array([p["assetID"] for p in positions], dtype=np.int64)
+    base_weights = np.array(
+        [float(p["Quantity"]) * float(p["AvgCostBasis"]) for p in positions], dtype=np.float64
+    )
+    return asset_ids, [p["TickerSymbol"] for p in positions], base_weights
+
+
+def load_weight_cap(cursor, strategy_id):
+    """
+    The strategy's 'Max Single Position' guideline as a fraction, or None.
+    """
+    cursor.execute(
+        """
+        SELECT MIN(targetValue) AS cap
+        FROM StrategyGuideline
+        WHERE strategyID = %s AND metricType = 'Max Single Position'
+        """,
+        (strategy_id,),
+    )
+    row = cursor.fetchone()
+    return float(row["cap"]) / 100.0 if row and row["cap"] is not None else None
+
+
+def load_backtest_inputs(cursor, backtest_id):
+    """
+    Load a stored backtest definition and everything needed to run it.
+
+    Args:
+    - cursor: A DictCursor on the Stratify database.
+    - backtest_id (int): Backtest.backtestID to load.
+
+    Returns:
+    - dict or None: The Backtest row joined with its strategy, plus
+      asset_ids, tickers, base_weights, weight_cap and the price matrix
+      (dates, closes); None if the backtest does not exist.
+    """
+    cursor.execute(
+        """
+        SELECT b.backtestID, b.startDate, b.endDate, b.finalValue, b.portfolioID,
+               b.strategyID, s.strategyName, s.investmentTerm
+        FROM Backtest b
+        JOIN InvestmentStrategy s ON b.strategyID = s.strategyID
+        WHERE b.backtestID = %s
+        """,
+        (backtest_id,),
+    )
+    backtest = cursor.fetchone()
+    if not backtest:
+        return None
+
+    asset_ids, tickers, base_weights = load_portfolio_weights(cursor, backtest["portfolioID"])
+    weight_cap = load_weight_cap(cursor, backtest["strategyID"])
+    dates, closes = load_prices(cursor, asset_ids, backtest["startDate"], backtest["endDate"])
+
+    backtest.update(
+        asset_ids=asset_ids,
+        tickers=tickers,
+        base_weights=base_weights,
+        weight_cap=weight_cap,
+        dates=dates,
+        closes=closes,
+    )
+    return backtest
+
+
+def load_prices(cursor, asset_ids, start_date, end_date):
+    """
+    Closes for the given assets as a date x asset matrix.
+
+    Served from the shared price store when it is enabled; otherwise read
+    straight from PriceHistory with the given cursor.
+
+    Returns:
+    - tuple: (dates datetime64[D] array, closes float64 matrix) with columns
+      in the order of asset_ids.
+    """
+    asset_ids = np.asarray(asset_ids, dtype=np.int64)
+    if len(asset_ids) == 0:
+        return np.array([], dtype="datetime64[D]"), np.empty((0, 0))
+
+    if price_store.enabled:
+        dates, _, closes, _ = price_store.matrix(asset_ids, start_date, end_date)
+        # Keep only dates on which at least one of these assets traded
+        traded = ~np.isnan(closes).all(axis=1)
+        return dates[traded], closes[traded]
+
+    placeholders = ", ".join(["%s"] * len(asset_ids))
+    cursor.execute(
+        LOAD_PRICES_SQL.format(placeholders=placeholders),
+        (*asset_ids.tolist(), start_date, end_date),
+    )
+    rows = cursor.fetchall()
+    dates, _, closes = build_price_matrix(
+        [r["assetID"] for r in rows],
+        [r["Date"] for r in rows],
+        [float(r["closePrice"]) for r in rows],
+        asset_ids=asset_ids,
+    )
+    return dates, closes
+
+
+def run_saved_backtest(conn, backtest_id, rebalance=None,
+                       initial_capital=DEFAULT_INITIAL_CAPITAL, progress=None):
+    """
+    Run a stored backtest end to end and persist its final value.
+
+    Args:
+    - conn: An open PyMySQL connection (DictCursor).
+    - backtest_id (int): Backtest.backtestID to run.
+    - rebalance (str, optional): Overrides the frequency implied by the
+      strategy's investmentTerm.
+    - initial_capital (float): Starting portfolio value.
+    - progress (callable, optional): Called with a fraction in [0, 1] as
+      the run advances.
+
+    Returns:
+    - dict or None: The backtest definition merged with run_backtest()
+      output; None if the backtest does not exist.
+    """
+    report = progress or (lambda fraction: None)
+    cursor = conn.cursor()
+    try:
+        inputs = load_backtest_inputs(cursor, backtest_id)
+        if inputs is None:
+            return None
+        report(0.5)
+
+        frequency = rebalance or TERM_REBALANCE.get(inputs["investmentTerm"], "monthly")
+        result = run_backtest(
+            inputs["dates"],
+            inputs["closes"],
+            inputs["base_weights"],
+            rebalance=frequency,
+            weight_cap=inputs["weight_cap"],
+            initial_capital=initial_capital,
+        )
+        report(0.9)
+
+        cursor.execute(
+            "UPDATE Backtest SET finalValue = %s WHERE backtestID = %s",
+            (round(result["final_value"], 2), backtest_id),
+        )
+        conn.commit()
+        report(1.0)
+    finally:
+        cursor.close()
+
+    result.update(inputs)
+    result["rebalance"] = frequency
+    result["initial_capital"] = initial_capital
+    return result
+
+
+def serialize_result(result, max_trades=500):
+    """
+    Shape an engine result into the JSON payload served by /backtest/results.
+
+    Args:
+    - result (dict): Output of run_saved_backtest().
+    - max_trades (int): Most recent trades to include in the trade log.
+
+    Returns:
+    - dict: JSON-serialisable backtest report.
+    """
+    metrics = result["metrics"]
+    trades = result["trades"]
+    dates = result["dates"].astype(str)
+    tickers = np.asarray(result["tickers"], dtype=object)
+
+    start = max(len(trades["day_idx"]) - max_trades, 0)
+    trade_log = [
+        {
+            "date": dates[day],
+            "symbol": tickers[asset],
+            "side": "BUY" if qty > 0 else "SELL",
+            "price": round(float(price), 2),
+            "qty": round(abs(float(qty)), 4),
+        }
+        for day, asset, qty, price in zip(
+            trades["day_idx"][start:].tolist(),
+            trades["asset_idx"][start:].tolist(),
+            trades["quantity"][start:].tolist(),
+            trades["price"][start:].tolist(),
+        )
+    ]
+
+    return {
+        "id": result["backtestID"],
+        "strategy": result["strategyName"],
+        "portfolioID": result["portfolioID"],
+        "rebalance": result["rebalance"],
+        "initial_capital": result["initial_capital"],
+        "final_value": round(result["final_value"], 2),
+        "dates": dates.tolist(),
+        "equity_curve": np.round(result["equity"], 2).tolist(),
+        "metrics": {
+            "total_return": f"{metrics['total_return'] * 100:.2f}%",
+            "annualized_return": f"{metrics['annualized_return'] * 100:.2f}%",
+            "volatility": f"{metrics['volatility'] * 100:.2f}%",
+            "sharpe_ratio": round(metrics["sharpe_ratio"], 2),
+            "max_drawdown": f"{metrics['max_drawdown'] * 100:.1f}%",
+            "win_rate": f"{metrics['win_rate'] * 100:.0f}%",
+        },
+        "trade_count": int(len(trades["day_idx"])),
+        "trades": trade_log,
+    }
@@ -0,0 +1,168 @@
+# Background execution of backtests.
+#
+# POST /backtest/backtests writes the Backtest row and hands the run to a
+# worker pool owned by this module, so API threads return immediately and
+# clients poll /backtest/backtests/<id>/status for progress. Progress and
+# results are kept in this process; the run's status and error are also
+# written to Backtest.runStatus / runError so other processes can report
+# them.
+import logging
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.backtests import engine
+from backend.db_connection import db
+
+logger = logging.getLogger("backtests")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+# Stored backtests with no recorded run status (created before runStatus
+# existed, or never queued), so their outcome is not known
+UNKNOWN = "unknown"
+# Longest runError message stored
+MAX_ERROR_LENGTH = 1000
+
+
+class BacktestJobQueue:
+    """
+    In-process queue of backtest runs executed on a dedicated worker pool.
+
+    Job state lives in memory and is keyed by Backtest.backtestID. Only the
+    most recent finished jobs keep their full result payload.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_finished = 50
+
+    def init_app(self, app):
+        """
+        Start the worker pool using BACKTEST_WORKERS and BACKTEST_MAX_FINISHED_JOBS.
+
+        Args:
+        - app (Flask): The Flask application instance workers run under.
+        """
+        app.config.setdefault("BACKTEST_WORKERS", 2)
+        app.config.setdefault("BACKTEST_MAX_FINISHED_JOBS", 50)
+        self.app = app
+        self._max_finished = app.config["BACKTEST_MAX_FINISHED_JOBS"]
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config["BACKTEST_WORKERS"],
+            thread_name_prefix="backtest-worker",
+        )
+
+    def submit(self, backtest_id, name, rebalance=None,
+               initial_capital=engine.DEFAULT_INITIAL_CAPITAL):
+        """
+        Queue a stored backtest for execution.
+
+        Args:
+        - backtest_id (int): The Backtest row to run.
+        - name (str): Display name for the job.
+        - rebalance (str, optional): Rebalance frequency override.
+        - initial_capital (float): Starting portfolio value.
+
+        Returns:
+        - dict: A snapshot of the queued job.
+        """
+        job = {
+            "backtestID": backtest_id,
+            "name": name,
+            "status": QUEUED,
+            "progress": 0.0,
+            "rebalance": rebalance,
+            "initial_capital": initial_capital,
+            "submittedAt": time.time(),
+            "startedAt": None,
+            "finishedAt": None,
+            "error": None,
+            "result": None,
+        }
+        with self._lock:
+            self._jobs[backtest_id] = job
+            self._jobs.move_to_end(backtest_id)
+        self._executor.submit(self._run, job)
+        return self.describe(job)
+
+    def get(self, backtest_id):
+        """Return the tracked job for a backtest, or None."""
+        with self._lock:
+            return self._jobs.get(backtest_id)
+
+    def describe(self, job):
+        """Public, JSON-serialisable view of a job without its result payload."""
+        with self._lock:
+            return {k: v for k, v in job.items() if k != "result"}
+
+    def _set(self, job, **fields):
+        with self._lock:
+            job.update(fields)
+
+    def _run(self, job):
+        backtest_id = job["backtestID"]
+        self._set(job, status=RUNNING, startedAt=time.time(), progress=0.1)
+        self._record(backtest_id, RUNNING)
+        try:
+            with self.app.app_context():
+                with db.connection() as conn:
+                    result = engine.run_saved_backtest(
+                        conn,
+                        backtest_id,
+                        rebalance=job["rebalance"],
+                        initial_capital=job["initial_capital"],
+                        progress=lambda fraction: self._set(job, progress=round(fraction, 2)),
+                    )
+            if result is None:
+                raise LookupError(f"Backtest {backtest_id} no longer exists")
+            self._set(
+                job,
+                status=DONE,
+                progress=1.0,
+                finishedAt=time.time(),
+                finalValue=round(result["final_value"], 2),
+                result=engine.serialize_result(result),
+            )
+            self._record(backtest_id, DONE)
+            logger.info(f"Backtest job {backtest_id} finished")
+        except Exception as e:
+            self._set(job, status=FAILED, finishedAt=time.time(), error=str(e))
+            self._record(backtest_id, FAILED, str(e))
+            logger.error(f"Backtest job {backtest_id} failed: {e}\n{traceback.format_exc()}")
+        finally:
+            self._trim()
+
+    def _record(self, backtest_id, status, error=None):
+        # Persist the run status; a failure here must not fail the run itself
+        try:
+            with self.app.app_context():
+                with db.connection() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        cursor.execute(
+                            "UPDATE Backtest SET runStatus = %s, runError = %s WHERE backtestID = %s",
+                            (status, error and error[:MAX_ERROR_LENGTH], backtest_id),
+                        )
+                        conn.commit()
+                    finally:
+                        cursor.close()
+        except Exception as e:
+            logger.error(f"Could not record status {status} of backtest job {backtest_id}: {e}")
+
+    def _trim(self):
+        # Drop the oldest finished jobs once more than _max_finished are kept
+        with self._lock:
+            finished = [k for k, j in self._jobs.items() if j["status"] in (DONE, FAILED)]
+            for key in finished[: max(len(finished) - self._max_finished, 0)]:
+                del self._jobs[key]
+
+
+backtest_jobs = BacktestJobQueue()
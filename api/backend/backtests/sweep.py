@@ -0,0 +1,177 @@
+# Parameter sweeps (grid search) over a shared price matrix.
+#
+# The parent process loads and fills the price matrix once and writes it to
+# a temporary directory. Worker processes memory-map it read-only, so
+# every combination runs against the same physical pages instead of each
+# worker re-querying MySQL or receiving its own pickled copy.
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from backend.backtests import engine
+
+MAX_COMBINATIONS = 1000
+RANKABLE_METRICS = ("sharpe_ratio", "total_return", "annualized_return", "max_drawdown", "win_rate")
+
+# Grid keys and the default used when a key is left out of the request
+GRID_DEFAULTS = {
+    "lookback": [0],
+    "rebalance": ["monthly"],
+    "weight_cap": [None],
+}
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+# Worker-side cache of the most recently mapped sweep inputs
+_mapped = {}
+
+
+def expand_grid(grid):
+    """
+    Expand a parameter grid into the list of combinations to run.
+
+    Args:
+    - grid (dict): Lists of values for lookback, rebalance and weight_cap.
+      Scalars are treated as single-value lists.
+
+    Returns:
+    - list: One dict per combination.
+
+    Raises:
+    - ValueError: On unknown keys, invalid values or too many combinations.
+    """
+    unknown = set(grid) - set(GRID_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}")
+
+    axes = {}
+    for key, default in GRID_DEFAULTS.items():
+        values = grid.get(key, default)
+        axes[key] = values if isinstance(values, list) and values else [values]
+
+    for value in axes["rebalance"]:
+        if value not in engine.REBALANCE_FREQUENCIES:
+            raise ValueError(f"Invalid rebalance frequency: {value}")
+    try:
+        axes["lookback"] = [int(v or 0) for v in axes["lookback"]]
+        axes["weight_cap"] = [None if v is None else float(v) for v in axes["weight_cap"]]
+    except TypeError:
+        raise ValueError("lookback and weight_cap values must be numbers")
+    if any(v < 0 for v in axes["lookback"]):
+        raise ValueError("lookback must be non-negative")
+
+    combos = [dict(zip(axes, values)) for values in itertools.product(*axes.values())]
+    if len(combos) > MAX_COMBINATIONS:
+        raise ValueError(f"Sweep has {len(combos)} combinations; the limit is {MAX_COMBINATIONS}")
+    return combos
+
+
+def get_executor(workers=None):
+    """
+    Shared process pool used for sweeps, created on first use.
+
+    Workers are started with the 'spawn' method so they never inherit the
+    API's threads, locks or open database sockets.
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None:
+            _executor_workers = workers or os.cpu_count() or 1
+            _executor = ProcessPoolExecutor(
+                max_workers=_executor_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def run_sweep(dates, closes, base_weights, combos, initial_capital=engine.DEFAULT_INITIAL_CAPITAL,
+              rank_by="sharpe_ratio", workers=None):
+    """
+    Run every parameter combination and rank the results.
+
+    Args:
+    - dates (ndarray): Sorted datetime64[D] trading dates.
+    - closes (ndarray): Raw close matrix (NaN where no bar exists).
+    - base_weights (ndarray): Starting weight per asset column.
+    - combos (list): Output of expand_grid().
+    - initial_capital (float): Starting portfolio value.
+    - rank_by (str): Metric to sort by; max_drawdown ranks least negative first.
+    - workers (int, optional): Process pool size on first use.
+
+    Returns:
+    - list: One row per combination with its parameters, metrics,
+      final value and 1-based rank.
+    """
+    if rank_by not in RANKABLE_METRICS:
+        raise ValueError(f"Cannot rank by {rank_by}")
+    filled, weights = engine.prepare_prices(closes, base_weights)
+
+    workdir = tempfile.mkdtemp(prefix="stratify-sweep-")
+    try:
+        np.save(os.path.join(workdir, "prices.npy"), filled)
+        np.save(os.path.join(workdir, "dates.npy"), dates)
+        np.save(os.path.join(workdir, "weights.npy"), weights)
+
+        executor = get_executor(workers)
+        chunksize = max(1, len(combos) // (_executor_workers * 4))
+        tasks = [(workdir, combo, initial_capital) for combo in combos]
+        try:
+            results = list(executor.map(_run_combo, tasks, chunksize=chunksize))
+        except BrokenProcessPool:
+            _reset_executor()
+            raise
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results.sort(key=lambda row: row["metrics"][rank_by], reverse=True)
+    for rank, row in enumerate(results, start=1):
+        row["rank"] = rank
+    return results
+
+
+def _load_mapped(workdir):
+    if workdir not in _mapped:
+        _mapped.clear()
+        _mapped[workdir] = (
+            np.load(os.path.join(workdir, "dates.npy")),
+            np.load(os.path.join(workdir, "prices.npy"), mmap_mode="r"),
+            np.load(os.path.join(workdir, "weights.npy")),
+        )
+    return _mapped[workdir]
+
+
+def _run_combo(task):
+    workdir, combo, initial_capital = task
+    dates, filled, weights = _load_mapped(workdir)
+    result = engine.run_prepared(
+        dates,
+        filled,
+        weights,
+        rebalance=combo["rebalance"],
+        weight_cap=combo["weight_cap"],
+        lookback=combo["lookback"],
+        initial_capital=initial_capital,
+        with_trades=False,
+    )
+    return {
+        "params": combo,
+        "metrics": result["metrics"],
+        "final_value": round(result["final_value"], 2),
+    }
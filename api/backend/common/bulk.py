@@ -0,0 +1,202 @@
+# Batch variants of the create routes.
+#
+# A batch is a JSON array of row objects in the target table's columns (or
+# an object holding that array under the route's key). Every item is
+# validated before anything is written, foreign keys are checked with one IN
+# query per referenced table, and the rows are written as multi-row INSERTs
+# in one transaction. Either every item is written or none is.
+import time
+
+from flask import jsonify
+from pymysql.cursors import RE_INSERT_VALUES
+
+# Most items accepted by one batch request
+MAX_BULK_ITEMS = 5000
+# Rows per multi-row INSERT; keeps each statement well below max_allowed_packet
+ROWS_PER_STATEMENT = 1000
+# Item errors reported in a 400 response
+MAX_REPORTED_ERRORS = 50
+
+
+def read_items(body, key):
+    """
+    The items of a batch request body.
+
+    Args:
+    - body: Parsed JSON body, a list of items or an object with the list under key.
+    - key (str): Name of the list in an object body, e.g. 'positions'.
+
+    Returns:
+    - list: The items.
+
+    Raises:
+    - ValueError: If the body holds no list, an empty one or more than MAX_BULK_ITEMS items.
+    """
+    items = body.get(key) if isinstance(body, dict) else body
+    if not isinstance(items, list) or not items:
+        raise ValueError(f"Body must be a non-empty JSON array or an object with a '{key}' array")
+    if len(items) > MAX_BULK_ITEMS:
+        raise ValueError(f"At most {MAX_BULK_ITEMS} items per batch, got {len(items)}")
+    return items
+
+
+def parse_items(items, parse):
+    """
+    Validate every item of a batch.
+
+    Args:
+    - items (list): Items from read_items().
+    - parse (callable): Returns an item's normalized form or raises ValueError.
+
+    Returns:
+    - tuple: (parsed, errors); parsed holds one entry per item (None when
+      invalid) and errors one {"index", "error"} dict per invalid item.
+    """
+    parsed, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Each item must be a JSON object")
+            parsed.append(parse(item))
+        except ValueError as e:
+            parsed.append(None)
+            errors.append({"index": index, "error": str(e)})
+    return parsed, errors
+
+
+def require_fields(item, fields):
+    """Raise ValueError naming the first of fields missing from item."""
+    for field in fields:
+        if item.get(field) is None:
+            raise ValueError(f"Missing required field: {field}")
+
+
+def existing(cursor, table, column, values):
+    """
+    Which of some key values exist in a table, in one query per chunk.
+
+    Args:
+    - cursor (Cursor): DictCursor to read with.
+    - table (str): Table name.
+    - column (str): Key column.
+    - values (iterable): Key values to look up.
+
+    Returns:
+    - set: The values found.
+    """
+    values = list(set(values))
+    found = set()
+    for start in range(0, len(values), ROWS_PER_STATEMENT):
+        chunk = values[start:start + ROWS_PER_STATEMENT]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})", chunk)
+        found.update(row[column] for row in cursor.fetchall())
+    return found
+
+
+def check_exists(cursor, parsed, errors, field, table, label, column=None):
+    """
+    Report items whose field names a row missing from table.
+
+    Items whose field is None reference nothing and are not checked.
+
+    Args:
+    - cursor (Cursor): DictCursor to read with.
+    - parsed (list): Items from parse_items(); None entries are skipped.
+    - errors (list): Error list from parse_items(), extended in place.
+    - field (str): Item field holding the key, e.g. 'portfolioID'.
+    - table (str): Referenced table.
+    - label (str): Name used in messages, e.g. 'Portfolio'.
+    - column (str, optional): Key column in table; defaults to field.
+    """
+    keys = {item[field] for item in parsed if item is not None and item[field] is not None}
+    found = existing(cursor, table, column or field, keys)
+    for index, item in enumerate(parsed):
+        if item is not None and item[field] is not None and item[field] not in found:
+            errors.append({"index": index, "error": f"{label} not found: {item[field]}"})
+
+
+def insert_many(cursor, sql, rows):
+    """
+    Insert rows with multi-row INSERTs and return their auto-increment ids.
+
+    A multi-row INSERT whose row count is known up front reserves a
+    consecutive block of ids, so each statement's ids follow from its
+    lastrowid. The statements are built here rather than by executemany,
+    which splits long batches at the cursor's max_stmt_length and leaves
+    only the last statement's lastrowid.
+
+    Args:
+    - cursor (Cursor): Cursor of the caller's transaction.
+    - sql (str): Single-row INSERT ... VALUES (%s, ...) statement.
+    - rows (list): Parameter tuples.
+
+    Returns:
+    - list: The new ids, in row order.
+    """
+    ids = []
+    for statement, count in _insert_statements(cursor, sql, rows):
+        cursor.execute(statement)
+        ids.extend(range(cursor.lastrowid, cursor.lastrowid + count))
+    return ids
+
+
+def _insert_statements(cursor, sql, rows):
+    # (statement, row count) pairs of at most ROWS_PER_STATEMENT rows and
+    # max_stmt_length encoded bytes each, like executemany would send
+    match = RE_INSERT_VALUES.match(sql)
+    if match is None:
+        raise ValueError("insert_many needs an INSERT ... VALUES (%s, ...) statement")
+    prefix, template, postfix = match.group(1) % (), match.group(2).rstrip(), match.group(3) or ""
+    encoding = cursor.connection.encoding
+    overhead = len(prefix.encode(encoding)) + len(postfix.encode(encoding))
+    values, size = [], overhead
+    for row in rows:
+        value = cursor.mogrify(template, row)
+        length = len(value.encode(encoding)) + 1
+        if values and (len(values) == ROWS_PER_STATEMENT or size + length > cursor.max_stmt_length):
+            yield prefix + ",".join(values) + postfix, len(values)
+            values, size = [], overhead
+        values.append(value)
+        size += length
+    if values:
+        yield prefix + ",".join(values) + postfix, len(values)
+
+
+def execute_many(cursor, sql, rows):
+    """Run executemany in ROWS_PER_STATEMENT chunks, for rows without ids to return."""
+    for start in range(0, len(rows), ROWS_PER_STATEMENT):
+        cursor.executemany(sql, rows[start:start + ROWS_PER_STATEMENT])
+
+
+def invalid(errors, total):
+    """400 response listing the invalid items of a batch."""
+    errors = sorted(errors, key=lambda error: error["index"])
+    return jsonify({
+        "success": False,
+        "error": f"{len({error['index'] for error in errors})} of {total} items are invalid; nothing was written",
+        "errors": errors[:MAX_REPORTED_ERRORS],
+        "status_code": 400
+    }), 400
+
+
+def created(message, items, started):
+    """
+    201 response with per-item results.
+
+    Args:
+    - message (str): Summary message.
+    - items (list): One result dict per item, in request order.
+    - started (float): time.perf_counter() when the request started.
+    """
+    elapsed = time.perf_counter() - started
+    return jsonify({
+        "success": True,
+        "data": {
+            "message": message,
+            "count": len(items),
+            "items": items,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(len(items) / elapsed) if elapsed > 0 else None,
+        }
+    }), 201
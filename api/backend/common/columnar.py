@@ -0,0 +1,229 @@
+# Columnar (Apache Arrow IPC / Parquet) responses for analytics clients.
+#
+# The Streamlit pages turn every list they fetch into a DataFrame. Sending
+# those lists as Arrow record batches instead of JSON objects skips the
+# per-value encode and decode on both ends, and the client reads the body
+# straight into columns. pyarrow is optional: without it the formats are
+# simply not offered and clients get JSON.
+import json
+import time
+
+from flask import Response, current_app, request, stream_with_context
+from pymysql import Error
+from pymysql.constants import FIELD_TYPE
+
+from backend.common.metrics import metrics
+from backend.db_connection import db
+from backend.db_connection.timing import TimedSSDictCursor
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # columnar formats are disabled
+    pa = pq = None
+
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MIMETYPE = "application/vnd.apache.parquet"
+FORMATS = {"arrow": ARROW_MIMETYPE, "parquet": PARQUET_MIMETYPE}
+
+# Rows per record batch (and Parquet row group) when streaming a query
+COLUMNAR_BATCH_SIZE = 65536
+
+# MySQL column types -> Arrow types. DECIMAL becomes float64, which is
+# what a DataFrame wants; anything unlisted is sent as a string.
+_INTEGER_TYPES = (
+    FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.INT24, FIELD_TYPE.LONG,
+    FIELD_TYPE.LONGLONG, FIELD_TYPE.YEAR,
+)
+_FLOAT_TYPES = (FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE, FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL)
+_DATE_TYPES = (FIELD_TYPE.DATE, FIELD_TYPE.NEWDATE)
+_TIMESTAMP_TYPES = (FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP)
+
+
+def wants_columnar():
+    """
+    The columnar format the client asked for, or None for JSON.
+
+    Either ?format=arrow|parquet or an Accept header that prefers
+    application/vnd.apache.arrow.stream or application/vnd.apache.parquet
+    over application/json selects a columnar response. Always None when
+    pyarrow is not installed.
+    """
+    if pa is None:
+        return None
+    fmt = request.args.get("format", "").lower()
+    if fmt in FORMATS:
+        return fmt
+    best = request.accept_mimetypes.best_match(["application/json", ARROW_MIMETYPE, PARQUET_MIMETYPE])
+    for name, mimetype in FORMATS.items():
+        if best == mimetype:
+            return name
+    return None
+
+
+def arrow_type(type_code):
+    """The Arrow type used for a column of the given MySQL FIELD_TYPE."""
+    if type_code in _INTEGER_TYPES:
+        return pa.int64()
+    if type_code in _FLOAT_TYPES:
+        return pa.float64()
+    if type_code in _DATE_TYPES:
+        return pa.date32()
+    if type_code in _TIMESTAMP_TYPES:
+        return pa.timestamp("us")
+    if type_code == FIELD_TYPE.TIME:
+        return pa.duration("us")
+    return pa.string()
+
+
+def result_columns(description):
+    """(name, pyarrow type) pairs for the columns of a cursor.description."""
+    return [(column[0], arrow_type(column[1])) for column in description]
+
+
+def _array(values, type_):
+    try:
+        return pa.array(values, type=type_)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Decimal (and other non-native) values: infer, then cast
+        return pa.array(values).cast(type_)
+
+
+def record_batch(rows, schema):
+    """
+    Build a RecordBatch from row dicts.
+
+    Args:
+    - rows (list): Dicts keyed by the schema's field names.
+    - schema (Schema): Column names and types; keys missing from a row are null.
+
+    Returns:
+    - RecordBatch: One column per schema field.
+    """
+    return pa.RecordBatch.from_arrays(
+        [_array([row.get(field.name) for row in rows], field.type) for field in schema],
+        schema=schema,
+    )
+
+
+def _schema(columns, metadata):
+    fields = [pa.field(name, type_) for name, type_ in columns]
+    encoded = {key: json.dumps(value, default=str) for key, value in (metadata or {}).items()}
+    return pa.schema(fields, metadata=encoded or None)
+
+
+class _Chunks:
+    """Write-only file object whose contents are drained into the response."""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _writer(fmt, sink, schema):
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, schema, compression="snappy")
+    return pa.ipc.new_stream(sink, schema)
+
+
+def table_response(rows, columns, fmt, metadata=None):
+    """
+    Send rows that are already in memory as an Arrow stream or Parquet file.
+
+    Args:
+    - rows (list): Row dicts.
+    - columns (list): (name, pyarrow type) pairs in column order.
+    - fmt (str): 'arrow' or 'parquet', from wants_columnar().
+    - metadata (dict, optional): Extra JSON-encodable values stored in the
+      schema metadata, e.g. a report's summary figures.
+
+    Returns:
+    - Response: The encoded table.
+    """
+    started = time.perf_counter()
+    schema = _schema(columns, metadata)
+    sink = _Chunks()
+    writer = _writer(fmt, sink, schema)
+    if rows:
+        writer.write_batch(record_batch(rows, schema))
+    writer.close()
+    body = sink.drain()
+    metrics.record_serialize(time.perf_counter() - started)
+    return Response(body, mimetype=FORMATS[fmt])
+
+
+def stream_table(query, params, fmt, transform=None, extra_columns=()):
+    """
+    Run a query and stream its rows as an Arrow stream or Parquet file.
+
+    Like stream_rows(), the query runs on the request's pooled connection
+    through an unbuffered server-side cursor, and every matching row is
+    sent in record batches of COLUMNAR_BATCH_SIZE rows. Column types come
+    from the query's result metadata, so even an empty result has a schema.
+
+    Args:
+    - query (str): The SELECT to run, including its ORDER BY.
+    - params (list): Query parameters.
+    - fmt (str): 'arrow' or 'parquet', from wants_columnar().
+    - transform (callable, optional): Applied to each batch of rows before
+      it is encoded; must not touch the database.
+    - extra_columns (tuple): (name, pyarrow type) pairs for keys the
+      transform adds.
+
+    Returns:
+    - Response: A chunked response. A database error after the first chunk
+      aborts the transfer, so the client sees a truncated body rather than
+      a well-formed partial table.
+    """
+    current_app.logger.debug(f"Streaming {fmt} query: {query} with params: {params}")
+    cursor = db.get_db().cursor(TimedSSDictCursor)
+    cursor.execute(query, params)
+    schema = _schema(result_columns(cursor.description) + list(extra_columns), None)
+
+    def generate():
+        count = 0
+        sink = _Chunks()
+        try:
+            writer = _writer(fmt, sink, schema)
+            while True:
+                rows = cursor.fetchmany(COLUMNAR_BATCH_SIZE)
+                if not rows:
+                    break
+                if transform is not None:
+                    rows = transform(rows)
+                count += len(rows)
+                started = time.perf_counter()
+                writer.write_batch(record_batch(rows, schema))
+                chunk = sink.drain()
+                metrics.record_serialize(time.perf_counter() - started)
+                yield chunk
+            writer.close()
+            yield sink.drain()
+        except Error as e:
+            current_app.logger.error(f"Database error while streaming {fmt}: {str(e)}")
+            raise
+        finally:
+            cursor.close()
+            current_app.logger.info(f"Streamed {count} rows as {fmt}")
+
+    return Response(stream_with_context(generate()), mimetype=FORMATS[fmt])
@@ -0,0 +1,117 @@
+# Negotiated response compression (brotli / gzip).
+#
+# JSON, NDJSON and Arrow bodies shrink several-fold when compressed. The
+# encoding is picked from the request's Accept-Encoding: brotli when the
+# client prefers it and the brotli package is installed, gzip otherwise.
+# Buffered responses smaller than COMPRESS_MIN_SIZE are sent as they are;
+# streamed responses are compressed chunk by chunk and flushed after every
+# chunk, so rows still reach the client as soon as they are read.
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Parquet is already compressed internally, so it is left alone
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/vnd.apache.arrow.stream",
+}
+
+
+def register_compression(app):
+    """
+    Compress responses the client accepts an encoding for.
+
+    Reads COMPRESS_LEVEL (gzip level 1-9, 0 disables compression),
+    COMPRESS_BROTLI_QUALITY (0-11) and COMPRESS_MIN_SIZE (bytes) from the
+    app config. Register it before any other after_request hook that reads
+    or replaces the body (e.g. register_etag_fallback), since Flask runs
+    those hooks in reverse order and this one must see the final body.
+
+    Args:
+    - app (Flask): The Flask application instance to attach to.
+    """
+    app.config.setdefault("COMPRESS_LEVEL", 6)
+    app.config.setdefault("COMPRESS_BROTLI_QUALITY", 4)
+    app.config.setdefault("COMPRESS_MIN_SIZE", 1024)
+    level = app.config["COMPRESS_LEVEL"]
+    quality = app.config["COMPRESS_BROTLI_QUALITY"]
+    min_size = app.config["COMPRESS_MIN_SIZE"]
+    if not 0 <= level <= 9:
+        raise ValueError("COMPRESS_LEVEL must be between 0 and 9")
+    if not 0 <= quality <= 11:
+        raise ValueError("COMPRESS_BROTLI_QUALITY must be between 0 and 11")
+    if level == 0:
+        return
+
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add("Accept-Encoding")
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+        encoding = request.accept_encodings.best_match(offered)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            chunks = response.response
+            if hasattr(chunks, "close"):
+                response.call_on_close(chunks.close)
+            if encoding == "br":
+                response.response = _brotli_stream(chunks, quality)
+            else:
+                response.response = _gzip_stream(chunks, level)
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < min_size:
+                return response
+            if encoding == "br":
+                response.set_data(brotli.compress(body, quality=quality))
+            else:
+                response.set_data(_gzip_bytes(body, level))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+
+def _gzip_bytes(data, level):
+    """Gzip-compress a complete body."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _encoded(chunks):
+    for chunk in chunks:
+        yield chunk.encode() if isinstance(chunk, str) else chunk
+
+
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in _encoded(chunks):
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _brotli_stream(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in _encoded(chunks):
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
@@ -0,0 +1,89 @@
+# HTTP conditional requests (ETag / If-None-Match / 304).
+#
+# Endpoints whose data is covered by CacheVersion counters use @versioned:
+# the ETag is derived from the counters and the request, so a matching
+# If-None-Match is answered with 304 before the view runs - no query and
+# no JSON serialization. Every other JSON GET gets a content-hash ETag
+# after the fact, which still saves the transfer.
+import datetime
+import hashlib
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+from backend.common import versions
+from backend.db_connection import db
+
+NO_CACHE = "no-cache"
+
+
+def versioned(*names, max_age=None):
+    """
+    Decorate a GET view whose output only changes with the named versions.
+
+    Args:
+    - names (str): CacheVersion data sets the view reads, e.g. 'reference'.
+      With none, the output depends on the request alone.
+    - max_age (int, optional): Seconds clients may reuse the response
+      without revalidating; by default they revalidate every time.
+    """
+    cache_control = f"public, max-age={max_age}" if max_age else NO_CACHE
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(*args, **kwargs)
+
+            current = versions.clock.get(db.get_db, names) if names else ()
+            etag = _etag(current)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers["Cache-Control"] = cache_control
+            response.vary.update(("Accept", "Accept-Encoding"))
+            return response
+        return wrapper
+    return decorator
+
+
+def _etag(current):
+    # Views may depend on today's date (e.g. YTD figures), so tags roll over daily
+    key = repr((
+        request.endpoint,
+        sorted(request.view_args.items()),
+        sorted(request.args.items(multi=True)),
+        request.headers.get("Accept", ""),
+        current,
+        datetime.date.today().isoformat(),
+    ))
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def register_etag_fallback(app):
+    """
+    Give every other successful JSON GET a content-hash ETag.
+
+    The view still runs, but an unchanged body is answered with an empty
+    304 instead of being sent again.
+
+    Args:
+    - app (Flask): The Flask application instance to attach to.
+    """
+    @app.after_request
+    def add_content_etag(response):
+        if (
+            request.method in ("GET", "HEAD")
+            and response.status_code == 200
+            and not response.is_streamed
+            and response.mimetype == "application/json"
+            and "ETag" not in response.headers
+        ):
+            response.add_etag(weak=True)
+            response.headers.setdefault("Cache-Control", NO_CACHE)
+            response.make_conditional(request)
+        return response
@@ -0,0 +1,91 @@
+# Micro-benchmark: Flask's default JSON provider vs FastJSONProvider.
+#
+# Serializes a synthetic PriceHistory payload (one dict per bar, as PyMySQL
+# returns it) with each encoder and reports the best of several runs.
+# Needs no database. Run from the api directory:
+#   python -m backend.common.json_benchmark [--rows 100000] [--repeat 5]
+import argparse
+import datetime
+import sys
+import time
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from backend.common import json_provider
+from backend.common.json_provider import FastJSONProvider
+
+
+def price_rows(count):
+    """count PriceHistory rows shaped like the get_price_history query output."""
+    start = datetime.date(2015, 1, 1)
+    rows = []
+    for i in range(count):
+        close = Decimal(100 + (i % 5000) / 100).quantize(Decimal("0.01"))
+        rows.append({
+            "Date": start + datetime.timedelta(days=i % 4000),
+            "openPrice": close - Decimal("0.50"),
+            "highPrice": close + Decimal("1.25"),
+            "lowPrice": close - Decimal("1.10"),
+            "closePrice": close,
+            "adjClosePrice": None,
+            "Volume": 1_000_000 + i,
+            "assetID": 1 + i // 4000,
+        })
+    return {"success": True, "data": rows, "next_cursor": None}
+
+
+def best_time(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(fn())
+        times.append(time.perf_counter() - started)
+    return min(times), size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.common.json_benchmark")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    payload = price_rows(args.rows)
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+
+    cases = [("flask default (current)", lambda: default.dumps(payload).encode())]
+    if json_provider.orjson is not None:
+        cases.append(("fast provider, orjson", lambda: fast.dump_bytes(payload)))
+
+    def stdlib():
+        saved, json_provider.orjson = json_provider.orjson, None
+        try:
+            return fast.dump_bytes(payload)
+        finally:
+            json_provider.orjson = saved
+    cases.append(("fast provider, json fallback", stdlib))
+
+    # Whole responses as the API sends them; backend_app.py runs with
+    # debug=True, where both providers pretty-print
+    app.debug = True
+    cases.append(("flask default response, debug", lambda: default.response(payload).get_data()))
+    cases.append(("fast provider response, debug", lambda: fast.response(payload).get_data()))
+
+    print(f"{args.rows:,} PriceHistory rows, best of {args.repeat}")
+    baseline = None
+    with app.app_context():
+        for label, fn in cases:
+            seconds, size = best_time(fn, args.repeat)
+            baseline = baseline or seconds
+            print(
+                f"  {label:<30} {seconds * 1000:9.1f} ms  {args.rows / seconds:>12,.0f} rows/s"
+                f"  {size / 1e6:6.1f} MB  x{baseline / seconds:.1f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
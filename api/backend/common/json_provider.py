@@ -0,0 +1,105 @@
+# JSON provider for API responses.
+#
+# PyMySQL rows are full of Decimal, date and datetime values. Flask's
+# default provider sends each of them through a Python-level default hook
+# and turns Decimals into strings and datetimes into HTTP dates. This
+# provider serializes row lists with orjson when it is installed (falling
+# back to the standard library otherwise), writes dates as ISO 8601 and
+# encodes Decimals as numbers or strings according to JSON_DECIMAL_AS.
+import dataclasses
+import datetime
+import decimal
+import json
+import time
+import uuid
+
+from flask.json.provider import DefaultJSONProvider
+
+from backend.common.metrics import metrics
+
+try:
+    import orjson
+except ImportError:  # the standard library encoder is used instead
+    orjson = None
+
+DECIMAL_MODES = ("float", "string")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    orjson-backed JSON provider with configurable Decimal handling.
+
+    Reads JSON_DECIMAL_AS ('float' or 'string') from the app config. Keys
+    keep their column order instead of being sorted.
+    """
+
+    sort_keys = False
+
+    def __init__(self, app):
+        super().__init__(app)
+        app.config.setdefault("JSON_DECIMAL_AS", "float")
+        mode = app.config["JSON_DECIMAL_AS"]
+        if mode not in DECIMAL_MODES:
+            raise ValueError(f"JSON_DECIMAL_AS must be one of {', '.join(DECIMAL_MODES)}")
+        self.decimal = float if mode == "float" else str
+
+    @property
+    def backend(self):
+        return "orjson" if orjson is not None else "json"
+
+    def default(self, o):
+        """Encode the types neither encoder handles natively."""
+        if isinstance(o, decimal.Decimal):
+            return self.decimal(o)
+        if isinstance(o, (datetime.date, datetime.time)):
+            return o.isoformat()
+        if isinstance(o, datetime.timedelta):
+            return o.total_seconds()
+        if isinstance(o, uuid.UUID):
+            return str(o)
+        if dataclasses.is_dataclass(o) and not isinstance(o, type):
+            return dataclasses.asdict(o)
+        if hasattr(o, "tolist"):  # NumPy scalars and arrays on the fallback path
+            return o.tolist()
+        if hasattr(o, "__html__"):
+            return str(o.__html__())
+        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+    def dump_bytes(self, obj, sort_keys=None, indent=False):
+        """
+        Serialize to UTF-8 bytes, the form responses are sent in.
+
+        Args:
+        - obj: Value to encode; lists of row dicts are encoded directly.
+        - sort_keys (bool, optional): Override the provider's sort_keys.
+        - indent (bool, optional): Pretty-print with two-space indentation.
+        """
+        sort_keys = self.sort_keys if sort_keys is None else sort_keys
+        if orjson is not None:
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            if sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=self.default, option=option)
+        return json.dumps(
+            obj, default=self.default, ensure_ascii=False, sort_keys=sort_keys,
+            indent=2 if indent else None, separators=(",", ": ") if indent else (",", ":"),
+        ).encode()
+
+    def dumps(self, obj, **kwargs):
+        return self.dump_bytes(obj, kwargs.get("sort_keys")).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        started = time.perf_counter()
+        obj = self._prepare_response_obj(args, kwargs)
+        # Pretty-printed in debug mode unless compact is set, as Flask does
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        body = self.dump_bytes(obj, indent=indent)
+        metrics.record_serialize(time.perf_counter() - started)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
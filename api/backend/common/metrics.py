@@ -0,0 +1,301 @@
+# Per-endpoint request metrics.
+#
+# Every request is timed from before_request until its response has been
+# sent (for streamed responses, until the last chunk). Along the way the
+# timed cursors, the JSON provider and the connection pool add the time
+# spent in MySQL, encoding the body and waiting for a pooled connection.
+# Totals are kept per (blueprint, endpoint, method, status) as Prometheus
+# histograms and counters, plus a window of recent latencies per blueprint
+# for percentiles. Everything is in-process; each worker reports its own.
+import bisect
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from flask import g, has_app_context, request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Counters kept per series besides the latency histogram: (attribute, metric, help)
+COUNTERS = (
+    ("db_seconds", "stratify_db_seconds_total", "Time spent executing queries and fetching rows."),
+    ("queries", "stratify_db_queries_total", "Statements executed."),
+    ("rows", "stratify_db_rows_total", "Rows fetched from MySQL."),
+    ("serialize_seconds", "stratify_serialize_seconds_total", "Time spent encoding response bodies."),
+    ("pool_wait_seconds", "stratify_db_pool_wait_seconds_total", "Time spent borrowing a pooled connection."),
+    ("response_bytes", "stratify_http_response_bytes_total", "Response body bytes sent."),
+)
+
+
+class RequestTimer:
+    """What one request has spent so far, kept in flask.g."""
+
+    __slots__ = ("started", "db_seconds", "queries", "rows", "serialize_seconds",
+                 "pool_wait_seconds", "response_bytes")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.serialize_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.response_bytes = 0
+
+
+class _Series:
+    """Histogram and counters of one (blueprint, endpoint, method, status)."""
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.serialize_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.response_bytes = 0
+
+    def add(self, seconds, timer):
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        if index < len(self.buckets):
+            self.buckets[index] += 1
+        self.count += 1
+        self.seconds += seconds
+        for name, _, _ in COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(timer, name))
+
+
+class RequestMetrics:
+    """Process-wide request metrics registry."""
+
+    def __init__(self):
+        self.window = 2048
+        self._series = {}
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Time every request. Reads METRICS_ENABLED and METRICS_WINDOW (recent
+        latencies kept per blueprint for percentiles).
+
+        Register it before the other after_request hooks (compression, ETags)
+        so it runs last and counts the bytes actually sent.
+
+        Args:
+        - app (Flask): The Flask application instance to attach to.
+        """
+        app.config.setdefault("METRICS_ENABLED", True)
+        app.config.setdefault("METRICS_WINDOW", 2048)
+        self.window = app.config["METRICS_WINDOW"]
+        if not app.config["METRICS_ENABLED"]:
+            return
+        app.before_request(self._start)
+        app.after_request(self._finish_response)
+
+    # -- recording --------------------------------------------------------
+
+    @staticmethod
+    def current():
+        """The RequestTimer of the request being handled, or None."""
+        return g.get("_request_timer") if has_app_context() else None
+
+    def record_db(self, seconds, queries=0, rows=0):
+        """Add database time, statements and fetched rows to the current request."""
+        timer = self.current()
+        if timer is not None:
+            timer.db_seconds += seconds
+            timer.queries += queries
+            timer.rows += rows
+
+    def record_serialize(self, seconds):
+        """Add body-encoding time to the current request."""
+        timer = self.current()
+        if timer is not None:
+            timer.serialize_seconds += seconds
+
+    def record_pool_wait(self, seconds):
+        """Add connection-pool borrow time to the current request."""
+        timer = self.current()
+        if timer is not None:
+            timer.pool_wait_seconds += seconds
+
+    def _start(self):
+        g._request_timer = RequestTimer()
+
+    def _finish_response(self, response):
+        timer = g.pop("_request_timer", None)
+        if timer is None:
+            return response
+        key = (
+            request.blueprint or "app",
+            request.endpoint or "unmatched",
+            request.method,
+            str(response.status_code),
+        )
+        if response.is_streamed:
+            # Streams keep reading rows after this hook; finish when sent
+            chunks = response.response
+            if hasattr(chunks, "close"):
+                response.call_on_close(chunks.close)
+            response.response = _counted(chunks, timer)
+            response.call_on_close(lambda: self._observe(key, timer))
+        else:
+            timer.response_bytes = response.content_length or 0
+            self._observe(key, timer)
+        return response
+
+    def _observe(self, key, timer):
+        seconds = time.perf_counter() - timer.started
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            series.add(seconds, timer)
+            recent = self._recent.get(key[0])
+            if recent is None:
+                recent = self._recent[key[0]] = deque(maxlen=self.window)
+            recent.append((seconds, timer.db_seconds, timer.serialize_seconds))
+
+    # -- reporting --------------------------------------------------------
+
+    def summary(self):
+        """
+        Latency percentiles and totals per blueprint.
+
+        Returns:
+        - list: One dict per blueprint with request and error (5xx) counts,
+          p50/p95/p99 latency over the recent window, average DB,
+          serialization and pool-wait time (ms), rows fetched and response
+          bytes; slowest p95 first.
+        """
+        with self._lock:
+            series = list(self._series.items())
+            recent = {name: list(window) for name, window in self._recent.items()}
+
+        totals = {}
+        for (blueprint, _, _, status), s in series:
+            total = totals.setdefault(blueprint, {
+                "requests": 0, "errors": 0, "rows": 0, "response_bytes": 0, "pool_wait_seconds": 0.0,
+            })
+            total["requests"] += s.count
+            if status.startswith("5"):
+                total["errors"] += s.count
+            total["rows"] += s.rows
+            total["response_bytes"] += s.response_bytes
+            total["pool_wait_seconds"] += s.pool_wait_seconds
+
+        rows = []
+        for blueprint, total in totals.items():
+            samples = np.array(recent.get(blueprint) or [(0.0, 0.0, 0.0)])
+            p50, p95, p99 = np.percentile(samples[:, 0], [50, 95, 99]) * 1000
+            rows.append({
+                "blueprint": blueprint,
+                "requests": total["requests"],
+                "errors": total["errors"],
+                "p50_ms": round(float(p50), 2),
+                "p95_ms": round(float(p95), 2),
+                "p99_ms": round(float(p99), 2),
+                "avg_db_ms": round(float(samples[:, 1].mean()) * 1000, 2),
+                "avg_serialize_ms": round(float(samples[:, 2].mean()) * 1000, 2),
+                "avg_pool_wait_ms": round(total["pool_wait_seconds"] * 1000 / total["requests"], 2),
+                "rows": total["rows"],
+                "response_bytes": total["response_bytes"],
+            })
+        rows.sort(key=lambda row: row["p95_ms"], reverse=True)
+        return rows
+
+    def prometheus(self, pool_stats=None):
+        """
+        All series in the Prometheus text exposition format.
+
+        Args:
+        - pool_stats (dict, optional): db.stats(); numeric values are added
+          as stratify_db_pool_* gauges and each replica's lag and health as
+          stratify_db_replica_* gauges.
+
+        Returns:
+        - str: The exposition text.
+        """
+        with self._lock:
+            series = sorted(self._series.items())
+            snapshot = [(key, _copy(s)) for key, s in series]
+
+        lines = [
+            "# HELP stratify_http_request_duration_seconds Request latency until the response was sent.",
+            "# TYPE stratify_http_request_duration_seconds histogram",
+        ]
+        for key, s in snapshot:
+            labels = _labels(key)
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, s.buckets):
+                cumulative += count
+                lines.append(f'stratify_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'stratify_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {s.count}')
+            lines.append(f"stratify_http_request_duration_seconds_sum{{{labels}}} {s.seconds:.6f}")
+            lines.append(f"stratify_http_request_duration_seconds_count{{{labels}}} {s.count}")
+
+        for attribute, metric, help_text in COUNTERS:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for key, s in snapshot:
+                lines.append(f"{metric}{{{_labels(key)}}} {getattr(s, attribute)}")
+
+        for name, value in (pool_stats or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE stratify_db_pool_{name} gauge")
+                lines.append(f"stratify_db_pool_{name} {value}")
+
+        replicas = (pool_stats or {}).get("replicas") or []
+        if replicas:
+            lines.append("# HELP stratify_db_replica_lag_seconds Last measured replication lag (-1 when unknown).")
+            lines.append("# TYPE stratify_db_replica_lag_seconds gauge")
+            for replica in replicas:
+                lag = replica["lag_seconds"]
+                lines.append(f'stratify_db_replica_lag_seconds{{host="{_escape(replica["host"])}"}} {-1 if lag is None else lag}')
+            lines.append("# TYPE stratify_db_replica_healthy gauge")
+            for replica in replicas:
+                lines.append(f'stratify_db_replica_healthy{{host="{_escape(replica["host"])}"}} {int(replica["healthy"])}')
+            lines.append("# TYPE stratify_db_replica_reads_total counter")
+            for replica in replicas:
+                lines.append(f'stratify_db_replica_reads_total{{host="{_escape(replica["host"])}"}} {replica["reads"]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        with self._lock:
+            self._series.clear()
+            self._recent.clear()
+
+
+def _copy(series):
+    copy = _Series()
+    copy.__dict__.update(series.__dict__)
+    copy.buckets = list(series.buckets)
+    return copy
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key):
+    blueprint, endpoint, method, status = key
+    return (
+        f'blueprint="{_escape(blueprint)}",endpoint="{_escape(endpoint)}",'
+        f'method="{method}",status="{status}"'
+    )
+
+
+def _counted(chunks, timer):
+    for chunk in chunks:
+        timer.response_bytes += len(chunk)
+        yield chunk
+
+
+metrics = RequestMetrics()
@@ -0,0 +1,166 @@
+# Keyset (cursor) pagination shared by the list endpoints.
+#
+# Pages are addressed by the sort key of the last row already returned
+# instead of an OFFSET, so with an index on the sort columns the database
+# seeks straight to the next page and page N costs the same as page 1.
+import base64
+import binascii
+import datetime
+import decimal
+import json
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def encode_cursor(values):
+    """Encode a row's sort-key values as an opaque, URL-safe cursor."""
+    raw = json.dumps(list(values), default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, size):
+    """
+    Decode a cursor produced by encode_cursor().
+
+    Args:
+    - token (str): The cursor from a previous response's next_cursor.
+    - size (int): Number of sort-key values the endpoint expects.
+
+    Returns:
+    - list: The sort-key values of the last row on the previous page.
+
+    Raises:
+    - ValueError: If the cursor is malformed or belongs to another endpoint.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+class Keyset:
+    """
+    The sort key of one list endpoint.
+
+    Args:
+    - columns (tuple): SQL expressions to order by, most significant first.
+      The last one must be unique so the order is total.
+    - fields (tuple): Keys of the same values in the result rows.
+    - descending (bool): Newest/largest first when True.
+    """
+
+    def __init__(self, columns, fields, descending=False):
+        self.columns = tuple(columns)
+        self.fields = tuple(fields)
+        self.descending = descending
+
+    def page(self, args):
+        """
+        Read the after= and limit= query parameters.
+
+        Args:
+        - args (MultiDict): request.args of the current request.
+
+        Returns:
+        - Page: The requested page.
+
+        Raises:
+        - ValueError: If limit is not a positive integer or the cursor is invalid.
+        """
+        try:
+            limit = int(args.get("limit", DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            raise ValueError("limit must be an integer")
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        after = args.get("after")
+        values = decode_cursor(after, len(self.columns)) if after else None
+        return Page(self, values, min(limit, MAX_LIMIT))
+
+
+class Page:
+    """One page of a Keyset-ordered query."""
+
+    def __init__(self, keyset, after, limit):
+        self.keyset = keyset
+        self.after = after
+        self.limit = limit
+
+    def clause(self, limit=True):
+        """
+        SQL to append after the endpoint's WHERE filters.
+
+        Selects rows past the cursor (nothing extra on the first page), orders
+        by the keyset and fetches one row more than the limit so finish()
+        can tell whether another page exists.
+
+        Args:
+        - limit (bool): False leaves out the LIMIT, e.g. for streamed exports.
+
+        Returns:
+        - tuple: (SQL fragment, params).
+        """
+        sql, params = "", []
+        if self.after is not None:
+            op = "<" if self.keyset.descending else ">"
+            columns = ", ".join(self.keyset.columns)
+            placeholders = ", ".join(["%s"] * len(self.after))
+            sql += f" AND ({columns}) {op} ({placeholders})"
+            params += list(self.after)
+        direction = " DESC" if self.keyset.descending else ""
+        sql += " ORDER BY " + ", ".join(f"{column}{direction}" for column in self.keyset.columns)
+        if limit:
+            sql += " LIMIT %s"
+            params.append(self.limit + 1)
+        return sql, params
+
+    def select(self, rows):
+        """
+        Apply the page to rows already in keyset order, e.g. from a cache.
+
+        Returns:
+        - tuple: (rows for this page, next_cursor or None on the last page).
+
+        Raises:
+        - ValueError: If the cursor's values do not match the row keys.
+        """
+        if self.after is not None:
+            after = tuple(self.after)
+            fields = self.keyset.fields
+            key = lambda row: tuple(row[field] for field in fields)
+            try:
+                if self.keyset.descending:
+                    rows = [row for row in rows if key(row) < after]
+                else:
+                    rows = [row for row in rows if key(row) > after]
+            except TypeError:
+                raise ValueError("Invalid cursor")
+        return self.finish(rows[: self.limit + 1])
+
+    def finish(self, rows):
+        """
+        Trim the extra row and build the cursor for the next page.
+
+        Returns:
+        - tuple: (rows for this page, next_cursor or None on the last page).
+        """
+        if len(rows) <= self.limit:
+            return list(rows), None
+        rows = list(rows[: self.limit])
+        last = rows[-1]
+        return rows, encode_cursor(last[field] for field in self.keyset.fields)
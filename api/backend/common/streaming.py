@@ -0,0 +1,77 @@
+# Streaming (NDJSON) responses for list endpoints.
+#
+# Rows are read through an unbuffered server-side cursor and written to the
+# client in small batches as they arrive, so memory use stays flat no matter
+# how many rows the query returns.
+import time
+
+from flask import Response, current_app, request, stream_with_context
+from pymysql import Error
+
+from backend.common.metrics import metrics
+from backend.db_connection import db
+from backend.db_connection.timing import TimedSSDictCursor
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 1000
+
+
+def wants_stream():
+    """
+    True when the client asked for a streamed response.
+
+    Either ?stream=1 or an Accept header that prefers application/x-ndjson
+    over application/json selects streaming.
+    """
+    if request.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    best = request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def stream_rows(query, params, transform=None):
+    """
+    Run a query and stream its rows as newline-delimited JSON.
+
+    The query runs on the request's pooled connection with an SSDictCursor;
+    the connection stays checked out until the last row has been sent.
+
+    Args:
+    - query (str): The SELECT to run, including its ORDER BY.
+    - params (list): Query parameters.
+    - transform (callable, optional): Applied to each batch of rows before
+      it is written; must not touch the database, whose connection is busy
+      with the stream.
+
+    Returns:
+    - Response: A chunked application/x-ndjson response. A database error
+      after the first chunk ends the stream with a final
+      {"success": false, "error": ...} line.
+    """
+    current_app.logger.debug(f"Streaming query: {query} with params: {params}")
+    cursor = db.get_db().cursor(TimedSSDictCursor)
+    cursor.execute(query, params)
+
+    def generate():
+        count = 0
+        dumps = current_app.json.dump_bytes
+        try:
+            while True:
+                rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    break
+                if transform is not None:
+                    rows = transform(rows)
+                count += len(rows)
+                started = time.perf_counter()
+                chunk = b"".join(dumps(row) + b"\n" for row in rows)
+                metrics.record_serialize(time.perf_counter() - started)
+                yield chunk
+        except Error as e:
+            current_app.logger.error(f"Database error while streaming: {str(e)}")
+            yield dumps({"success": False, "error": str(e), "status_code": 500}) + b"\n"
+        finally:
+            cursor.close()
+            current_app.logger.info(f"Streamed {count} rows")
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,107 @@
+# Shared version counters for cached data.
+#
+# Each cached data set has a row in CacheVersion. Writers bump its counter
+# in the same transaction as their change; readers in any worker compare it
+# with the version they cached to decide whether to reload. Reading a
+# counter is a primary-key lookup, cheap enough to do every second.
+import threading
+import time
+
+BUMP_SQL = """
+INSERT INTO CacheVersion (name, version) VALUES (%s, 1)
+ON DUPLICATE KEY UPDATE version = version + 1
+"""
+
+
+def bump(cursor, name):
+    """
+    Advance a data set's version inside the caller's transaction.
+
+    This process's clock drops its cached counter once the transaction
+    commits; until then other connections still read the old version.
+
+    Args:
+    - cursor (Cursor): Cursor of the transaction making the change.
+    - name (str): Data set name, e.g. 'reference'.
+    """
+    cursor.execute(BUMP_SQL, (name,))
+    after_commit = getattr(cursor.connection, "after_commit", None)
+    if after_commit is None:
+        # Connections outside the API pool (CLI tools) have no clock readers to wait for
+        clock.forget(name)
+    else:
+        after_commit(lambda: clock.forget(name))
+
+
+def current(cursor, names):
+    """
+    Current versions of some data sets.
+
+    Args:
+    - cursor (Cursor): DictCursor to read with.
+    - names (list): Data set names.
+
+    Returns:
+    - dict: name -> version; data sets never bumped report 0.
+    """
+    placeholders = ", ".join(["%s"] * len(names))
+    cursor.execute(f"SELECT name, version FROM CacheVersion WHERE name IN ({placeholders})", list(names))
+    found = {row["name"]: row["version"] for row in cursor.fetchall()}
+    return {name: found.get(name, 0) for name in names}
+
+
+class VersionClock:
+    """
+    Per-process view of CacheVersion counters.
+
+    Counters are re-read at most every poll_interval seconds, so most
+    callers get their versions without a query. Bumps made in this process
+    are seen as soon as their transaction commits.
+    """
+
+    def __init__(self, poll_interval=1.0):
+        self.poll_interval = poll_interval
+        self._values = {}
+        self._forgets = {}
+        self._lock = threading.Lock()
+
+    def get(self, connect, names):
+        """
+        Current versions of some data sets.
+
+        Args:
+        - connect (callable): Returns a connection; only called when a
+          counter has to be re-read.
+        - names (list): Data set names.
+
+        Returns:
+        - tuple: Versions in the order of names.
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = [self._values.get(name) for name in names]
+            forgets = [self._forgets.get(name, 0) for name in names]
+        if all(c is not None and now - c[1] < self.poll_interval for c in cached):
+            return tuple(c[0] for c in cached)
+
+        cursor = connect().cursor()
+        try:
+            latest = current(cursor, names)
+        finally:
+            cursor.close()
+        with self._lock:
+            for name, forgotten in zip(names, forgets):
+                # A counter forgotten while this read was in flight may have
+                # been read before the bump committed; don't cache it
+                if self._forgets.get(name, 0) == forgotten:
+                    self._values[name] = (latest[name], now)
+        return tuple(latest[name] for name in names)
+
+    def forget(self, name):
+        """Drop a cached counter so the next get() re-reads it."""
+        with self._lock:
+            self._values.pop(name, None)
+            self._forgets[name] = self._forgets.get(name, 0) + 1
+
+
+clock = VersionClock()
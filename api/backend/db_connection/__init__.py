@@ -1,8 +1,237 @@
 # This file creates a shared DB connection resource
-from flaskext.mysql import MySQL
-from pymysql import cursors
+import time
+from contextlib import contextmanager
+from functools import wraps
 
+import pymysql
+from flask import g, has_request_context, request
 
-# the parameter instructs the connection to return data 
-# as a dictionary object. 
-db = MySQL(cursorclass=cursors.DictCursor)
\ No newline at end of file
+from backend.common.metrics import metrics
+from backend.db_connection.pool import ConnectionPool, PoolTimeout
+from backend.db_connection.replicas import Replica, ReplicaSet
+from backend.db_connection.timing import TimedDictCursor
+
+# Requests that may be answered from a replica
+READ_METHODS = ("GET", "HEAD")
+
+# Request header that pins a read to the primary (read-your-writes)
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes"
+
+# Seconds to wait when opening a replica connection, so a dead replica is
+# skipped quickly instead of holding the request for the full MySQL timeout
+REPLICA_CONNECT_TIMEOUT = 2
+
+
+class Connection(pymysql.connections.Connection):
+    """
+    PyMySQL connection that runs callbacks after its transaction commits.
+
+    Code inside a transaction registers work that must only happen once the
+    change is visible to other connections, e.g. dropping a cached version
+    counter, with after_commit(). A rollback discards it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.pending_commit_callbacks = []
+        super().__init__(*args, **kwargs)
+
+    def after_commit(self, callback):
+        """Call callback() after the current transaction commits."""
+        self.pending_commit_callbacks.append(callback)
+
+    def commit(self):
+        super().commit()
+        callbacks, self.pending_commit_callbacks = self.pending_commit_callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        self.pending_commit_callbacks = []
+        super().rollback()
+
+
+class PooledMySQL:
+    """
+    Drop-in replacement for flaskext.mysql.MySQL backed by a ConnectionPool.
+
+    get_db() borrows one connection per application context and the
+    teardown handler hands it back to the pool, so blueprints keep calling
+    db.get_db().cursor() exactly as before. When read replicas are
+    configured, GET and HEAD requests borrow from a replica instead; see
+    _pool_for_request().
+    """
+
+    def __init__(self, app=None, prefix="mysql", **connect_args):
+        self.connect_args = connect_args
+        self.prefix = prefix
+        self.app = None
+        self.pool = None
+        self.replicas = ReplicaSet([])
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Read MYSQL_DATABASE_*, MYSQL_POOL_* and MYSQL_REPLICA_* settings and
+        build the primary and replica pools.
+
+        Args:
+        - app (Flask): The Flask application instance to attach to.
+        """
+        self.app = app
+        app.config.setdefault("MYSQL_DATABASE_HOST", "localhost")
+        app.config.setdefault("MYSQL_DATABASE_PORT", 3306)
+        app.config.setdefault("MYSQL_DATABASE_USER", None)
+        app.config.setdefault("MYSQL_DATABASE_PASSWORD", None)
+        app.config.setdefault("MYSQL_DATABASE_DB", None)
+        app.config.setdefault("MYSQL_DATABASE_CHARSET", "utf8mb4")
+        app.config.setdefault("MYSQL_POOL_MIN_SIZE", 2)
+        app.config.setdefault("MYSQL_POOL_MAX_SIZE", 10)
+        app.config.setdefault("MYSQL_POOL_TIMEOUT", 10.0)
+        app.config.setdefault("MYSQL_POOL_IDLE_TIMEOUT", 300.0)
+        app.config.setdefault("MYSQL_POOL_MAX_LIFETIME", 3600.0)
+        app.config.setdefault("MYSQL_POOL_PING_INTERVAL", 0.0)
+        app.config.setdefault("MYSQL_REPLICA_HOSTS", [])
+        app.config.setdefault("MYSQL_REPLICA_MAX_LAG", 5.0)
+        app.config.setdefault("MYSQL_REPLICA_LAG_CHECK", 2.0)
+
+        self.pool = self._new_pool(self.connect)
+        self.replicas.close()
+        self.replicas = ReplicaSet(
+            [
+                Replica(host, port, self._new_pool(self._replica_connect(host, port)))
+                for host, port in app.config["MYSQL_REPLICA_HOSTS"]
+            ],
+            max_lag=app.config["MYSQL_REPLICA_MAX_LAG"],
+            check_interval=app.config["MYSQL_REPLICA_LAG_CHECK"],
+        )
+        app.teardown_appcontext(self.teardown)
+
+    def _new_pool(self, connect):
+        config = self.app.config
+        return ConnectionPool(
+            connect,
+            min_size=config["MYSQL_POOL_MIN_SIZE"],
+            max_size=config["MYSQL_POOL_MAX_SIZE"],
+            timeout=config["MYSQL_POOL_TIMEOUT"],
+            idle_timeout=config["MYSQL_POOL_IDLE_TIMEOUT"],
+            max_lifetime=config["MYSQL_POOL_MAX_LIFETIME"],
+            ping_interval=config["MYSQL_POOL_PING_INTERVAL"],
+        )
+
+    def connect(self, **overrides):
+        """Open a new physical connection using the app configuration."""
+        config = self.app.config
+        args = dict(self.connect_args)
+        args.update(
+            host=config["MYSQL_DATABASE_HOST"],
+            port=config["MYSQL_DATABASE_PORT"],
+            user=config["MYSQL_DATABASE_USER"],
+            password=config["MYSQL_DATABASE_PASSWORD"] or "",
+            database=config["MYSQL_DATABASE_DB"],
+            charset=config["MYSQL_DATABASE_CHARSET"],
+        )
+        args.update(overrides)
+        return Connection(**args)
+
+    def _replica_connect(self, host, port):
+        def connect():
+            return self.connect(host=host, port=port, connect_timeout=REPLICA_CONNECT_TIMEOUT)
+        return connect
+
+    def get_db(self):
+        """
+        Return the connection bound to the current application context.
+
+        The first call in a context borrows a connection, from a replica for
+        reads and from the primary otherwise; later calls reuse it until the
+        context is torn down.
+        """
+        key = f"_{self.prefix}_conn"
+        conn = g.get(key)
+        if conn is None:
+            started = time.perf_counter()
+            pool, replica = self.pool, self._replica_for_request()
+            if replica is not None:
+                try:
+                    conn = replica.pool.acquire()
+                    pool = replica.pool
+                    replica.reads += 1
+                except pymysql.Error as e:
+                    replica.mark_down(e)
+            if conn is None:
+                conn = self.pool.acquire()
+            metrics.record_pool_wait(time.perf_counter() - started)
+            setattr(g, key, conn)
+            setattr(g, f"_{self.prefix}_pool", pool)
+        return conn
+
+    def _replica_for_request(self):
+        """
+        The replica the current request may read from, or None for the primary.
+
+        Only GET and HEAD requests read from a replica, and only when the
+        view is not marked with use_primary and the client did not send a
+        truthy X-Read-Your-Writes header (as it should right after a write
+        whose result it is about to display). Outside a request, e.g. in
+        background workers, the primary is always used.
+        """
+        if not self.replicas or not has_request_context():
+            return None
+        if request.method not in READ_METHODS or g.get("_use_primary"):
+            return None
+        if request.headers.get(READ_YOUR_WRITES_HEADER, "").lower() in ("1", "true", "yes"):
+            return None
+        return self.replicas.choose()
+
+    def teardown(self, exception):
+        conn = g.pop(f"_{self.prefix}_conn", None)
+        pool = g.pop(f"_{self.prefix}_pool", self.pool)
+        if conn is not None:
+            pool.release(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection outside of a request, e.g. from a background worker.
+
+        Yields:
+        - pymysql.connections.Connection: Returned to the pool on exit.
+        """
+        conn = self.pool.acquire()
+        try:
+            yield conn
+        finally:
+            self.pool.release(conn)
+
+    def stats(self):
+        """
+        Primary pool usage counters (see ConnectionPool.stats()), plus a
+        'replicas' list with each replica's lag, health and pool counters
+        when replicas are configured.
+        """
+        stats = self.pool.stats() if self.pool else {}
+        if self.replicas:
+            stats["replicas"] = self.replicas.stats()
+        return stats
+
+
+def use_primary(view):
+    """
+    Send every query of a GET view to the primary.
+
+    For read endpoints that also write, or whose results are cached without
+    an expiry, where a lagging replica would hand back stale rows. Place it
+    directly below the route decorator so it runs before anything else
+    borrows the request's connection.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g._use_primary = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# the parameter instructs the connection to return data
+# as a dictionary object; the timed variant feeds the request metrics.
+db = PooledMySQL(cursorclass=TimedDictCursor)
@@ -0,0 +1,124 @@
+# EXPLAIN-based regression check for the hot route queries.
+#
+# Each entry is a route's own query: its base SELECT, one of its filters
+# and its keyset's ORDER BY / LIMIT, built from the constants the route
+# uses, and names the index it must use. The check fails when MySQL picks
+# another access path or falls back to a filesort, e.g. after an index is
+# dropped or a route's query drifts away from its index.
+#
+# Run from the api directory after migrating:
+#   python -m backend.db_connection.index_check
+import sys
+
+from backend.alerts.alert_routes import ALERT_KEYSET, LIST_ALERTS_SQL
+from backend.assets.asset_routes import ASSET_KEYSET, LIST_ASSETS_SQL, PRICE_HISTORY_KEYSET, PRICE_HISTORY_SQL
+from backend.audit.audit_routes import AUDIT_KEYSET, LIST_AUDIT_EVENTS_SQL
+from backend.backtests.engine import LOAD_PRICES_SQL
+from backend.db_connection.migrations import connect_from_env
+from backend.portfolios.portfolio_routes import LIST_PORTFOLIOS_SQL, PORTFOLIO_KEYSET
+from backend.transactions.transaction_routes import LIST_TRANSACTIONS_SQL, TRANSACTION_KEYSET
+
+
+def _first_page(keyset, query, params, limit=True):
+    # The query a route runs for its first page (limit=False: a streamed export)
+    page_sql, page_params = keyset.page({}).clause(limit=limit)
+    return query + page_sql, tuple(params) + tuple(page_params)
+
+
+# (label, (query, params), table as EXPLAIN names it, expected index)
+ROUTE_QUERIES = [
+    (
+        "assets.get_price_history",
+        _first_page(PRICE_HISTORY_KEYSET, PRICE_HISTORY_SQL, (1,)),
+        "PriceHistory", "PRIMARY",
+    ),
+    (
+        "backtests.load_prices",
+        (LOAD_PRICES_SQL.format(placeholders="%s, %s"), (1, 2, "2020-01-01", "2024-12-31")),
+        "PriceHistory", "PRIMARY",
+    ),
+    (
+        "transactions.get_transactions",
+        _first_page(TRANSACTION_KEYSET, LIST_TRANSACTIONS_SQL, ()),
+        "Transaction", "idx_transaction_date",
+    ),
+    (
+        "transactions.get_transactions?portfolioID",
+        _first_page(TRANSACTION_KEYSET, LIST_TRANSACTIONS_SQL + " AND portfolioID = %s", (1,)),
+        "Transaction", "idx_transaction_portfolio_date",
+    ),
+    (
+        "alerts.get_alerts",
+        _first_page(ALERT_KEYSET, LIST_ALERTS_SQL, ()),
+        "a", "idx_alert_trigger",
+    ),
+    (
+        "alerts.get_alerts?portfolioID",
+        _first_page(ALERT_KEYSET, LIST_ALERTS_SQL + " AND a.portfolioID = %s", (1,)),
+        "a", "idx_alert_portfolio_trigger",
+    ),
+    (
+        "audit.get_audit_events?startDate",
+        _first_page(AUDIT_KEYSET, LIST_AUDIT_EVENTS_SQL + " AND eventTime >= %s", ("2024-01-01",)),
+        "AuditEvent", "idx_auditevent_time",
+    ),
+    (
+        "audit.get_audit_events?userID",
+        _first_page(AUDIT_KEYSET, LIST_AUDIT_EVENTS_SQL + " AND UserID = %s", (1,)),
+        "AuditEvent", "idx_auditevent_user_time",
+    ),
+    (
+        "portfolios.get_all_portfolios?userID",
+        _first_page(PORTFOLIO_KEYSET, LIST_PORTFOLIOS_SQL + " AND p.userID = %s", (1,)),
+        "p", "idx_portfolio_user_created",
+    ),
+    (
+        "assets.get_all_assets?sectorID&stream",
+        _first_page(ASSET_KEYSET, LIST_ASSETS_SQL + " AND a.sectorID = %s", (1,), limit=False),
+        "a", "idx_asset_sector_ticker",
+    ),
+]
+
+
+def check(conn):
+    """
+    EXPLAIN every entry of ROUTE_QUERIES.
+
+    Args:
+    - conn (Connection): A DictCursor connection.
+
+    Returns:
+    - list: One dict per query with label, expected, key, extra and ok.
+    """
+    results = []
+    cursor = conn.cursor()
+    for label, (query, params), table, expected in ROUTE_QUERIES:
+        cursor.execute("EXPLAIN " + query, params)
+        plan = [row for row in cursor.fetchall() if row["table"] == table]
+        key = plan[0]["key"] if plan else None
+        extra = (plan[0]["Extra"] or "") if plan else ""
+        results.append({
+            "label": label,
+            "expected": expected,
+            "key": key,
+            "extra": extra,
+            "ok": key == expected and "filesort" not in extra,
+        })
+    cursor.close()
+    return results
+
+
+def main():
+    conn = connect_from_env()
+    try:
+        results = check(conn)
+    finally:
+        conn.close()
+    for r in results:
+        mark = "ok  " if r["ok"] else "FAIL"
+        print(f"{mark} {r['label']}: key={r['key']} expected={r['expected']} {r['extra']}")
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
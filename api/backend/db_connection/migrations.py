@@ -0,0 +1,301 @@
+# Versioned schema migrations.
+#
+# Migration files live in api/migrations and are named NNNN_description.sql
+# or NNNN_description.py. They are applied in version order and recorded in
+# the schema_version table, so each one runs exactly once per database.
+# A .sql file holds ';'-terminated statements; a .py file defines
+# upgrade(cursor) for changes that need to inspect the schema first.
+#
+# Run from the api directory:
+#   python -m backend.db_connection.migrations [upgrade|status|check [schema.sql]]
+#
+# 'check' builds a scratch database from database-files/00_stratify_schema.sql,
+# applies every migration to it and drops it again, so a migration that
+# does not fit a fresh database fails before it reaches a deploy.
+import hashlib
+import importlib.util
+import logging
+import os
+import re
+import sys
+
+import pymysql
+from dotenv import load_dotenv
+
+logger = logging.getLogger("migrations")
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "migrations")
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "..", "database-files", "00_stratify_schema.sql")
+MIGRATION_LOCK = "stratify_schema_migrations"
+# Suffix of the database name used by check_fresh_schema()
+SCRATCH_SUFFIX = "_migration_check"
+# The schema file's own DROP/CREATE/USE statements for the Stratify database
+DATABASE_STATEMENT = re.compile(r"^(DROP DATABASE IF EXISTS|CREATE DATABASE|USE)\s+Stratify$", re.I)
+FILENAME_PATTERN = re.compile(r"^(\d{4})_(\w+)\.(sql|py)$")
+
+VERSION_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INT NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    checksum CHAR(64) NOT NULL,
+    appliedAt DATETIME NOT NULL,
+    PRIMARY KEY (version)
+)
+"""
+
+
+class Migration:
+    """One migration file on disk."""
+
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    @property
+    def checksum(self):
+        with open(self.path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def apply(self, cursor):
+        if self.path.endswith(".py"):
+            spec = importlib.util.spec_from_file_location(f"migration_{self.version:04d}", self.path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            module.upgrade(cursor)
+        else:
+            with open(self.path) as f:
+                for statement in split_statements(f.read()):
+                    cursor.execute(statement)
+
+
+def split_statements(sql):
+    """Split a .sql migration into statements on ';' at the end of a line, dropping '--' comments."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    statements = re.split(r";\s*$", "\n".join(lines), flags=re.M)
+    return [s.strip() for s in statements if s.strip()]
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """
+    List the migration files in a directory.
+
+    Returns:
+    - list: Migration objects sorted by version.
+
+    Raises:
+    - ValueError: If two files share a version number.
+    """
+    migrations = {}
+    for filename in sorted(os.listdir(directory)):
+        match = FILENAME_PATTERN.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version:04d}")
+        migrations[version] = Migration(version, match.group(2), os.path.join(directory, filename))
+    return [migrations[v] for v in sorted(migrations)]
+
+
+def applied_versions(cursor):
+    """Versions already recorded in schema_version, with their checksums."""
+    cursor.execute(VERSION_TABLE_SQL)
+    cursor.execute("SELECT version, checksum FROM schema_version")
+    return {row["version"]: row["checksum"] for row in cursor.fetchall()}
+
+
+def upgrade(conn, directory=MIGRATIONS_DIR):
+    """
+    Apply every pending migration in version order.
+
+    A MySQL named lock serialises concurrent callers, e.g. several API
+    processes starting at once. MySQL commits DDL implicitly, so a
+    migration is recorded only after all of its statements succeed.
+
+    Args:
+    - conn (Connection): A DictCursor connection.
+    - directory (str): Where migration files live.
+
+    Returns:
+    - list: Versions applied by this call.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, 60) AS acquired", (MIGRATION_LOCK,))
+    if not cursor.fetchone()["acquired"]:
+        cursor.close()
+        raise RuntimeError("Timed out waiting for the schema migration lock")
+
+    applied = []
+    try:
+        done = applied_versions(cursor)
+        for migration in discover(directory):
+            if migration.version in done:
+                if done[migration.version] != migration.checksum:
+                    logger.warning(f"Migration {migration.version:04d}_{migration.name} changed after it was applied")
+                continue
+            logger.info(f"Applying migration {migration.version:04d}_{migration.name}")
+            migration.apply(cursor)
+            cursor.execute(
+                "INSERT INTO schema_version (version, name, checksum, appliedAt) VALUES (%s, %s, %s, NOW())",
+                (migration.version, migration.name, migration.checksum),
+            )
+            conn.commit()
+            applied.append(migration.version)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+        cursor.close()
+    return applied
+
+
+def status(conn, directory=MIGRATIONS_DIR):
+    """Each known migration with whether it has been applied."""
+    cursor = conn.cursor()
+    done = applied_versions(cursor)
+    cursor.close()
+    return [
+        {"version": m.version, "name": m.name, "applied": m.version in done}
+        for m in discover(directory)
+    ]
+
+
+def check_fresh_schema(conn, schema_file=SCHEMA_FILE, directory=MIGRATIONS_DIR):
+    """
+    Apply every migration to a scratch database built from the schema file.
+
+    The scratch database is named after the connection's database plus
+    SCRATCH_SUFFIX and is dropped afterwards, whether or not the
+    migrations succeed.
+
+    Args:
+    - conn (Connection): A DictCursor connection whose user may create databases.
+    - schema_file (str): The full schema script new databases start from.
+    - directory (str): Where migration files live.
+
+    Returns:
+    - list: Versions applied to the scratch database.
+
+    Raises:
+    - Exception: Whatever the schema script or a migration raised.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT DATABASE() AS name")
+    original = cursor.fetchone()["name"]
+    scratch = f"{original}{SCRATCH_SUFFIX}"
+    with open(schema_file) as f:
+        statements = split_statements(f.read())
+    try:
+        for statement in statements:
+            match = DATABASE_STATEMENT.match(statement)
+            cursor.execute(f"{match.group(1)} `{scratch}`" if match else statement)
+        conn.commit()
+        return upgrade(conn, directory)
+    finally:
+        cursor.execute(f"DROP DATABASE IF EXISTS `{scratch}`")
+        if original:
+            cursor.execute(f"USE `{original}`")
+        cursor.close()
+
+
+def ensure_index(cursor, table, name, columns):
+    """
+    Create an index unless it, or one with the same leading columns, exists.
+
+    A table or column missing from this database fails the migration, so
+    it is not recorded and runs again once the schema is fixed. Indexes it
+    already created are found and skipped on that run.
+
+    Args:
+    - cursor (Cursor): DictCursor on the target database.
+    - table (str): Table name.
+    - name (str): Index name.
+    - columns (tuple): Indexed columns in order.
+
+    Returns:
+    - bool: True if the index was created.
+
+    Raises:
+    - ValueError: If the table or one of the columns does not exist.
+    """
+    cursor.execute(
+        """
+        SELECT COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """,
+        (table,),
+    )
+    existing_columns = {row["COLUMN_NAME"].lower() for row in cursor.fetchall()}
+    missing = [c for c in columns if c.lower() not in existing_columns]
+    if not existing_columns:
+        raise ValueError(f"Cannot create index {name}: table {table} does not exist")
+    if missing:
+        raise ValueError(f"Cannot create index {name}: {table} has no column(s) {', '.join(missing)}")
+
+    cursor.execute(
+        """
+        SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+        """,
+        (table,),
+    )
+    indexes = {}
+    for row in cursor.fetchall():
+        indexes.setdefault(row["INDEX_NAME"], []).append(row["COLUMN_NAME"].lower())
+    wanted = [c.lower() for c in columns]
+    if name in indexes or any(cols[: len(wanted)] == wanted for cols in indexes.values()):
+        return False
+
+    column_list = ", ".join(f"`{c}`" for c in columns)
+    cursor.execute(f"CREATE INDEX `{name}` ON `{table}` ({column_list})")
+    return True
+
+
+def connect_from_env(**options):
+    """
+    Open a DictCursor connection from the same DB_* variables the API uses.
+
+    Args:
+    - options: Extra pymysql.connect() arguments, e.g. local_infile=True.
+    """
+    load_dotenv()
+    return pymysql.connect(
+        host=os.getenv("DB_HOST").strip(),
+        port=int(os.getenv("DB_PORT").strip()),
+        user=os.getenv("DB_USER").strip(),
+        password=os.getenv("MYSQL_ROOT_PASSWORD").strip(),
+        database=os.getenv("DB_NAME").strip(),
+        cursorclass=pymysql.cursors.DictCursor,
+        **options,
+    )
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = argv or sys.argv[1:] or ["upgrade"]
+    command = args[0]
+    conn = connect_from_env()
+    try:
+        if command == "upgrade":
+            applied = upgrade(conn)
+            print(f"Applied {len(applied)} migration(s)" + (f": {applied}" if applied else ""))
+        elif command == "status":
+            for row in status(conn):
+                mark = "x" if row["applied"] else " "
+                print(f"[{mark}] {row['version']:04d}_{row['name']}")
+        elif command == "check":
+            applied = check_fresh_schema(conn, *args[1:2])
+            print(f"Applied {len(applied)} migration(s) to a fresh schema: {applied}")
+        else:
+            print("usage: python -m backend.db_connection.migrations [upgrade|status|check [schema.sql]]")
+            return 2
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+# Thread-safe pool of PyMySQL connections shared by every blueprint
+import threading
+import time
+from collections import deque
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+
+
+class PoolTimeout(pymysql.err.OperationalError):
+    """Raised when no connection could be borrowed before the pool timeout."""
+
+
+class _Slot:
+    """Bookkeeping for one physical connection owned by the pool."""
+
+    __slots__ = ("conn", "created", "last_used")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """
+    Bounded pool of database connections.
+
+    Connections are borrowed with acquire() and handed back with release().
+    At most max_size connections are open at once; callers wait up to
+    timeout seconds for one to come back before PoolTimeout is raised.
+
+    Args:
+    - connect (callable): Zero-argument factory returning a new PyMySQL connection.
+    - min_size (int): Idle connections kept open even when they exceed idle_timeout.
+    - max_size (int): Hard cap on open connections.
+    - timeout (float): Seconds to wait for a free connection.
+    - idle_timeout (float): Idle connections older than this are closed (0 disables).
+    - max_lifetime (float): Connections older than this are recycled (0 disables).
+    - ping_interval (float): Ping a borrowed connection when it has been idle
+      longer than this many seconds (0 pings on every borrow).
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=10.0,
+                 idle_timeout=300.0, max_lifetime=3600.0, ping_interval=0.0):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._connect = connect
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self):
+        """
+        Borrow a healthy connection, opening a new one if the pool has room.
+
+        Returns:
+        - pymysql.connections.Connection: A connection owned by the caller
+          until release() is called.
+
+        Raises:
+        - PoolTimeout: If no connection became free within the timeout.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        slot = None
+        evicted = []
+        with self._cond:
+            while True:
+                evicted.extend(self._evict_idle_locked(time.monotonic()))
+                if self._idle:
+                    slot = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._close_all(evicted)
+                    raise PoolTimeout(
+                        2013, f"Timed out after {self.timeout}s waiting for a database connection"
+                    )
+                self._cond.wait(remaining)
+        self._close_all(evicted)
+
+        try:
+            if slot is None:
+                slot = self._open()
+            else:
+                slot = self._check_health(slot)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._in_use[id(slot.conn)] = slot
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return slot.conn
+
+    def release(self, conn):
+        """
+        Return a borrowed connection to the pool.
+
+        Any transaction left open by the borrower is rolled back so the next
+        borrower starts from a clean state. Broken or expired connections are
+        closed instead of being returned to the idle set.
+        """
+        with self._cond:
+            slot = self._in_use.pop(id(conn), None)
+        if slot is None:
+            return
+
+        reusable = conn.open
+        if reusable and conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+            try:
+                conn.rollback()
+            except Exception:
+                reusable = False
+
+        now = time.monotonic()
+        if reusable and self._expired(slot, now):
+            reusable = False
+
+        with self._cond:
+            if reusable:
+                slot.last_used = now
+                self._idle.append(slot)
+            else:
+                self._size -= 1
+                self._discarded += 1
+            self._cond.notify()
+        if not reusable:
+            self._close(conn)
+
+    def close(self):
+        """Close every idle connection; borrowed ones are closed on release."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._discarded += len(idle)
+            self._cond.notify_all()
+        self._close_all(idle)
+
+    def stats(self):
+        """
+        Snapshot of pool usage for monitoring.
+
+        Returns:
+        - dict: Pool sizes, checkout/timeout counters and borrow wait times in milliseconds.
+        """
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "connections_created": self._created,
+                "connections_discarded": self._discarded,
+                "wait_ms_total": round(self._wait_total * 1000, 3),
+                "wait_ms_avg": round(self._wait_total * 1000 / checkouts, 3) if checkouts else 0.0,
+                "wait_ms_max": round(self._wait_max * 1000, 3),
+            }
+
+    def _open(self):
+        conn = self._connect()
+        with self._cond:
+            self._created += 1
+        return _Slot(conn)
+
+    def _check_health(self, slot):
+        now = time.monotonic()
+        healthy = not self._expired(slot, now)
+        if healthy and now - slot.last_used >= self.ping_interval:
+            try:
+                slot.conn.ping(reconnect=False)
+            except Exception:
+                healthy = False
+        if healthy:
+            return slot
+
+        self._close(slot.conn)
+        with self._cond:
+            self._discarded += 1
+        return self._open()
+
+    def _expired(self, slot, now):
+        return bool(self.max_lifetime) and now - slot.created >= self.max_lifetime
+
+    def _evict_idle_locked(self, now):
+        # Oldest idle connections sit at the left of the deque
+        evicted = []
+        while len(self._idle) > self.min_size:
+            slot = self._idle[0]
+            idle_for = now - slot.last_used
+            if (self.idle_timeout and idle_for >= self.idle_timeout) or self._expired(slot, now):
+                evicted.append(self._idle.popleft())
+            else:
+                break
+        self._size -= len(evicted)
+        self._discarded += len(evicted)
+        return evicted
+
+    @classmethod
+    def _close_all(cls, slots):
+        for slot in slots:
+            cls._close(slot.conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,241 @@
+# SQL profiler and slow-query log.
+#
+# The timed cursors hand every finished statement to the profiler, which
+# groups statements by fingerprint (the SQL with literals, placeholders and
+# value lists collapsed) and keeps call counts, time and rows per
+# fingerprint and per route. Statements slower than SLOW_QUERY_MS go into a
+# fixed-size ring buffer together with their EXPLAIN plan, served by
+# /system/slow-queries.
+import hashlib
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from flask import current_app, has_request_context, request
+from pymysql import Error, cursors
+
+# Slow statements that get an EXPLAIN plan (INSERT plans say nothing useful)
+EXPLAINABLE = re.compile(r"^\s*(\(\s*)?(select|with|update|delete)\b", re.IGNORECASE)
+
+# A fingerprint's plan is re-used for this many seconds before EXPLAIN runs again
+EXPLAIN_TTL = 300.0
+
+# Longest SQL text kept per slow-log entry
+MAX_SQL_LENGTH = 4000
+
+_FINGERPRINT_RULES = [
+    (re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL), " "),      # comments
+    (re.compile(r"'(?:[^'\\]|\\.|'')*'"), "?"),                # string literals
+    (re.compile(r'"(?:[^"\\]|\\.)*"'), "?"),
+    (re.compile(r"%\(\w+\)s|%s"), "?"),                        # driver placeholders
+    (re.compile(r"\b0x[0-9a-f]+\b|\b\d+(?:\.\d+)?(?:e[-+]?\d+)?\b", re.IGNORECASE), "?"),
+    (re.compile(r"\s+"), " "),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?+)"),       # IN lists and VALUES rows
+    (re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+"), "(?+)"),     # multi-row VALUES
+]
+
+
+def fingerprint(sql):
+    """
+    Normalize a statement so executions that differ only in values match.
+
+    Args:
+    - sql (str): The statement as passed to execute().
+
+    Returns:
+    - str: The normalized SQL.
+    """
+    if isinstance(sql, bytes):
+        sql = sql.decode(errors="replace")
+    for pattern, replacement in _FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+@lru_cache(maxsize=512)
+def _fingerprint_digest(sql):
+    # Routes pass the same query text with different parameters
+    normalized = fingerprint(sql)
+    return normalized, hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+class Statement:
+    """One execution being timed by a cursor."""
+
+    __slots__ = ("query", "args", "execute_seconds", "fetch_seconds", "rows")
+
+    def __init__(self, query, args, execute_seconds):
+        self.query = query
+        self.args = args
+        self.execute_seconds = execute_seconds
+        self.fetch_seconds = 0.0
+        self.rows = 0
+
+
+class _Fingerprint:
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.slow = 0
+        self.endpoints = {}
+
+
+class QueryProfiler:
+    """Per-process statement statistics and slow-query ring buffer."""
+
+    def __init__(self):
+        self.enabled = True
+        self.slow_seconds = 0.1
+        self.explain = True
+        self._slow = deque(maxlen=200)
+        self._fingerprints = {}
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Read SQL_PROFILER_ENABLED, SLOW_QUERY_MS, SLOW_QUERY_LOG_SIZE and
+        SLOW_QUERY_EXPLAIN.
+
+        Args:
+        - app (Flask): The Flask application instance to attach to.
+        """
+        app.config.setdefault("SQL_PROFILER_ENABLED", True)
+        app.config.setdefault("SLOW_QUERY_MS", 100.0)
+        app.config.setdefault("SLOW_QUERY_LOG_SIZE", 200)
+        app.config.setdefault("SLOW_QUERY_EXPLAIN", True)
+        self.enabled = app.config["SQL_PROFILER_ENABLED"]
+        self.slow_seconds = app.config["SLOW_QUERY_MS"] / 1000
+        self.explain = app.config["SLOW_QUERY_EXPLAIN"]
+        with self._lock:
+            self._slow = deque(self._slow, maxlen=app.config["SLOW_QUERY_LOG_SIZE"])
+
+    def finish(self, cursor, statement):
+        """
+        Record a statement once its rows have been read.
+
+        Args:
+        - cursor (Cursor): The still-open cursor that ran it; its connection
+          is used for EXPLAIN when the statement was slow.
+        - statement (Statement): Timings and row count.
+        """
+        if not self.enabled:
+            return
+        seconds = statement.execute_seconds + statement.fetch_seconds
+        sql, digest = _fingerprint_digest(statement.query)
+        endpoint = (request.endpoint or "unmatched") if has_request_context() else "background"
+        slow = seconds >= self.slow_seconds
+
+        with self._lock:
+            stats = self._fingerprints.get(digest)
+            if stats is None:
+                stats = self._fingerprints[digest] = _Fingerprint(sql)
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.rows += statement.rows
+            stats.slow += slow
+            stats.endpoints[endpoint] = stats.endpoints.get(endpoint, 0) + 1
+        if not slow:
+            return
+
+        text = _render(cursor, statement)
+        entry = {
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "endpoint": endpoint,
+            "fingerprint": digest,
+            "sql": text[:MAX_SQL_LENGTH],
+            "total_ms": round(seconds * 1000, 2),
+            "execute_ms": round(statement.execute_seconds * 1000, 2),
+            "fetch_ms": round(statement.fetch_seconds * 1000, 2),
+            "rows": statement.rows,
+            "plan": self._plan(cursor, digest, text) if self.explain else None,
+        }
+        with self._lock:
+            self._slow.append(entry)
+        if has_request_context():
+            current_app.logger.warning(
+                f"Slow query ({entry['total_ms']} ms, {entry['rows']} rows) in {endpoint}: {sql[:200]}"
+            )
+
+    def slow_queries(self, limit=None):
+        """Slow-log entries, newest first."""
+        with self._lock:
+            entries = list(self._slow)
+        entries.reverse()
+        return entries[:limit] if limit else entries
+
+    def fingerprints(self, limit=20, sort="total_ms"):
+        """
+        Statement statistics grouped by fingerprint.
+
+        Args:
+        - limit (int): Number of fingerprints to return.
+        - sort (str): 'total_ms', 'avg_ms', 'max_ms', 'calls' or 'rows',
+          largest first.
+
+        Returns:
+        - list: Dicts with the fingerprint, normalized SQL, call count,
+          total/avg/max milliseconds, rows, slow count and calls per route.
+        """
+        with self._lock:
+            rows = [
+                {
+                    "fingerprint": digest,
+                    "sql": stats.sql,
+                    "calls": stats.calls,
+                    "total_ms": round(stats.seconds * 1000, 2),
+                    "avg_ms": round(stats.seconds * 1000 / stats.calls, 3),
+                    "max_ms": round(stats.max_seconds * 1000, 2),
+                    "rows": stats.rows,
+                    "slow": stats.slow,
+                    "endpoints": dict(stats.endpoints),
+                }
+                for digest, stats in self._fingerprints.items()
+            ]
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        return rows[:limit]
+
+    def reset(self):
+        """Clear the slow log and the fingerprint statistics."""
+        with self._lock:
+            self._slow.clear()
+            self._fingerprints.clear()
+            self._plans.clear()
+
+    def _plan(self, cursor, digest, text):
+        if not EXPLAINABLE.match(text):
+            return None
+        now = time.monotonic()
+        with self._lock:
+            cached = self._plans.get(digest)
+        if cached is not None and now - cached[1] < EXPLAIN_TTL:
+            return cached[0]
+        try:
+            # A plain cursor, so the EXPLAIN itself is not profiled
+            explain = cursor.connection.cursor(cursors.DictCursor)
+            try:
+                explain.execute("EXPLAIN " + text)
+                plan = list(explain.fetchall())
+            finally:
+                explain.close()
+        except Error as e:
+            plan = [{"error": str(e)}]
+        with self._lock:
+            self._plans[digest] = (plan, now)
+        return plan
+
+
+def _render(cursor, statement):
+    try:
+        return cursor.mogrify(statement.query, statement.args)
+    except (TypeError, ValueError):
+        return statement.query
+
+
+profiler = QueryProfiler()
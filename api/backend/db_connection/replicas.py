@@ -0,0 +1,162 @@
+# Read replicas for GET requests.
+#
+# Each replica has its own ConnectionPool. A replica serves reads only while
+# its replication lag (Seconds_Behind_Source from SHOW REPLICA STATUS) is
+# within the configured maximum. Lag is measured lazily: the first request
+# that finds a replica's measurement older than the check interval re-runs
+# the status query, every other request uses the last value. When no
+# replica is usable, PooledMySQL falls back to the primary.
+import itertools
+import threading
+import time
+
+from pymysql import Error, cursors
+
+
+class Replica:
+    """
+    One read replica: its connection pool plus the last measured lag.
+
+    Args:
+    - host (str): Replica host name.
+    - port (int): Replica port.
+    - pool (ConnectionPool): Pool of connections to the replica.
+    """
+
+    def __init__(self, host, port, pool):
+        self.host = host
+        self.port = port
+        self.pool = pool
+        self.lag = None
+        self.healthy = False
+        self.error = None
+        self.reads = 0
+        self.checked_at = None
+        self._checking = threading.Lock()
+
+    def usable(self, max_lag, check_interval):
+        """
+        Whether reads may go to this replica, re-measuring lag when stale.
+
+        Args:
+        - max_lag (float): Largest acceptable lag in seconds.
+        - check_interval (float): Seconds a lag measurement stays valid.
+
+        Returns:
+        - bool: True when the replica answered its last check, reported a
+          replication status and was at most max_lag seconds behind the primary.
+        """
+        now = time.monotonic()
+        if self.checked_at is None or now - self.checked_at >= check_interval:
+            # One request measures; concurrent ones use the previous result
+            if self._checking.acquire(blocking=False):
+                try:
+                    self._check(now)
+                finally:
+                    self._checking.release()
+        lag = self.lag
+        return self.healthy and lag is not None and lag <= max_lag
+
+    def mark_down(self, error):
+        """Stop routing to the replica until its next lag check."""
+        self.lag = None
+        self.healthy = False
+        self.error = str(error)
+        self.checked_at = time.monotonic()
+
+    def _check(self, now):
+        try:
+            conn = self.pool.acquire()
+            try:
+                # A plain cursor, so the status query is not profiled
+                cursor = conn.cursor(cursors.DictCursor)
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")
+                    status = cursor.fetchone()
+                finally:
+                    cursor.close()
+            finally:
+                self.pool.release(conn)
+        except Error as e:
+            self.mark_down(e)
+            return
+        if status is None:
+            # Not replicating at all (e.g. a misconfigured host or a restored
+            # copy): nothing says it tracks the primary, so don't read from it
+            lag, error = None, "not a replica (SHOW REPLICA STATUS is empty)"
+        else:
+            # NULL while the replication threads are stopped
+            lag = status.get("Seconds_Behind_Source")
+            error = None if lag is not None else (status.get("Last_Error") or "replication stopped")
+        self.lag = lag
+        self.healthy = lag is not None
+        self.error = error
+        self.checked_at = now
+
+    def stats(self):
+        """Host, lag, health and pool counters of the replica."""
+        return {
+            "host": f"{self.host}:{self.port}",
+            "lag_seconds": self.lag,
+            "healthy": self.healthy,
+            "error": self.error,
+            "reads": self.reads,
+            "pool": self.pool.stats(),
+        }
+
+
+class ReplicaSet:
+    """
+    Round-robin choice among the replicas that are currently usable.
+
+    Args:
+    - replicas (list): Replica instances.
+    - max_lag (float): Replicas further behind than this many seconds are skipped.
+    - check_interval (float): Seconds between lag checks of one replica.
+    """
+
+    def __init__(self, replicas, max_lag=5.0, check_interval=2.0):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._next = itertools.count()
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def choose(self):
+        """The next usable replica, or None when reads must go to the primary."""
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if replica.usable(self.max_lag, self.check_interval):
+                return replica
+        return None
+
+    def close(self):
+        for replica in self.replicas:
+            replica.pool.close()
+
+    def stats(self):
+        return [replica.stats() for replica in self.replicas]
+
+
+def parse_hosts(value, default_port=3306):
+    """
+    Split a DB_REPLICA_HOSTS value into (host, port) pairs.
+
+    Args:
+    - value (str): Comma-separated host or host:port entries.
+    - default_port (int): Port used when an entry has none.
+
+    Returns:
+    - list: (host, port) tuples; empty when value is blank.
+    """
+    hosts = []
+    for entry in (value or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, _, port = entry.partition(":")
+        hosts.append((host, int(port) if port else default_port))
+    return hosts
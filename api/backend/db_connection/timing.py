@@ -0,0 +1,99 @@
+# Cursors that report their time to the request metrics and the SQL profiler.
+#
+# execute() covers the round trip and, for the buffered DictCursor, reading
+# the whole result; the fetch methods matter for the unbuffered
+# SSDictCursor, which reads rows from the socket as they are fetched. A
+# statement is handed to the profiler once its rows are in: right after
+# execute() for buffered cursors, on the next execute() or close() for
+# unbuffered ones.
+import time
+
+from pymysql import cursors
+
+from backend.common.metrics import metrics
+from backend.db_connection.profiler import Statement, profiler
+
+
+class TimedCursorMixin:
+    """Reports statement time, statement count and fetched rows to the metrics and profiler."""
+
+    _buffered = True
+    _statement = None
+
+    def execute(self, query, args=None):
+        self._finish_statement()
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, args)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.record_db(elapsed, queries=1)
+        self._statement = Statement(query, args, elapsed)
+        if self._buffered:
+            self._statement.rows = max(self.rowcount, 0)
+            self._finish_statement()
+        return result
+
+    def callproc(self, procname, args=()):
+        started = time.perf_counter()
+        try:
+            return super().callproc(procname, args)
+        finally:
+            metrics.record_db(time.perf_counter() - started, queries=1)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._record_fetch(time.perf_counter() - started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._record_fetch(time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._record_fetch(time.perf_counter() - started, len(rows))
+        return rows
+
+    def close(self):
+        if self.connection is not None:
+            self._finish_statement()
+        super().close()
+
+    def _record_fetch(self, seconds, rows):
+        metrics.record_db(seconds, rows=rows)
+        statement = self._statement
+        if statement is not None:
+            statement.fetch_seconds += seconds
+            statement.rows += rows
+
+    def _finish_statement(self):
+        statement, self._statement = self._statement, None
+        if statement is not None:
+            profiler.finish(self, statement)
+
+
+class TimedDictCursor(TimedCursorMixin, cursors.DictCursor):
+    """Buffered dict cursor; the default cursor class of the pool."""
+
+
+class TimedSSDictCursor(TimedCursorMixin, cursors.SSDictCursor):
+    """Unbuffered dict cursor for streaming responses."""
+
+    _buffered = False
+
+    # fetchall() reads through fetchone(), which already records each row
+    fetchall = cursors.SSDictCursor.fetchall
+
+
+class TimedSSCursor(TimedCursorMixin, cursors.SSCursor):
+    """Unbuffered tuple cursor for bulk reads that skip building a dict per row."""
+
+    _buffered = False
+
+    # fetchall() reads through fetchone(), which already records each row
+    fetchall = cursors.SSCursor.fetchall
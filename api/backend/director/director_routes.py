@@ -1,22 +1,45 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 import logging
 
+from backend.db_connection import db
+from backend.performance.snapshots import PERFORMANCE_VERSION, firm_summary
+from backend.common.conditional import versioned
+
 director = Blueprint('director', __name__)
 logger = logging.getLogger('director')
 
 @director.route('/summary', methods=['GET'])
+@versioned(PERFORMANCE_VERSION)
 def get_director_summary():
     """
     Get executive summary metrics.
+
+    AUM and YTD growth come from the stored PortfolioPerformance snapshots.
     """
-    data = {
-        "total_aum": 4250000000,
-        "ytd_growth": 12.5,
-        "firm_alpha": 3.4,
-        "active_strategies": 18,
-        "drift_flags": 2
-    }
-    return jsonify(data), 200
+    try:
+        current_app.logger.info("Starting get_director_summary request")
+        cursor = db.get_db().cursor()
+        summary = firm_summary(cursor)
+        cursor.execute("SELECT COUNT(*) AS strategies FROM InvestmentStrategy")
+        strategies = cursor.fetchone()["strategies"]
+        cursor.close()
+        data = {
+            "total_aum": summary["total_aum"],
+            "ytd_growth": summary["ytd_return"],
+            # No benchmark series is stored yet, so alpha and drift stay fixed
+            "firm_alpha": 3.4,
+            "active_strategies": strategies,
+            "drift_flags": 2,
+            "as_of": summary["as_of"]
+        }
+        return jsonify(data), 200
+    except Exception as e:
+        current_app.logger.error(f"Error in get_director_summary: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
 
 @director.route('/alerts', methods=['GET'])
 def get_strategy_alerts():
@@ -1,26 +1,88 @@
+import datetime
+
 from flask import Blueprint, request, jsonify, current_app
 import logging
 
+from backend.db_connection import db
+from backend.performance.snapshots import PERFORMANCE_VERSION, firm_summary, snapshotter
+from backend.common.conditional import versioned
+
 performance = Blueprint('performance', __name__)
 logger = logging.getLogger('performance')
 
 @performance.route('/firm/summary', methods=['GET'])
+@versioned(PERFORMANCE_VERSION)
 def get_firm_summary():
     """
     Get high-level firm performance metrics.
+
+    AUM and YTD return are read from the latest PortfolioPerformance
+    snapshots rather than recomputed per request.
+    """
+    try:
+        current_app.logger.info("Starting get_firm_summary request")
+        cursor = db.get_db().cursor()
+        data = firm_summary(cursor)
+        cursor.execute("SELECT COUNT(*) AS strategies FROM InvestmentStrategy")
+        data["active_strategies"] = cursor.fetchone()["strategies"]
+        cursor.close()
+        return jsonify(data), 200
+    except Exception as e:
+        current_app.logger.error(f"Error in get_firm_summary: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
+
+
+@performance.route('/snapshots', methods=['POST'])
+def create_snapshot():
     """
-    data = {
-        "total_aum": 4250000000,
-        "ytd_return": 12.5,
-        "active_strategies": 18,
-        "funds": [
-            {"name": "Global Macro Fund", "aum": 1200000000, "return": 8.4, "risk": "Medium"},
-            {"name": "Tech Growth Alpha", "aum": 850000000, "return": 18.2, "risk": "High"},
-            {"name": "Income & Yield", "aum": 600000000, "return": 4.5, "risk": "Low"},
-            {"name": "Emerging Markets", "aum": 450000000, "return": -2.1, "risk": "High"}
-        ]
-    }
-    return jsonify(data), 200
+    Take a PortfolioPerformance snapshot now instead of waiting for the scheduler.
+
+    Request body (JSON, optional):
+    - date (str, optional): Snapshot day in YYYY-MM-DD format (defaults to today).
+
+    Returns:
+    - JSON: Success response with the number of rows written, 409 if a snapshot is already running,
+      or error details.
+    """
+    try:
+        current_app.logger.info("Starting create_snapshot request")
+        data = request.get_json(silent=True) or {}
+        try:
+            as_of = datetime.date.fromisoformat(data["date"]) if data.get("date") else None
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "date must be in YYYY-MM-DD format",
+                "status_code": 400
+            }), 400
+
+        written = snapshotter.run_once(as_of)
+        if written is None:
+            return jsonify({
+                "success": False,
+                "error": "A snapshot is already running",
+                "status_code": 409
+            }), 409
+
+        current_app.logger.info(f"Snapshot wrote {written} PortfolioPerformance rows")
+        return jsonify({
+            "success": True,
+            "data": {
+                "message": "Snapshot complete",
+                "rowsWritten": written
+            }
+        }), 201
+    except Exception as e:
+        current_app.logger.error(f"Error in create_snapshot: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
 
 
 @performance.route('/portfolio/<int:portfolio_id>', methods=['GET'])
@@ -0,0 +1,216 @@
+# Scheduled PortfolioPerformance snapshots.
+#
+# One set-based INSERT ... SELECT values every portfolio from Position and
+# the latest PriceHistory close, so a snapshot costs a single statement no
+# matter how many portfolios exist. Dashboards then read the stored series
+# instead of recomputing valuations on every request.
+import datetime
+import logging
+import threading
+
+from backend.common import versions
+from backend.db_connection import db
+
+logger = logging.getLogger("performance")
+
+# Named MySQL lock so only one API process snapshots at a time
+SNAPSHOT_LOCK = "stratify_performance_snapshot"
+# CacheVersion data set bumped whenever snapshots are written
+PERFORMANCE_VERSION = "performance"
+
+# Each asset's latest close comes from MAX(Date) per assetID, which the
+# (assetID, Date) primary key answers with one index dive per asset, then a
+# primary-key lookup of that row; no pass over all of PriceHistory.
+SNAPSHOT_SQL = """
+INSERT INTO PortfolioPerformance (portfolioID, performanceID, portfolioValue, calculationDate, totalReturn)
+SELECT v.portfolioID,
+       COALESCE(last_perf.maxID, 0) + 1,
+       ROUND(v.marketValue, 2),
+       %s,
+       CASE WHEN v.costValue > 0
+            THEN ROUND((v.marketValue - v.costValue) / v.costValue * 100, 2)
+            ELSE 0 END
+FROM (
+    SELECT pos.portfolioID,
+           SUM(pos.Quantity * COALESCE(px.closePrice, a.CurrentPrice)) AS marketValue,
+           SUM(pos.Quantity * pos.AvgCostBasis) AS costValue
+    FROM Position pos
+    JOIN Asset a ON a.assetID = pos.assetID
+    LEFT JOIN (
+        SELECT assetID, MAX(Date) AS lastDate
+        FROM PriceHistory
+        WHERE Date < %s
+        GROUP BY assetID
+    ) AS last_px ON last_px.assetID = pos.assetID
+    LEFT JOIN PriceHistory px ON px.assetID = last_px.assetID AND px.Date = last_px.lastDate
+    GROUP BY pos.portfolioID
+) AS v
+LEFT JOIN (
+    SELECT portfolioID, MAX(performanceID) AS maxID
+    FROM PortfolioPerformance
+    GROUP BY portfolioID
+) AS last_perf ON last_perf.portfolioID = v.portfolioID
+WHERE NOT EXISTS (
+    SELECT 1 FROM PortfolioPerformance existing
+    WHERE existing.portfolioID = v.portfolioID AND existing.calculationDate = %s
+)
+"""
+
+# Latest snapshot and the snapshot closest to the start of the year, per portfolio
+SUMMARY_SQL = """
+SELECT r.portfolioID, p.Name,
+       MAX(CASE WHEN r.latest_rank = 1 THEN r.portfolioValue END) AS currentValue,
+       MAX(CASE WHEN r.latest_rank = 1 THEN r.totalReturn END) AS totalReturn,
+       MAX(CASE WHEN r.latest_rank = 1 THEN r.calculationDate END) AS asOf,
+       MAX(CASE WHEN r.base_rank = 1 THEN r.portfolioValue END) AS yearStartValue
+FROM (
+    SELECT portfolioID, portfolioValue, totalReturn, calculationDate,
+           ROW_NUMBER() OVER (PARTITION BY portfolioID
+                              ORDER BY calculationDate DESC, performanceID DESC) AS latest_rank,
+           ROW_NUMBER() OVER (PARTITION BY portfolioID
+                              ORDER BY ABS(TIMESTAMPDIFF(SECOND, calculationDate, %s)), calculationDate) AS base_rank
+    FROM PortfolioPerformance
+) AS r
+JOIN Portfolio p ON p.portfolioID = r.portfolioID
+WHERE r.latest_rank = 1 OR r.base_rank = 1
+GROUP BY r.portfolioID, p.Name
+ORDER BY currentValue DESC
+"""
+
+
+def take_snapshot(conn, as_of=None):
+    """
+    Append one PortfolioPerformance row per portfolio for a day.
+
+    Positions are valued at each asset's last close before the end of
+    as_of, falling back to Asset.CurrentPrice when no history exists.
+    Portfolios that already have a snapshot for that day are skipped.
+
+    Args:
+    - conn (Connection): Connection to run the statement on; committed here.
+    - as_of (date, optional): Snapshot day; defaults to today.
+
+    Returns:
+    - int: Number of snapshot rows written.
+    """
+    as_of = as_of or datetime.date.today()
+    stamp = datetime.datetime.combine(as_of, datetime.time())
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SNAPSHOT_SQL, (stamp, stamp + datetime.timedelta(days=1), stamp))
+        written = cursor.rowcount
+        if written:
+            versions.bump(cursor, PERFORMANCE_VERSION)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return written
+
+
+def firm_summary(cursor, year=None):
+    """
+    Firm-wide AUM and YTD return from the stored snapshots.
+
+    Args:
+    - cursor (Cursor): DictCursor to read with.
+    - year (int, optional): Year for the YTD baseline; defaults to this year.
+
+    Returns:
+    - dict: total_aum, ytd_return, as_of and one row per portfolio.
+    """
+    year = year or datetime.date.today().year
+    cursor.execute(SUMMARY_SQL, (datetime.datetime(year, 1, 1),))
+    rows = cursor.fetchall()
+
+    total_aum = sum(float(r["currentValue"]) for r in rows)
+    base_aum = sum(float(r["yearStartValue"]) for r in rows)
+    funds = []
+    for r in rows:
+        current, base = float(r["currentValue"]), float(r["yearStartValue"])
+        funds.append({
+            "portfolioID": r["portfolioID"],
+            "name": r["Name"],
+            "aum": round(current, 2),
+            "return": round((current - base) / base * 100, 2) if base else 0.0,
+            "totalReturn": float(r["totalReturn"]),
+        })
+    return {
+        "total_aum": round(total_aum, 2),
+        "ytd_return": round((total_aum - base_aum) / base_aum * 100, 2) if base_aum else 0.0,
+        "as_of": max((r["asOf"] for r in rows), default=None),
+        "funds": funds,
+    }
+
+
+class PerformanceSnapshotter:
+    """
+    Background thread that snapshots every portfolio on a fixed interval.
+
+    Each run takes a MySQL named lock first, so with several API processes
+    only one of them writes a given snapshot.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.last_run = None
+
+    def init_app(self, app):
+        """
+        Start the scheduler using PERFORMANCE_SNAPSHOT_INTERVAL (seconds, 0 disables).
+
+        Args:
+        - app (Flask): The Flask application instance the job runs under.
+        """
+        app.config.setdefault("PERFORMANCE_SNAPSHOT_INTERVAL", 86400)
+        self.app = app
+        interval = app.config["PERFORMANCE_SNAPSHOT_INTERVAL"]
+        if interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._loop, args=(interval,), name="performance-snapshotter", daemon=True
+        )
+        self._thread.start()
+
+    def run_once(self, as_of=None):
+        """
+        Take one snapshot under the named lock.
+
+        Returns:
+        - int: Rows written, or None if another process holds the lock.
+        """
+        with self.app.app_context():
+            with db.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT GET_LOCK(%s, 0) AS acquired", (SNAPSHOT_LOCK,))
+                if not cursor.fetchone()["acquired"]:
+                    cursor.close()
+                    return None
+                try:
+                    written = take_snapshot(conn, as_of)
+                    self.last_run = datetime.datetime.now()
+                    return written
+                finally:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (SNAPSHOT_LOCK,))
+                    cursor.close()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, interval):
+        # First run straight away so a fresh deployment has a data point
+        while not self._stop.is_set():
+            try:
+                written = self.run_once()
+                if written is not None:
+                    logger.info(f"Performance snapshot wrote {written} rows")
+            except Exception as e:
+                logger.error(f"Performance snapshot failed: {e}")
+            self._stop.wait(interval)
+
+
+snapshotter = PerformanceSnapshotter()
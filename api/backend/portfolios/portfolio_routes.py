@@ -1,11 +1,26 @@
 from flask import Blueprint, jsonify, request
-from backend.db_connection import db
+from backend.db_connection import db, use_primary
+from backend.common.pagination import Keyset
+from backend.common.streaming import stream_rows, wants_stream
+from backend.portfolios.valuation import valuations, value_positions
+from backend.assets.reference import POSITION_ASSET_FIELDS, add_asset_fields, reference
 from mysql.connector import Error
 from flask import current_app
 
 # Create a Blueprint for Portfolio routes
 portfolios = Blueprint("portfolios", __name__)
 
+# Sort key for keyset pagination of get_all_portfolios
+PORTFOLIO_KEYSET = Keyset(("p.dateCreated", "p.portfolioID"), ("dateCreated", "portfolioID"), descending=True)
+
+# Base query of get_all_portfolios; filters and the page clause are appended
+LIST_PORTFOLIOS_SQL = """
+SELECT p.portfolioID, p.Name, p.Description, p.dateCreated, p.userID, u.Name AS userName
+FROM Portfolio p
+JOIN User u ON p.userID = u.UserID
+WHERE 1=1
+"""
+
 
 @portfolios.route("/portfolios", methods=["GET"])
 def get_all_portfolios():
@@ -14,27 +29,33 @@ def get_all_portfolios():
 
     Query parameters:
     - userID (int, optional): Filter portfolios by user ID.
+    - after (str, optional): next_cursor from the previous page.
+    - limit (int, optional): Page size (default 100, max 1000).
+    - stream (str, optional): '1' streams every matching row as NDJSON (also selected by Accept: application/x-ndjson).
 
     Returns:
-    - JSON: Success response with portfolio data sorted by creation date (most recent first), or error details.
+    - JSON: Success response with portfolio data sorted by creation date (most recent first) plus next_cursor, or error details.
 
     Raises:
     - DatabaseError: If query execution fails.
     """
     try:
         current_app.logger.info('Starting get_all_portfolios request')
+        try:
+            page = PORTFOLIO_KEYSET.page(request.args)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
         cursor = db.get_db().cursor()
 
         # Get query parameters for filtering
         user_id = request.args.get("userID")
 
         # Prepare the base query
-        query = """
-        SELECT p.portfolioID, p.Name, p.Description, p.dateCreated, p.userID, u.Name AS userName
-        FROM Portfolio p
-        JOIN User u ON p.userID = u.UserID
-        WHERE 1=1
-        """
+        query = LIST_PORTFOLIOS_SQL
         params = []
 
         # Add filter if provided
@@ -42,17 +63,26 @@ def get_all_portfolios():
             query += " AND p.userID = %s"
             params.append(int(user_id))
 
-        query += " ORDER BY p.dateCreated DESC"
+        if wants_stream():
+            # Whole result set as NDJSON, read through a server-side cursor
+            cursor.close()
+            page_sql, page_params = page.clause(limit=False)
+            return stream_rows(query + page_sql, params + page_params)
+
+        page_sql, page_params = page.clause()
+        query += page_sql
+        params += page_params
 
         current_app.logger.debug(f'Executing query: {query} with params: {params}')
         cursor.execute(query, params)
-        portfolios_data = cursor.fetchall()
+        portfolios_data, next_cursor = page.finish(cursor.fetchall())
         cursor.close()
 
         current_app.logger.info(f'Successfully retrieved {len(portfolios_data)} portfolios')
         return jsonify({
             "success": True,
-            "data": portfolios_data
+            "data": portfolios_data,
+            "next_cursor": next_cursor
         }), 200
     except Error as e:
         current_app.logger.error(f'Database error in get_all_portfolios: {str(e)}')
@@ -72,7 +102,8 @@ def get_portfolio(portfolio_id):
     - portfolio_id (int): The ID of the portfolio to retrieve.
 
     Returns:
-    - JSON: Success response with portfolio details including name, description, creation date, owner information, and all positions, or error details if not found.
+    - JSON: Success response with portfolio details including name, description, creation date, owner information,
+      market value, unrealized P&L and all positions with their market value, P&L and weight, or error details if not found.
 
     Raises:
     - DatabaseError: If query execution fails.
@@ -98,19 +129,32 @@ def get_portfolio(portfolio_id):
                 "status_code": 404
             }), 404
 
-        # Get positions for this portfolio
+        # Get positions for this portfolio; asset fields come from the reference cache
         positions_query = """
-        SELECT pos.positionID, pos.portfolioID, pos.assetID, pos.Quantity, pos.AvgCostBasis,
-               a.TickerSymbol, a.AssetName, a.AssetType, a.CurrentPrice
+        SELECT pos.positionID, pos.portfolioID, pos.assetID, pos.Quantity, pos.AvgCostBasis
         FROM Position pos
-        JOIN Asset a ON pos.assetID = a.assetID
         WHERE pos.portfolioID = %s
         """
         cursor.execute(positions_query, (portfolio_id,))
         positions = cursor.fetchall()
+        assets = reference.snapshot(db.get_db(), require={pos["assetID"] for pos in positions})
+        add_asset_fields(positions, assets, POSITION_ASSET_FIELDS)
+
+        # Mark positions to market in one vectorized pass
+        values = value_positions(
+            [float(pos["Quantity"]) for pos in positions],
+            [float(pos["AvgCostBasis"]) for pos in positions],
+            [float(pos["CurrentPrice"]) for pos in positions],
+        )
+        for i, pos in enumerate(positions):
+            pos["marketValue"] = round(float(values["market_value"][i]), 2)
+            pos["unrealizedPnL"] = round(float(values["unrealized_pnl"][i]), 2)
+            pos["weight"] = round(float(values["weight"][i]), 6)
 
         # Add positions to portfolio data
         portfolio["positions"] = positions
+        portfolio["marketValue"] = round(values["total_value"], 2)
+        portfolio["unrealizedPnL"] = round(values["total_value"] - values["total_cost"], 2)
 
         cursor.close()
         current_app.logger.info(f'Successfully retrieved portfolio {portfolio_id}')
@@ -127,6 +171,80 @@ def get_portfolio(portfolio_id):
         }), 500
 
 
+@portfolios.route("/portfolios/<int:portfolio_id>/valuation", methods=["GET"])
+@use_primary
+def get_portfolio_valuation(portfolio_id):
+    """
+    Mark a portfolio to market from the valuation cache.
+
+    Cached valuations do not expire, so a cache miss loads from the primary
+    rather than from a possibly lagging read replica.
+
+    Args:
+    - portfolio_id (int): The ID of the portfolio to value.
+
+    Returns:
+    - JSON: Success response with market value, cost basis, unrealized P&L and per-position values and weights,
+      or error details if not found.
+
+    Raises:
+    - DatabaseError: If query execution fails.
+    """
+    try:
+        current_app.logger.info(f'Starting get_portfolio_valuation request for ID: {portfolio_id}')
+        valuation = valuations.get(db.get_db(), portfolio_id)
+        if valuation is None:
+            return jsonify({
+                "success": False,
+                "error": "Portfolio not found",
+                "status_code": 404
+            }), 404
+
+        current_app.logger.info(f'Successfully valued portfolio {portfolio_id}')
+        return jsonify({
+            "success": True,
+            "data": valuation
+        }), 200
+    except Error as e:
+        current_app.logger.error(f'Database error in get_portfolio_valuation: {str(e)}')
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
+
+
+@portfolios.route("/portfolios/valuations", methods=["GET"])
+@use_primary
+def get_all_valuations():
+    """
+    Market value and unrealized P&L totals for every portfolio, loaded
+    from the primary like get_portfolio_valuation.
+
+    Returns:
+    - JSON: Success response with one summary per portfolio ordered by portfolio ID, or error details.
+
+    Raises:
+    - DatabaseError: If query execution fails.
+    """
+    try:
+        current_app.logger.info('Starting get_all_valuations request')
+        summaries = valuations.all(db.get_db())
+
+        current_app.logger.info(f'Successfully valued {len(summaries)} portfolios')
+        return jsonify({
+            "success": True,
+            "data": summaries
+        }), 200
+    except Error as e:
+        current_app.logger.error(f'Database error in get_all_valuations: {str(e)}')
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
+
+
 @portfolios.route("/portfolios", methods=["POST"])
 def create_portfolio():
     """
@@ -181,9 +299,11 @@ def create_portfolio():
             data["userID"]
         ))
 
-        db.get_db().commit()
         new_portfolio_id = cursor.lastrowid
+        version = valuations.bump(cursor)
+        db.get_db().commit()
         cursor.close()
+        valuations.invalidate(portfolio_id=new_portfolio_id, version=version)
 
         current_app.logger.info(f'Successfully created portfolio {new_portfolio_id}')
         return jsonify({
@@ -296,8 +416,10 @@ def delete_portfolio(portfolio_id):
         # Remove dependent positions first
         cursor.execute("DELETE FROM Position WHERE portfolioID = %s", (portfolio_id,))
         cursor.execute("DELETE FROM Portfolio WHERE portfolioID = %s", (portfolio_id,))
+        version = valuations.bump(cursor)
         db.get_db().commit()
         cursor.close()
+        valuations.invalidate(portfolio_id=portfolio_id, version=version)
 
         current_app.logger.info(f"Successfully deleted portfolio {portfolio_id}")
         return jsonify({
@@ -0,0 +1,405 @@
+# Portfolio mark-to-market valuation.
+#
+# Each portfolio's positions are held as NumPy columns (quantity, cost basis,
+# price) so market value, unrealized P&L and weights come out of one
+# vectorized pass. Books are cached per portfolio and patched in place when a
+# single price or position changes, instead of re-reading every portfolio.
+#
+# Position and price writers bump the 'valuations' CacheVersion counter in
+# their own transaction. Each worker polls it at most once per
+# VALUATION_CACHE_POLL seconds and drops its books when another writer (a
+# second worker, the ledger CLI) moved it; a worker's own writes advance
+# its view of the counter together with the in-place patch.
+# VALUATION_CACHE_TTL bounds staleness after edits made directly in MySQL.
+import threading
+import time
+
+import numpy as np
+
+from backend.common import versions
+
+VERSION_NAME = "valuations"
+
+POSITIONS_QUERY = """
+SELECT p.portfolioID, pos.positionID, pos.assetID, pos.Quantity, pos.AvgCostBasis,
+       a.TickerSymbol, a.CurrentPrice
+FROM Portfolio p
+LEFT JOIN Position pos ON pos.portfolioID = p.portfolioID
+LEFT JOIN Asset a ON pos.assetID = a.assetID
+"""
+
+
+def value_positions(quantity, cost_basis, price):
+    """
+    Value a set of positions in one vectorized pass.
+
+    Args:
+    - quantity (ndarray): Units held per position.
+    - cost_basis (ndarray): Average cost per unit.
+    - price (ndarray): Current price per unit.
+
+    Returns:
+    - dict: Per-position arrays (market_value, cost_value, unrealized_pnl,
+      unrealized_pnl_pct, weight) and portfolio totals.
+    """
+    quantity = np.asarray(quantity, dtype=np.float64)
+    market_value = quantity * np.asarray(price, dtype=np.float64)
+    cost_value = quantity * np.asarray(cost_basis, dtype=np.float64)
+    unrealized = market_value - cost_value
+    total_value = float(market_value.sum())
+    total_cost = float(cost_value.sum())
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pnl_pct = np.where(cost_value != 0, unrealized / cost_value * 100, 0.0)
+        weight = market_value / total_value if total_value else np.zeros_like(market_value)
+    return {
+        "market_value": market_value,
+        "cost_value": cost_value,
+        "unrealized_pnl": unrealized,
+        "unrealized_pnl_pct": pnl_pct,
+        "weight": weight,
+        "total_value": total_value,
+        "total_cost": total_cost,
+    }
+
+
+class _Book:
+    """Positions of one portfolio as parallel columns."""
+
+    def __init__(self, portfolio_id):
+        self.portfolio_id = portfolio_id
+        self.position_ids = np.empty(0, dtype=np.int64)
+        self.asset_ids = np.empty(0, dtype=np.int64)
+        self.tickers = []
+        self.quantity = np.empty(0)
+        self.cost_basis = np.empty(0)
+        self.price = np.empty(0)
+        self.total_value = 0.0
+        self.total_cost = 0.0
+
+    def append(self, position_id, asset_id, ticker, quantity, cost_basis, price):
+        self.position_ids = np.append(self.position_ids, position_id)
+        self.asset_ids = np.append(self.asset_ids, asset_id)
+        self.tickers.append(ticker)
+        self.quantity = np.append(self.quantity, float(quantity))
+        self.cost_basis = np.append(self.cost_basis, float(cost_basis))
+        self.price = np.append(self.price, float(price))
+
+    def remove(self, index):
+        keep = np.arange(len(self.asset_ids)) != index
+        self.position_ids = self.position_ids[keep]
+        self.asset_ids = self.asset_ids[keep]
+        del self.tickers[index]
+        self.quantity = self.quantity[keep]
+        self.cost_basis = self.cost_basis[keep]
+        self.price = self.price[keep]
+
+    def index_of(self, asset_id):
+        found = np.flatnonzero(self.asset_ids == asset_id)
+        return int(found[0]) if len(found) else None
+
+    def retotal(self):
+        self.total_value = float(self.quantity @ self.price)
+        self.total_cost = float(self.quantity @ self.cost_basis)
+
+
+class ValuationCache:
+    """
+    Per-process cache of portfolio valuations.
+
+    Books are loaded from MySQL on first use. Route handlers bump the shared
+    version with bump() inside their transaction and report the write
+    through on_price(), on_position() or invalidate() after committing, so
+    cached books stay current without reloading.
+    """
+
+    def __init__(self):
+        self.ttl = 300.0
+        self.poll_interval = 1.0
+        self._books = {}
+        self._holders = {}
+        self._complete = False
+        self._version = None
+        self._loaded_at = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Read VALUATION_CACHE_TTL and VALUATION_CACHE_POLL (seconds).
+
+        Args:
+        - app (Flask): The Flask application instance to attach to.
+        """
+        app.config.setdefault("VALUATION_CACHE_TTL", 300.0)
+        app.config.setdefault("VALUATION_CACHE_POLL", 1.0)
+        self.ttl = app.config["VALUATION_CACHE_TTL"]
+        self.poll_interval = app.config["VALUATION_CACHE_POLL"]
+
+    def bump(self, cursor):
+        """
+        Advance the shared version inside a transaction that writes positions or prices.
+
+        Args:
+        - cursor (Cursor): DictCursor of the writing transaction.
+
+        Returns:
+        - int: The new version; pass it to on_price(), on_position() or
+          invalidate() after committing.
+        """
+        versions.bump(cursor, VERSION_NAME)
+        return versions.current(cursor, [VERSION_NAME])[VERSION_NAME]
+
+    def get(self, conn, portfolio_id):
+        """
+        Valuation of one portfolio, loading its book if it is not cached.
+
+        Args:
+        - conn (Connection): Connection used on a cache miss.
+        - portfolio_id (int): The portfolio to value.
+
+        Returns:
+        - dict: Totals and per-position values, or None if the portfolio does not exist.
+        """
+        self._refresh(conn)
+        with self._lock:
+            book = self._books.get(portfolio_id)
+        if book is None:
+            self._load(conn, portfolio_id)
+            with self._lock:
+                book = self._books.get(portfolio_id)
+                if book is None:
+                    return None
+        with self._lock:
+            return self._serialize(book, with_positions=True)
+
+    def all(self, conn):
+        """
+        Totals for every portfolio, loading all books in one query on first use.
+
+        Returns:
+        - list: One summary dict per portfolio, ordered by portfolioID.
+        """
+        self._refresh(conn)
+        if not self._complete:
+            self._load(conn)
+        with self._lock:
+            return [
+                self._serialize(self._books[pid], with_positions=False)
+                for pid in sorted(self._books)
+            ]
+
+    def on_price(self, asset_id, price, version=None):
+        """
+        Apply a new CurrentPrice to every cached book holding the asset.
+
+        Args:
+        - asset_id (int): Asset whose price changed.
+        - price (float): The new CurrentPrice.
+        - version (int, optional): What bump() returned for the write.
+        """
+        price = float(price)
+        with self._lock:
+            for portfolio_id in self._holders.get(asset_id, ()):
+                book = self._books[portfolio_id]
+                i = book.index_of(asset_id)
+                # Only this position's market value moves
+                book.total_value += book.quantity[i] * (price - book.price[i])
+                book.price[i] = price
+            self._advance(version)
+
+    def on_position(self, portfolio_id, asset_id, position_id=None, quantity=None,
+                    cost_basis=None, ticker=None, price=None, version=None):
+        """
+        Apply a created, updated or deleted position to its cached book.
+
+        Args:
+        - portfolio_id (int): Portfolio the position belongs to.
+        - asset_id (int): Asset of the position.
+        - position_id (int, optional): Required when the position is new.
+        - quantity (float, optional): New quantity; None with cost_basis None deletes.
+        - cost_basis (float, optional): New average cost basis.
+        - ticker (str, optional): Ticker of a new position.
+        - price (float, optional): CurrentPrice of a new position's asset.
+        - version (int, optional): What bump() returned for the write.
+        """
+        with self._lock:
+            self._patch(portfolio_id, asset_id, position_id, quantity, cost_basis, ticker, price)
+            self._advance(version)
+
+    def _patch(self, portfolio_id, asset_id, position_id, quantity, cost_basis, ticker, price):
+        book = self._books.get(portfolio_id)
+        if book is None:
+            # Not cached yet; it will be loaded fresh on first read
+            return
+        i = book.index_of(asset_id)
+        if quantity is None and cost_basis is None:
+            if i is not None:
+                book.remove(i)
+                self._holders.get(asset_id, set()).discard(portfolio_id)
+        elif i is None:
+            if price is None:
+                # Not enough to value the new position; reload on next read
+                self._drop(portfolio_id)
+                return
+            book.append(position_id, asset_id, ticker, quantity, cost_basis, price)
+            self._holders.setdefault(asset_id, set()).add(portfolio_id)
+        else:
+            if quantity is not None:
+                book.quantity[i] = float(quantity)
+            if cost_basis is not None:
+                book.cost_basis[i] = float(cost_basis)
+        book.retotal()
+
+    def invalidate(self, portfolio_id=None, asset_id=None, version=None):
+        """
+        Drop cached books so they are reloaded on next read.
+
+        Args:
+        - portfolio_id (int, optional): Drop this portfolio's book.
+        - asset_id (int, optional): Drop every book holding this asset.
+          With neither argument the whole cache is cleared.
+        - version (int, optional): What bump() returned for the write.
+        """
+        with self._lock:
+            if portfolio_id is None and asset_id is None:
+                self._clear()
+            if portfolio_id is not None:
+                self._drop(portfolio_id)
+            if asset_id is not None:
+                for holder in list(self._holders.get(asset_id, ())):
+                    self._drop(holder)
+            self._complete = False
+            self._advance(version)
+
+    def stats(self):
+        """Number of cached books and positions."""
+        with self._lock:
+            return {
+                "portfolios": len(self._books),
+                "positions": sum(len(b.asset_ids) for b in self._books.values()),
+                "complete": self._complete,
+                "version": self._version,
+            }
+
+    def _refresh(self, conn):
+        now = time.monotonic()
+        with self._lock:
+            loaded_at, checked_at = self._loaded_at, self._checked_at
+        expired = loaded_at is not None and now - loaded_at > self.ttl
+        if not expired and checked_at is not None and now - checked_at < self.poll_interval:
+            return
+
+        cursor = conn.cursor()
+        try:
+            latest = versions.current(cursor, [VERSION_NAME])[VERSION_NAME]
+        finally:
+            cursor.close()
+        with self._lock:
+            if expired or latest != self._version:
+                self._clear()
+                self._loaded_at = now
+            self._version = latest
+            self._checked_at = now
+
+    def _advance(self, version):
+        # Called with the lock held after this worker applied its own write
+        if version is None:
+            return
+        if self._version is not None and version <= self._version + 1:
+            # Versions already seen were read after this write committed
+            self._version = max(self._version, version)
+        else:
+            # Another writer moved the counter too; its changes are not here.
+            # Re-read the counter on the next read.
+            self._clear()
+            self._version = self._checked_at = None
+
+    def _clear(self):
+        self._books.clear()
+        self._holders.clear()
+        self._complete = False
+
+    def _drop(self, portfolio_id):
+        self._unindex(portfolio_id)
+        self._complete = False
+
+    def _unindex(self, portfolio_id):
+        book = self._books.pop(portfolio_id, None)
+        if book is not None:
+            for asset_id in book.asset_ids.tolist():
+                self._holders.get(asset_id, set()).discard(portfolio_id)
+
+    def _load(self, conn, portfolio_id=None):
+        query = POSITIONS_QUERY
+        params = ()
+        if portfolio_id is not None:
+            query += " WHERE p.portfolioID = %s"
+            params = (portfolio_id,)
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+
+        books = {}
+        for row in rows:
+            book = books.setdefault(row["portfolioID"], _Book(row["portfolioID"]))
+            if row["positionID"] is not None:
+                book.append(
+                    row["positionID"], row["assetID"], row["TickerSymbol"],
+                    row["Quantity"], row["AvgCostBasis"], row["CurrentPrice"],
+                )
+        for book in books.values():
+            book.retotal()
+
+        with self._lock:
+            if portfolio_id is None:
+                self._books.clear()
+                self._holders.clear()
+            for pid, book in books.items():
+                self._unindex(pid)
+                self._books[pid] = book
+                for asset_id in book.asset_ids.tolist():
+                    self._holders.setdefault(asset_id, set()).add(pid)
+            if portfolio_id is None:
+                self._complete = True
+
+    @staticmethod
+    def _serialize(book, with_positions):
+        values = value_positions(book.quantity, book.cost_basis, book.price)
+        total_value = round(book.total_value, 2)
+        total_cost = round(book.total_cost, 2)
+        pnl = total_value - total_cost
+        summary = {
+            "portfolioID": book.portfolio_id,
+            "marketValue": total_value,
+            "costBasis": total_cost,
+            "unrealizedPnL": round(pnl, 2),
+            "unrealizedPnLPct": round(pnl / total_cost * 100, 2) if total_cost else 0.0,
+            "positionCount": len(book.asset_ids),
+        }
+        if with_positions:
+            summary["positions"] = _position_rows(book, values)
+        return summary
+
+
+def _position_rows(book, values):
+    """Per-position valuation rows for a book and its value_positions() output."""
+    return [
+        {
+            "positionID": int(book.position_ids[i]),
+            "assetID": int(book.asset_ids[i]),
+            "TickerSymbol": book.tickers[i],
+            "Quantity": float(book.quantity[i]),
+            "AvgCostBasis": round(float(book.cost_basis[i]), 2),
+            "CurrentPrice": round(float(book.price[i]), 2),
+            "marketValue": round(float(values["market_value"][i]), 2),
+            "costValue": round(float(values["cost_value"][i]), 2),
+            "unrealizedPnL": round(float(values["unrealized_pnl"][i]), 2),
+            "unrealizedPnLPct": round(float(values["unrealized_pnl_pct"][i]), 2),
+            "weight": round(float(values["weight"][i]), 6),
+        }
+        for i in range(len(book.asset_ids))
+    ]
+
+
+valuations = ValuationCache()
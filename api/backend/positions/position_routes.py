@@ -1,11 +1,40 @@
+import time
+
 from flask import Blueprint, jsonify, request
 from backend.db_connection import db
-from mysql.connector import Error
+from backend.common.pagination import Keyset
+from backend.common.streaming import stream_rows, wants_stream
+from backend.common.columnar import pa, stream_table, wants_columnar
+from backend.common import bulk
+from backend.portfolios.valuation import valuations
+from backend.assets.reference import POSITION_ASSET_FIELDS, add_asset_fields, reference
+from pymysql import Error
 from flask import current_app
 
 # Create a Blueprint for Position routes
 positions = Blueprint("positions", __name__)
 
+# Sort key for keyset pagination of get_all_positions
+POSITION_KEYSET = Keyset(("pos.portfolioID", "pos.assetID"), ("portfolioID", "assetID"))
+
+INSERT_POSITION_SQL = """
+INSERT INTO Position (portfolioID, assetID, Quantity, AvgCostBasis)
+VALUES (%s, %s, %s, %s)
+"""
+UPSERT_POSITION_SQL = """
+INSERT INTO Position (portfolioID, assetID, Quantity, AvgCostBasis)
+VALUES (%s, %s, %s, %s) AS new
+ON DUPLICATE KEY UPDATE Quantity = new.Quantity, AvgCostBasis = new.AvgCostBasis
+"""
+
+
+def _asset_columns():
+    # Arrow types of the POSITION_ASSET_FIELDS added from the reference cache
+    return [
+        (field, pa.float64() if field == "CurrentPrice" else pa.string())
+        for field in POSITION_ASSET_FIELDS
+    ]
+
 
 @positions.route("/positions", methods=["GET"])
 def get_all_positions():
@@ -14,27 +43,38 @@ def get_all_positions():
 
     Query parameters:
     - portfolioID (int, optional): Filter positions by portfolio ID.
+    - after (str, optional): next_cursor from the previous page.
+    - limit (int, optional): Page size (default 100, max 1000).
+    - stream (str, optional): '1' streams every matching row as NDJSON (also selected by Accept: application/x-ndjson).
+    - format (str, optional): 'arrow' or 'parquet' returns every matching row as an Arrow IPC stream or
+      Parquet file (also selected by Accept: application/vnd.apache.arrow.stream or application/vnd.apache.parquet).
 
     Returns:
-    - JSON: Success response with position data sorted by portfolio ID and ticker symbol, or error details.
+    - JSON: Success response with position data sorted by portfolio ID and asset ID plus next_cursor, or error details.
 
     Raises:
     - DatabaseError: If query execution fails.
     """
     try:
         current_app.logger.info('Starting get_all_positions request')
+        try:
+            page = POSITION_KEYSET.page(request.args)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
         cursor = db.get_db().cursor()
 
         # Get query parameters for filtering
         portfolio_id = request.args.get("portfolioID")
 
-        # Prepare the base query
+        # Prepare the base query; asset fields come from the reference cache
         query = """
         SELECT pos.positionID, pos.portfolioID, pos.assetID, pos.Quantity, pos.AvgCostBasis,
-               a.TickerSymbol, a.AssetName, a.AssetType, a.CurrentPrice,
                p.Name AS portfolioName
         FROM Position pos
-        JOIN Asset a ON pos.assetID = a.assetID
         JOIN Portfolio p ON pos.portfolioID = p.portfolioID
         WHERE 1=1
         """
@@ -45,17 +85,39 @@ def get_all_positions():
             query += " AND pos.portfolioID = %s"
             params.append(int(portfolio_id))
 
-        query += " ORDER BY pos.portfolioID, a.TickerSymbol"
+        fmt = wants_columnar()
+        if fmt is not None or wants_stream():
+            # Whole result set as Arrow/Parquet or NDJSON, read through a server-side cursor
+            cursor.close()
+            page_sql, page_params = page.clause(limit=False)
+            assets = reference.snapshot(db.get_db())
+
+            def transform(rows):
+                return add_asset_fields(rows, assets, POSITION_ASSET_FIELDS)
+
+            if fmt is not None:
+                return stream_table(
+                    query + page_sql, params + page_params, fmt,
+                    transform=transform, extra_columns=_asset_columns(),
+                )
+            return stream_rows(query + page_sql, params + page_params, transform=transform)
+
+        page_sql, page_params = page.clause()
+        query += page_sql
+        params += page_params
 
         current_app.logger.debug(f'Executing query: {query} with params: {params}')
         cursor.execute(query, params)
-        positions_data = cursor.fetchall()
+        positions_data, next_cursor = page.finish(cursor.fetchall())
         cursor.close()
+        assets = reference.snapshot(db.get_db(), require={pos["assetID"] for pos in positions_data})
+        add_asset_fields(positions_data, assets, POSITION_ASSET_FIELDS)
 
         current_app.logger.info(f'Successfully retrieved {len(positions_data)} positions')
         return jsonify({
             "success": True,
-            "data": positions_data
+            "data": positions_data,
+            "next_cursor": next_cursor
         }), 200
     except Error as e:
         current_app.logger.error(f'Database error in get_all_positions: {str(e)}')
@@ -162,8 +224,12 @@ def create_position():
             }), 404
 
         # Check if asset exists
-        cursor.execute("SELECT assetID FROM Asset WHERE assetID = %s", (data["assetID"],))
-        if not cursor.fetchone():
+        cursor.execute(
+            "SELECT assetID, TickerSymbol, CurrentPrice FROM Asset WHERE assetID = %s",
+            (data["assetID"],)
+        )
+        asset = cursor.fetchone()
+        if not asset:
             cursor.close()
             return jsonify({
                 "success": False,
@@ -185,21 +251,27 @@ def create_position():
             }), 400
 
         # Insert new position
-        query = """
-        INSERT INTO Position (portfolioID, assetID, Quantity, AvgCostBasis)
-        VALUES (%s, %s, %s, %s)
-        """
-        
-        cursor.execute(query, (
+        cursor.execute(INSERT_POSITION_SQL, (
             data["portfolioID"],
             data["assetID"],
             data["Quantity"],
             float(data["AvgCostBasis"])
         ))
 
-        db.get_db().commit()
         new_position_id = cursor.lastrowid
+        version = valuations.bump(cursor)
+        db.get_db().commit()
         cursor.close()
+        valuations.on_position(
+            int(data["portfolioID"]),
+            int(data["assetID"]),
+            position_id=new_position_id,
+            quantity=data["Quantity"],
+            cost_basis=data["AvgCostBasis"],
+            ticker=asset["TickerSymbol"],
+            price=asset["CurrentPrice"],
+            version=version,
+        )
 
         current_app.logger.info(f'Successfully created position {new_position_id}')
         return jsonify({
@@ -219,6 +291,135 @@ def create_position():
         }), 500
 
 
+def _parse_position(item):
+    # One item of a create_positions batch
+    bulk.require_fields(item, ("portfolioID", "assetID", "Quantity", "AvgCostBasis"))
+    try:
+        quantity = float(item["Quantity"])
+        position = {
+            "portfolioID": int(item["portfolioID"]),
+            "assetID": int(item["assetID"]),
+            "Quantity": int(quantity),
+            "AvgCostBasis": round(float(item["AvgCostBasis"]), 2),
+        }
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("portfolioID, assetID, Quantity and AvgCostBasis must be numbers")
+    if quantity != position["Quantity"] or quantity <= 0:
+        raise ValueError("Quantity must be a positive whole number")
+    if position["AvgCostBasis"] < 0:
+        raise ValueError("AvgCostBasis must not be negative")
+    return position
+
+
+@positions.route("/positions:bulk", methods=["POST"])
+def create_positions():
+    """
+    Create many positions in one transaction.
+
+    Every item is validated before anything is written; one invalid item
+    rejects the whole batch.
+
+    Query parameters:
+    - upsert (bool, optional): Replace the Quantity and AvgCostBasis of
+      positions that already exist instead of rejecting them (default false).
+
+    Request body (JSON):
+    - A list of create_position bodies (portfolioID, assetID, Quantity,
+      AvgCostBasis), or {"positions": [...]}; at most 5000.
+
+    Returns:
+    - JSON: 201 with one {"index", "positionID", "created"} result per item
+      in request order and the rows written per second, or 400 listing the
+      invalid items by index.
+
+    Raises:
+    - DatabaseError: If query execution fails.
+    """
+    started = time.perf_counter()
+    try:
+        upsert = request.args.get("upsert", "false").lower() in ("1", "true", "yes")
+        try:
+            items = bulk.read_items(request.get_json(silent=True), "positions")
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
+        parsed, errors = bulk.parse_items(items, _parse_position)
+
+        seen = {}
+        for index, position in enumerate(parsed):
+            if position is None:
+                continue
+            key = (position["portfolioID"], position["assetID"])
+            if key in seen:
+                errors.append({"index": index, "error": f"Same portfolio and asset as item {seen[key]}"})
+            seen[key] = index
+
+        conn = db.get_db()
+        cursor = conn.cursor()
+        bulk.check_exists(cursor, parsed, errors, "portfolioID", "Portfolio", "Portfolio")
+        bulk.check_exists(cursor, parsed, errors, "assetID", "Asset", "Asset")
+
+        # Positions already held, by (portfolioID, assetID)
+        held = {}
+        portfolio_ids = sorted({portfolio for portfolio, _ in seen})
+        if portfolio_ids:
+            placeholders = ", ".join(["%s"] * len(portfolio_ids))
+            cursor.execute(
+                f"SELECT positionID, portfolioID, assetID FROM Position WHERE portfolioID IN ({placeholders})",
+                portfolio_ids
+            )
+            held = {(row["portfolioID"], row["assetID"]): row["positionID"] for row in cursor.fetchall()}
+        if not upsert:
+            for key, index in seen.items():
+                if key in held:
+                    errors.append({"index": index, "error": "Position already exists for this portfolio and asset"})
+
+        if errors:
+            cursor.close()
+            return bulk.invalid(errors, len(items))
+
+        rows = [(p["portfolioID"], p["assetID"], p["Quantity"], p["AvgCostBasis"]) for p in parsed]
+        if upsert:
+            # Upserts do not reserve consecutive ids; read the new ones back
+            bulk.execute_many(cursor, UPSERT_POSITION_SQL, rows)
+            placeholders = ", ".join(["%s"] * len(portfolio_ids))
+            cursor.execute(
+                f"SELECT positionID, portfolioID, assetID FROM Position WHERE portfolioID IN ({placeholders})",
+                portfolio_ids
+            )
+            ids = {(row["portfolioID"], row["assetID"]): row["positionID"] for row in cursor.fetchall()}
+            new_ids = [ids[(p["portfolioID"], p["assetID"])] for p in parsed]
+        else:
+            new_ids = bulk.insert_many(cursor, INSERT_POSITION_SQL, rows)
+        version = valuations.bump(cursor)
+        conn.commit()
+        cursor.close()
+        for portfolio_id in portfolio_ids:
+            valuations.invalidate(portfolio_id=portfolio_id, version=version)
+
+        results = [
+            {
+                "index": index,
+                "positionID": new_ids[index],
+                "created": (p["portfolioID"], p["assetID"]) not in held,
+            }
+            for index, p in enumerate(parsed)
+        ]
+        current_app.logger.info(f"Successfully wrote {len(results)} positions in {len(portfolio_ids)} portfolios")
+        return bulk.created("Positions written successfully", results, started)
+    except Error as e:
+        db.get_db().rollback()
+        current_app.logger.error(f'Database error in create_positions: {str(e)}')
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
+
+
 @positions.route("/positions/<int:position_id>", methods=["PUT"])
 def update_position(position_id):
     """
@@ -243,7 +444,8 @@ def update_position(position_id):
         # Check if position exists
         cursor = db.get_db().cursor()
         cursor.execute("SELECT * FROM Position WHERE positionID = %s", (position_id,))
-        if not cursor.fetchone():
+        position = cursor.fetchone()
+        if not position:
             cursor.close()
             return jsonify({
                 "success": False,
@@ -276,8 +478,16 @@ def update_position(position_id):
         query = f"UPDATE Position SET {', '.join(update_fields)} WHERE positionID = %s"
 
         cursor.execute(query, params)
+        version = valuations.bump(cursor)
         db.get_db().commit()
         cursor.close()
+        valuations.on_position(
+            position["portfolioID"],
+            position["assetID"],
+            quantity=data.get("Quantity"),
+            cost_basis=data.get("AvgCostBasis"),
+            version=version,
+        )
 
         current_app.logger.info(f'Successfully updated position {position_id}')
         return jsonify({
@@ -316,7 +526,8 @@ def delete_position(position_id):
 
         # Check if position exists
         cursor.execute("SELECT * FROM Position WHERE positionID = %s", (position_id,))
-        if not cursor.fetchone():
+        position = cursor.fetchone()
+        if not position:
             cursor.close()
             return jsonify({
                 "success": False,
@@ -326,8 +537,10 @@ def delete_position(position_id):
 
         # Delete the position
         cursor.execute("DELETE FROM Position WHERE positionID = %s", (position_id,))
+        version = valuations.bump(cursor)
         db.get_db().commit()
         cursor.close()
+        valuations.on_position(position["portfolioID"], position["assetID"], version=version)
 
         current_app.logger.info(f'Successfully deleted position {position_id}')
         return jsonify({
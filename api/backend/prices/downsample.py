@@ -0,0 +1,135 @@
+# Price-history aggregation and downsampling helpers.
+#
+# OHLCV bars are built in MySQL so only one row per bucket leaves the
+# database; LTTB then trims the series to a fixed number of points for line
+# charts while keeping the visually important peaks and troughs.
+import numpy as np
+
+# SQL expression for the first day of each bucket, keyed by interval
+INTERVAL_BUCKETS = {
+    "1d": "DATE(Date)",
+    "1w": "DATE(DATE_SUB(Date, INTERVAL WEEKDAY(Date) DAY))",
+    "1M": "DATE(DATE_SUB(Date, INTERVAL DAYOFMONTH(Date) - 1 DAY))",
+}
+
+MAX_POINTS_LIMIT = 10000
+
+
+def ohlcv_query(interval, start_date=None, end_date=None, before=None):
+    """
+    Build the aggregation query for one asset's price history.
+
+    Daily highs and lows are optional in PriceHistory; where they are
+    missing, the bar's high and low fall back to the open and close.
+
+    Args:
+    - interval (str): One of INTERVAL_BUCKETS.
+    - start_date (str, optional): Lower bound on Date.
+    - end_date (str, optional): Upper bound on Date.
+    - before (str, optional): Only bars whose bucket starts before this date,
+      used to page through bars newest first.
+
+    Returns:
+    - tuple: (query, extra params appended after assetID).
+    """
+    bucket = INTERVAL_BUCKETS[interval]
+    filters = ""
+    params = []
+    if start_date:
+        filters += " AND Date >= %s"
+        params.append(start_date)
+    if end_date:
+        filters += " AND Date <= %s"
+        params.append(end_date)
+    if before:
+        # Every row of a bucket is on or after its start, so this drops
+        # whole buckets and keeps the filter on the indexed Date column
+        filters += " AND Date < %s"
+        params.append(before)
+
+    query = f"""
+    SELECT bucket AS Date,
+           MAX(CASE WHEN first_rank = 1 THEN openPrice END) AS openPrice,
+           MAX(COALESCE(highPrice, GREATEST(openPrice, closePrice))) AS highPrice,
+           MIN(COALESCE(lowPrice, LEAST(openPrice, closePrice))) AS lowPrice,
+           MAX(CASE WHEN last_rank = 1 THEN closePrice END) AS closePrice,
+           SUM(Volume) AS Volume,
+           COUNT(*) AS bars,
+           assetID
+    FROM (
+        SELECT Date, openPrice, highPrice, lowPrice, closePrice, Volume, assetID,
+               {bucket} AS bucket,
+               ROW_NUMBER() OVER (PARTITION BY {bucket} ORDER BY Date) AS first_rank,
+               ROW_NUMBER() OVER (PARTITION BY {bucket} ORDER BY Date DESC) AS last_rank
+        FROM PriceHistory
+        WHERE assetID = %s{filters}
+    ) AS ranked
+    GROUP BY bucket, assetID
+    ORDER BY bucket DESC
+    """
+    return query, params
+
+
+def lttb_indices(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets point selection.
+
+    Args:
+    - x (ndarray): Ascending x values (e.g. epoch days).
+    - y (ndarray): Values to preserve the shape of.
+    - max_points (int): Number of points to keep (at least 3).
+
+    Returns:
+    - ndarray: Sorted indices of the selected points, always including the
+      first and last.
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Interior points split into max_points - 2 buckets of near-equal size
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third vertex
+        if i + 2 < len(edges):
+            next_lo, next_hi = edges[i + 1], edges[i + 2]
+            avg_x = x[next_lo:next_hi].mean()
+            avg_y = y[next_lo:next_hi].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        area = np.abs(
+            (x[previous] - avg_x) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (avg_y - y[previous])
+        )
+        previous = lo + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample_rows(rows, max_points, value_key="closePrice", date_key="Date"):
+    """
+    Reduce date-descending price rows to at most max_points with LTTB.
+
+    Args:
+    - rows (list): Rows ordered by date descending, as returned by the routes.
+    - max_points (int): Upper bound on the number of rows returned.
+
+    Returns:
+    - list: The selected rows, still ordered by date descending.
+    """
+    if len(rows) <= max_points:
+        return rows
+    ordered = rows[::-1]
+    days = np.array([np.datetime64(r[date_key], "D") for r in ordered]).astype(np.int64)
+    values = np.array([float(r[value_key] or 0) for r in ordered])
+    keep = lttb_indices(days, values, max_points)
+    return [ordered[i] for i in keep[::-1]]
@@ -0,0 +1,577 @@
+# Bulk PriceHistory ingestion.
+#
+# Bars arrive as CSV, NDJSON or Parquet and are upserted on PriceHistory's
+# (assetID, Date) key in batched transactions, so re-sending a file corrects
+# existing bars instead of duplicating them. Each batch is one multi-row
+# INSERT (pymysql rewrites executemany), which keeps a 10M-bar load in the
+# range of minutes.
+#
+# The same code backs POST /asset/assets/<id>/price-history:bulk and a
+# loader CLI that checkpoints its progress in MySQL and resumes after a
+# failure. Run from the api directory:
+#   python -m backend.prices.ingest FILE [FILE ...] [--asset-id N]
+#       [--format csv|ndjson|parquet] [--batch-size N] [--load-data] [--restart]
+import argparse
+import csv
+import datetime
+import io
+import json
+import logging
+import os
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+
+from backend.common import versions
+from backend.db_connection.migrations import connect_from_env
+from backend.prices.price_store import price_store
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional
+    pq = None
+
+logger = logging.getLogger("prices")
+
+DEFAULT_BATCH_SIZE = 5000
+FORMATS = ("csv", "ndjson", "parquet")
+COLUMNS = ("assetID", "Date", "openPrice", "highPrice", "lowPrice", "closePrice", "adjClosePrice", "Volume")
+CHECKPOINT_TABLE = "PriceLoadCheckpoint"
+STAGE_TABLE = "PriceLoadStage"
+MAX_REPORTED_UNKNOWN = 20
+# CacheVersion data set bumped with every batch, for HTTP validators
+PRICES_VERSION = "prices"
+
+# executemany turns this into one multi-row INSERT only on PyMySQL >= 1.2,
+# whose statement parser accepts the "AS new" row alias
+UPSERT_SQL = f"""
+INSERT INTO PriceHistory ({", ".join(COLUMNS)})
+VALUES ({", ".join(["%s"] * len(COLUMNS))}) AS new
+ON DUPLICATE KEY UPDATE
+    openPrice = new.openPrice, highPrice = new.highPrice, lowPrice = new.lowPrice,
+    closePrice = new.closePrice, adjClosePrice = new.adjClosePrice, Volume = new.Volume
+"""
+
+# Accepted header / field names, compared lower-case without '_' or spaces
+ALIASES = {
+    "assetid": "assetID",
+    "ticker": "ticker", "tickersymbol": "ticker", "symbol": "ticker",
+    "date": "Date",
+    "open": "openPrice", "openprice": "openPrice",
+    "high": "highPrice", "highprice": "highPrice",
+    "low": "lowPrice", "lowprice": "lowPrice",
+    "close": "closePrice", "closeprice": "closePrice",
+    "adjclose": "adjClosePrice", "adjcloseprice": "adjClosePrice",
+    "volume": "Volume",
+}
+
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+}
+
+
+def canonical(name):
+    """Canonical column for a header or field name, or None if it is not a bar field."""
+    return ALIASES.get(str(name).strip().lower().replace("_", "").replace(" ", ""))
+
+
+def detect_format(name):
+    """
+    Input format from a file name or a Content-Type.
+
+    Returns:
+    - str: One of FORMATS, or None if it cannot be told.
+    """
+    name = (name or "").split(";")[0].strip().lower()
+    if name in CONTENT_TYPES:
+        return CONTENT_TYPES[name]
+    extension = os.path.splitext(name)[1].lstrip(".")
+    if extension in ("jsonl", "ndjson"):
+        return "ndjson"
+    return extension if extension in FORMATS else None
+
+
+def read_records(stream, fmt):
+    """
+    Iterate the bars of a binary stream as dicts keyed by canonical column.
+
+    Args:
+    - stream (file): Binary file object; Parquet needs it to be seekable.
+    - fmt (str): One of FORMATS.
+
+    Raises:
+    - ValueError: If the format is unknown or Parquet support is missing.
+    """
+    if fmt == "csv":
+        reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8", newline=""))
+        header = [canonical(name) for name in next(reader, [])]
+        for values in reader:
+            if values:
+                yield {key: value for key, value in zip(header, values) if key}
+    elif fmt == "ndjson":
+        for line in stream:
+            if line.strip():
+                yield {canonical(k): v for k, v in json.loads(line).items() if canonical(k)}
+    elif fmt == "parquet":
+        if pq is None:
+            raise ValueError("Parquet input needs pyarrow installed")
+        for batch in pq.ParquetFile(stream).iter_batches(batch_size=DEFAULT_BATCH_SIZE):
+            for record in batch.to_pylist():
+                yield {canonical(k): v for k, v in record.items() if canonical(k)}
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def load_assets(cursor):
+    """Known assetIDs and a TickerSymbol -> assetID map."""
+    cursor.execute("SELECT assetID, TickerSymbol FROM Asset")
+    rows = cursor.fetchall()
+    return {row["assetID"] for row in rows}, {row["TickerSymbol"]: row["assetID"] for row in rows}
+
+
+def _blank(value):
+    return value is None or value == ""
+
+
+def _decimal(record, key, required=True):
+    value = record.get(key)
+    if _blank(value):
+        if required:
+            raise ValueError(f"missing {key}")
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"{key} is not a number: {value!r}")
+
+
+def _date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if _blank(value):
+        raise ValueError("missing Date")
+    try:
+        return datetime.date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise ValueError(f"Date is not YYYY-MM-DD: {value!r}")
+
+
+def parse_bar(record, asset_id):
+    """
+    One PriceHistory row, in COLUMNS order, from a canonical record.
+
+    Args:
+    - record (dict): Bar fields keyed by canonical column.
+    - asset_id (int): Asset the bar belongs to, already resolved.
+
+    Raises:
+    - ValueError: If a required field is missing or malformed.
+    """
+    volume = _decimal(record, "Volume", required=False)
+    return (
+        asset_id,
+        _date(record.get("Date")),
+        _decimal(record, "openPrice"),
+        _decimal(record, "highPrice", required=False),
+        _decimal(record, "lowPrice", required=False),
+        _decimal(record, "closePrice"),
+        _decimal(record, "adjClosePrice", required=False),
+        int(volume) if volume is not None else 0,
+    )
+
+
+def resolve_asset(record, asset_ids, tickers, default_asset_id=None):
+    """
+    The assetID a record belongs to.
+
+    Returns:
+    - tuple: (assetID or None if unknown, the identifier the record used).
+
+    Raises:
+    - ValueError: If the record names no asset, or a different one than default_asset_id.
+    """
+    if not _blank(record.get("assetID")):
+        try:
+            named = int(record["assetID"])
+        except ValueError:
+            raise ValueError(f"assetID is not an integer: {record['assetID']!r}")
+        found = named if named in asset_ids else None
+    elif not _blank(record.get("ticker")):
+        named = record["ticker"]
+        found = tickers.get(named)
+    elif default_asset_id is not None:
+        return default_asset_id, default_asset_id
+    else:
+        raise ValueError("missing assetID or ticker")
+
+    if default_asset_id is not None and found != default_asset_id:
+        raise ValueError(f"bar for asset {named} posted to asset {default_asset_id}")
+    return found, named
+
+
+def ingest(conn, records, default_asset_id=None, batch_size=DEFAULT_BATCH_SIZE,
+           skip=0, on_batch=None, on_commit=None):
+    """
+    Upsert bars into PriceHistory in batched transactions.
+
+    Bars for unknown assets are skipped and reported. A malformed record
+    aborts the load; batches committed before it stay committed, and since
+    every write is an upsert the input can simply be sent again.
+
+    Args:
+    - conn (Connection): DictCursor connection; committed once per batch.
+    - records (iterable): Canonical bar dicts, e.g. from read_records().
+    - default_asset_id (int, optional): Asset for records that name none;
+      records naming another asset are rejected.
+    - batch_size (int): Bars per transaction.
+    - skip (int): Leading records to skip, for resuming.
+    - on_batch (callable, optional): on_batch(cursor, records_done) runs
+      inside each batch's transaction, e.g. to checkpoint.
+    - on_commit (callable, optional): on_commit(rows) runs after each commit.
+
+    Returns:
+    - dict: rows, batches, skipped, unknown (first few identifiers),
+      records (including skipped ones), seconds and rows_per_sec.
+
+    Raises:
+    - ValueError: With the 1-based record number of a malformed record.
+    """
+    cursor = conn.cursor()
+    asset_ids, tickers = load_assets(cursor)
+    stats = {"rows": 0, "batches": 0, "skipped": 0, "unknown": [], "records": skip}
+    unknown = set()
+    started = time.monotonic()
+
+    def flush(batch, done):
+        try:
+            cursor.executemany(UPSERT_SQL, batch)
+            versions.bump(cursor, PRICES_VERSION)
+            if on_batch:
+                on_batch(cursor, done)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        stats["rows"] += len(batch)
+        stats["batches"] += 1
+        if on_commit:
+            on_commit(batch)
+        rate = stats["rows"] / max(time.monotonic() - started, 1e-6)
+        logger.info(f"Upserted {stats['rows']:,} bars ({rate:,.0f} rows/s)")
+
+    batch = []
+    number = 0
+    try:
+        for number, record in enumerate(records, start=1):
+            if number <= skip:
+                continue
+            try:
+                asset_id, named = resolve_asset(record, asset_ids, tickers, default_asset_id)
+                if asset_id is None:
+                    stats["skipped"] += 1
+                    unknown.add(named)
+                    continue
+                batch.append(parse_bar(record, asset_id))
+            except ValueError as e:
+                raise ValueError(f"Record {number}: {e}")
+            if len(batch) >= batch_size:
+                flush(batch, number)
+                batch = []
+        if batch:
+            flush(batch, number)
+    finally:
+        cursor.close()
+
+    elapsed = time.monotonic() - started
+    stats["records"] = max(number, skip)
+    stats["unknown"] = sorted(unknown, key=str)[:MAX_REPORTED_UNKNOWN]
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_sec"] = round(stats["rows"] / elapsed) if elapsed else stats["rows"]
+    return stats
+
+
+def append_to_store(rows):
+    """on_commit hook that merges freshly written bars into the shared price store."""
+    if price_store.enabled:
+        price_store.append_bars(
+            [row[0] for row in rows], [row[1] for row in rows],
+            [float(row[5]) for row in rows], [row[7] for row in rows],
+        )
+
+
+# ----------------------------------------------------------------------
+# Loader CLI
+# ----------------------------------------------------------------------
+def _checkpoint(cursor, source, size):
+    """Records already loaded from source, or 0 if it was never started or has changed."""
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+            source VARCHAR(512) NOT NULL PRIMARY KEY,
+            sourceSize BIGINT NOT NULL,
+            recordsDone BIGINT NOT NULL,
+            updatedAt DATETIME NOT NULL
+        )
+        """
+    )
+    cursor.execute(f"SELECT sourceSize, recordsDone FROM {CHECKPOINT_TABLE} WHERE source = %s", (source,))
+    row = cursor.fetchone()
+    if row is None:
+        return 0
+    if row["sourceSize"] != size:
+        logger.warning(f"{source} changed since the last run; loading it from the start")
+        return 0
+    return row["recordsDone"]
+
+
+def _save_checkpoint(source, size):
+    def save(cursor, done):
+        cursor.execute(
+            f"""
+            INSERT INTO {CHECKPOINT_TABLE} (source, sourceSize, recordsDone, updatedAt)
+            VALUES (%s, %s, %s, NOW()) AS new
+            ON DUPLICATE KEY UPDATE sourceSize = new.sourceSize, recordsDone = new.recordsDone,
+                                    updatedAt = new.updatedAt
+            """,
+            (source, size, done),
+        )
+    return save
+
+
+def load_file(conn, path, fmt=None, default_asset_id=None, batch_size=DEFAULT_BATCH_SIZE, restart=False):
+    """
+    Load one file, resuming from its checkpoint.
+
+    The checkpoint row is written in the same transaction as each batch,
+    so after a crash the next run starts exactly after the last committed
+    batch. It is removed once the file is fully loaded.
+
+    Returns:
+    - dict: ingest() statistics.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Cannot tell the format of {path}; pass --format")
+    source = os.path.abspath(path)
+    size = os.path.getsize(path)
+
+    cursor = conn.cursor()
+    skip = _checkpoint(cursor, source, size)
+    conn.commit()
+    if restart:
+        skip = 0
+    if skip:
+        logger.info(f"Resuming {path} after record {skip:,}")
+
+    with open(path, "rb") as stream:
+        stats = ingest(
+            conn, read_records(stream, fmt), default_asset_id, batch_size,
+            skip=skip, on_batch=_save_checkpoint(source, size),
+        )
+    cursor.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE source = %s", (source,))
+    conn.commit()
+    cursor.close()
+    return stats
+
+
+def load_data_infile(conn, path, default_asset_id=None, batch_size=DEFAULT_BATCH_SIZE, restart=False):
+    """
+    CSV fast path: LOAD DATA LOCAL INFILE into a staging table, then upsert.
+
+    The server parses the whole file in one statement; bars then move from
+    the staging table into PriceHistory in batched, checkpointed
+    transactions exactly like load_file(). Needs local_infile enabled on
+    both the server and the connection.
+
+    Returns:
+    - dict: ingest() statistics.
+    """
+    source = os.path.abspath(path)
+    size = os.path.getsize(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        columns = [canonical(name) for name in next(csv.reader(f), [])]
+    if "Date" not in columns:
+        raise ValueError(f"{path} has no Date column")
+    if default_asset_id is None and not {"assetID", "ticker"} & set(columns):
+        raise ValueError(f"{path} has no assetID or ticker column; pass --asset-id")
+
+    started = time.monotonic()
+    cursor = conn.cursor()
+    skip = _checkpoint(cursor, source, size)
+    conn.commit()
+    if restart:
+        skip = 0
+
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {STAGE_TABLE}")
+    cursor.execute(
+        f"""
+        CREATE TEMPORARY TABLE {STAGE_TABLE} (
+            line BIGINT AUTO_INCREMENT PRIMARY KEY,
+            assetID INT NULL,
+            ticker VARCHAR(20) NULL,
+            Date DATE NULL,
+            openPrice DECIMAL(10,2) NULL,
+            highPrice DECIMAL(10,2) NULL,
+            lowPrice DECIMAL(10,2) NULL,
+            closePrice DECIMAL(10,2) NULL,
+            adjClosePrice DECIMAL(10,2) NULL,
+            Volume BIGINT NULL
+        )
+        """
+    )
+    fields = ", ".join(f"@c{i}" for i in range(len(columns)))
+    assignments = []
+    for i, column in enumerate(columns):
+        if column:
+            value = f"NULLIF(TRIM(TRAILING '\\r' FROM @c{i}), '')"
+            assignments.append(f"{column} = " + (f"LEFT({value}, 10)" if column == "Date" else value))
+    cursor.execute(
+        f"""
+        LOAD DATA LOCAL INFILE %s INTO TABLE {STAGE_TABLE}
+        CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+        LINES TERMINATED BY '\\n'
+        IGNORE 1 LINES
+        ({fields})
+        SET {", ".join(assignments)}
+        """,
+        (source,),
+    )
+    cursor.execute(
+        f"""
+        UPDATE {STAGE_TABLE} s JOIN Asset a ON a.TickerSymbol = s.ticker
+        SET s.assetID = a.assetID
+        WHERE s.assetID IS NULL
+        """
+    )
+    if default_asset_id is not None:
+        cursor.execute(
+            f"UPDATE {STAGE_TABLE} SET assetID = %s WHERE assetID IS NULL AND ticker IS NULL",
+            (default_asset_id,),
+        )
+
+    # Reject the file before writing anything if a bar is malformed
+    cursor.execute(
+        f"""
+        SELECT MIN(line) AS line FROM {STAGE_TABLE}
+        WHERE line > %s
+          AND (Date IS NULL OR openPrice IS NULL OR closePrice IS NULL
+               OR (%s IS NOT NULL AND assetID <> %s))
+        """,
+        (skip, default_asset_id, default_asset_id),
+    )
+    bad = cursor.fetchone()["line"]
+    if bad is not None:
+        raise ValueError(f"Record {bad}: missing Date, openPrice or closePrice, or another asset's bar")
+
+    cursor.execute(
+        f"""
+        SELECT COUNT(*) AS skipped,
+               GROUP_CONCAT(DISTINCT COALESCE(s.ticker, s.assetID) LIMIT {MAX_REPORTED_UNKNOWN}) AS unknown
+        FROM {STAGE_TABLE} s LEFT JOIN Asset a ON a.assetID = s.assetID
+        WHERE s.line > %s AND a.assetID IS NULL
+        """,
+        (skip,),
+    )
+    missing = cursor.fetchone()
+    cursor.execute(f"SELECT COALESCE(MAX(line), 0) AS last FROM {STAGE_TABLE}")
+    last = cursor.fetchone()["last"]
+
+    stats = {"rows": 0, "batches": 0, "skipped": missing["skipped"],
+             "unknown": (missing["unknown"] or "").split(",") if missing["unknown"] else [],
+             "records": last}
+    save = _save_checkpoint(source, size)
+    lower = skip
+    while lower < last:
+        upper = min(lower + batch_size, last)
+        try:
+            cursor.execute(
+                f"""
+                INSERT INTO PriceHistory ({", ".join(COLUMNS)})
+                SELECT * FROM (
+                    SELECT s.assetID, s.Date, s.openPrice, s.highPrice, s.lowPrice,
+                           s.closePrice, s.adjClosePrice, COALESCE(s.Volume, 0) AS Volume
+                    FROM {STAGE_TABLE} s JOIN Asset a ON a.assetID = s.assetID
+                    WHERE s.line > %s AND s.line <= %s
+                ) AS new
+                ON DUPLICATE KEY UPDATE
+                    openPrice = new.openPrice, highPrice = new.highPrice, lowPrice = new.lowPrice,
+                    closePrice = new.closePrice, adjClosePrice = new.adjClosePrice, Volume = new.Volume
+                """,
+                (lower, upper),
+            )
+            versions.bump(cursor, PRICES_VERSION)
+            save(cursor, upper)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        cursor.execute(
+            f"""
+            SELECT COUNT(*) AS n FROM {STAGE_TABLE} s JOIN Asset a ON a.assetID = s.assetID
+            WHERE s.line > %s AND s.line <= %s
+            """,
+            (lower, upper),
+        )
+        stats["rows"] += cursor.fetchone()["n"]
+        stats["batches"] += 1
+        rate = stats["rows"] / max(time.monotonic() - started, 1e-6)
+        logger.info(f"Upserted {stats['rows']:,} bars ({rate:,.0f} rows/s)")
+        lower = upper
+
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {STAGE_TABLE}")
+    cursor.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE source = %s", (source,))
+    conn.commit()
+    cursor.close()
+
+    elapsed = time.monotonic() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_sec"] = round(stats["rows"] / elapsed) if elapsed else stats["rows"]
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.prices.ingest")
+    parser.add_argument("files", nargs="+", help="CSV, NDJSON (.jsonl/.ndjson) or Parquet files")
+    parser.add_argument("--format", choices=FORMATS, help="override the format taken from each file name")
+    parser.add_argument("--asset-id", type=int, help="asset for bars that name none")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--load-data", action="store_true", help="load CSV files with LOAD DATA LOCAL INFILE")
+    parser.add_argument("--restart", action="store_true", help="ignore checkpoints and start each file over")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    conn = connect_from_env(local_infile=args.load_data)
+    status = 0
+    try:
+        for path in args.files:
+            fmt = args.format or detect_format(path)
+            try:
+                if args.load_data and fmt == "csv":
+                    stats = load_data_infile(conn, path, args.asset_id, args.batch_size, args.restart)
+                else:
+                    stats = load_file(conn, path, fmt, args.asset_id, args.batch_size, args.restart)
+            except ValueError as e:
+                print(f"{path}: {e}", file=sys.stderr)
+                status = 1
+                continue
+            print(
+                f"{path}: {stats['rows']:,} bars in {stats['seconds']}s "
+                f"({stats['rows_per_sec']:,} rows/s), {stats['skipped']:,} skipped"
+                + (f" (unknown assets: {', '.join(map(str, stats['unknown']))})" if stats["unknown"] else "")
+            )
+    finally:
+        conn.close()
+    # API workers reload the shared price matrix on their next read
+    price_store.invalidate()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+# Range-partitioned PriceHistory layout and maintenance.
+#
+# PriceHistory is clustered on (assetID, Date) and partitioned by year, so
+# one asset's bars for a date range sit on contiguous pages of a few
+# partitions, and a whole year can be archived or dropped as a metadata
+# operation instead of a multi-million-row DELETE.
+#
+# Run from the api directory:
+#   python -m backend.prices.partitioning migrate [--batch-size N]
+#   python -m backend.prices.partitioning partitions
+#   python -m backend.prices.partitioning add-year YEAR
+#   python -m backend.prices.partitioning archive YEAR
+#   python -m backend.prices.partitioning drop YEAR
+#   python -m backend.prices.partitioning drop-legacy
+import argparse
+import datetime
+import logging
+import sys
+import time
+
+from backend.common import versions
+from backend.db_connection.migrations import connect_from_env
+from backend.prices.ingest import PRICES_VERSION
+
+logger = logging.getLogger("prices")
+
+FIRST_YEAR = 2015
+DEFAULT_BATCH_SIZE = 50000
+NEW_TABLE = "PriceHistory_new"
+LEGACY_TABLE = "PriceHistory_legacy"
+CHECKPOINT_TABLE = "PriceHistory_migration"
+
+
+def table_sql(name, first_year=FIRST_YEAR, last_year=None):
+    """
+    CREATE TABLE statement for the partitioned layout.
+
+    Partitioning rules out foreign keys, so Asset deletes check for price
+    history themselves.
+    """
+    last_year = last_year or datetime.date.today().year + 1
+    partitions = ",\n    ".join(
+        f"PARTITION p{year} VALUES LESS THAN ('{year + 1}-01-01')"
+        for year in range(first_year, last_year + 1)
+    )
+    return f"""
+CREATE TABLE IF NOT EXISTS {name} (
+    assetID INT NOT NULL,
+    Date DATE NOT NULL,
+    openPrice DECIMAL(10,2) NOT NULL,
+    highPrice DECIMAL(10,2) NULL,
+    lowPrice DECIMAL(10,2) NULL,
+    closePrice DECIMAL(10,2) NOT NULL,
+    adjClosePrice DECIMAL(10,2) NULL,
+    Volume BIGINT NOT NULL,
+    PRIMARY KEY (assetID, Date)
+)
+PARTITION BY RANGE COLUMNS (Date) (
+    {partitions},
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+)
+"""
+
+
+def is_partitioned(cursor, table="PriceHistory"):
+    cursor.execute(
+        """
+        SELECT COUNT(*) AS parts FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        """,
+        (table,),
+    )
+    return cursor.fetchone()["parts"] > 0
+
+
+def partitions(cursor, table="PriceHistory"):
+    """Partition names with their upper bound and approximate row counts."""
+    cursor.execute(
+        """
+        SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS lessThan, TABLE_ROWS AS rowEstimate
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+        """,
+        (table,),
+    )
+    return cursor.fetchall()
+
+
+def migrate(conn, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Move a legacy (priceID-keyed) PriceHistory into the partitioned layout.
+
+    Rows are copied into PriceHistory_new in priceID ranges, committing and
+    checkpointing after each batch, so an interrupted run resumes where it
+    stopped. The final catch-up and the table swap run under a write lock;
+    the old table is kept as PriceHistory_legacy until drop-legacy.
+    Several bars for one asset on the same day collapse into one row.
+
+    Args:
+    - conn (Connection): A DictCursor connection.
+    - batch_size (int): priceID span copied per transaction.
+
+    Returns:
+    - int: Rows copied, or 0 if PriceHistory is already partitioned.
+    """
+    cursor = conn.cursor()
+    if is_partitioned(cursor):
+        cursor.close()
+        return 0
+
+    cursor.execute("SELECT MIN(YEAR(Date)) AS first, MAX(YEAR(Date)) AS last FROM PriceHistory")
+    years = cursor.fetchone()
+    first_year = min(years["first"] or FIRST_YEAR, FIRST_YEAR)
+    last_year = max(years["last"] or 0, datetime.date.today().year + 1)
+    cursor.execute(table_sql(NEW_TABLE, first_year, last_year))
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (id TINYINT PRIMARY KEY, lastPriceID INT NOT NULL)"
+    )
+    cursor.execute(f"INSERT IGNORE INTO {CHECKPOINT_TABLE} (id, lastPriceID) VALUES (1, 0)")
+    conn.commit()
+
+    copied = 0
+    started = time.monotonic()
+    while True:
+        cursor.execute("SELECT MAX(priceID) AS maxID FROM PriceHistory")
+        max_id = cursor.fetchone()["maxID"] or 0
+        cursor.execute(f"SELECT lastPriceID FROM {CHECKPOINT_TABLE} WHERE id = 1")
+        last_id = cursor.fetchone()["lastPriceID"]
+        if last_id >= max_id:
+            break
+        upper = min(last_id + batch_size, max_id)
+        copied += _copy_range(cursor, last_id, upper)
+        conn.commit()
+        rate = copied / max(time.monotonic() - started, 1e-6)
+        logger.info(f"Copied PriceHistory up to priceID {upper}/{max_id} ({rate:,.0f} rows/s)")
+
+    # Writers are blocked only for the last catch-up batch and the rename
+    cursor.execute(
+        f"LOCK TABLES PriceHistory WRITE, {NEW_TABLE} WRITE, {CHECKPOINT_TABLE} WRITE"
+    )
+    try:
+        cursor.execute(f"SELECT lastPriceID FROM {CHECKPOINT_TABLE} WHERE id = 1")
+        last_id = cursor.fetchone()["lastPriceID"]
+        cursor.execute("SELECT MAX(priceID) AS maxID FROM PriceHistory")
+        max_id = cursor.fetchone()["maxID"] or 0
+        if max_id > last_id:
+            copied += _copy_range(cursor, last_id, max_id)
+        cursor.execute(f"RENAME TABLE PriceHistory TO {LEGACY_TABLE}, {NEW_TABLE} TO PriceHistory")
+    finally:
+        cursor.execute("UNLOCK TABLES")
+    cursor.execute(f"DROP TABLE IF EXISTS {CHECKPOINT_TABLE}")
+    conn.commit()
+    cursor.close()
+    logger.info(f"PriceHistory migrated to the partitioned layout ({copied} rows)")
+    return copied
+
+
+def _copy_range(cursor, after_id, upper_id):
+    cursor.execute(
+        f"""
+        INSERT INTO {NEW_TABLE} (assetID, Date, openPrice, closePrice, Volume)
+        SELECT * FROM (
+            SELECT assetID, DATE(Date) AS day, openPrice, closePrice, Volume
+            FROM PriceHistory
+            WHERE priceID > %s AND priceID <= %s
+        ) AS src
+        ON DUPLICATE KEY UPDATE openPrice = src.openPrice, closePrice = src.closePrice, Volume = src.Volume
+        """,
+        (after_id, upper_id),
+    )
+    copied = cursor.rowcount
+    cursor.execute(f"UPDATE {CHECKPOINT_TABLE} SET lastPriceID = %s WHERE id = 1", (upper_id,))
+    return copied
+
+
+def add_year(cursor, year):
+    """Split pmax so the given year gets its own partition."""
+    cursor.execute(
+        f"""
+        ALTER TABLE PriceHistory REORGANIZE PARTITION pmax INTO (
+            PARTITION p{year} VALUES LESS THAN ('{year + 1}-01-01'),
+            PARTITION pmax VALUES LESS THAN (MAXVALUE)
+        )
+        """
+    )
+
+
+def archive_year(cursor, year):
+    """
+    Move one year out of PriceHistory into PriceHistory_archive_<year>.
+
+    EXCHANGE PARTITION swaps the partition's data files with an empty table
+    of the same shape, so no rows are copied; the emptied partition is then
+    dropped.
+
+    Returns:
+    - str: The archive table name.
+    """
+    archive = f"PriceHistory_archive_{year}"
+    cursor.execute(f"CREATE TABLE {archive} LIKE PriceHistory")
+    cursor.execute(f"ALTER TABLE {archive} REMOVE PARTITIONING")
+    cursor.execute(f"ALTER TABLE PriceHistory EXCHANGE PARTITION p{year} WITH TABLE {archive}")
+    cursor.execute(f"ALTER TABLE PriceHistory DROP PARTITION p{year}")
+    return archive
+
+
+def drop_year(cursor, year):
+    """Discard one year of bars by dropping its partition."""
+    cursor.execute(f"ALTER TABLE PriceHistory DROP PARTITION p{year}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.prices.partitioning")
+    parser.add_argument("command", choices=["migrate", "partitions", "add-year", "archive", "drop", "drop-legacy"])
+    parser.add_argument("year", nargs="?", type=int)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command in ("add-year", "archive", "drop") and args.year is None:
+        parser.error(f"{args.command} needs a YEAR")
+
+    conn = connect_from_env()
+    cursor = conn.cursor()
+    try:
+        if args.command == "migrate":
+            print(f"Copied {migrate(conn, args.batch_size)} rows")
+        elif args.command == "partitions":
+            for part in partitions(cursor):
+                print(f"{part['name']:>8}  < {part['lessThan']:<14} ~{part['rowEstimate']} rows")
+        elif args.command == "add-year":
+            add_year(cursor, args.year)
+        elif args.command == "archive":
+            print(f"Archived to {archive_year(cursor, args.year)}")
+        elif args.command == "drop":
+            drop_year(cursor, args.year)
+        elif args.command == "drop-legacy":
+            cursor.execute(f"DROP TABLE IF EXISTS {LEGACY_TABLE}")
+        if args.command in ("migrate", "archive", "drop"):
+            versions.bump(cursor, PRICES_VERSION)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,460 @@
+# In-process PriceHistory store backed by shared memory.
+#
+# PriceHistory is loaded once into a dense date x asset close matrix and a
+# matching volume matrix. Both live in a multiprocessing.shared_memory
+# segment, so every API worker and backtest process on the host maps the
+# same physical pages instead of holding its own copy.
+#
+# Layout of a data segment ("<name>_g<generation>"), all 8-byte cells:
+#   header  int64[4]                  n_dates, n_assets, date_capacity, asset_capacity
+#   dates   int64[date_capacity]      days since 1970-01-01, ascending
+#   assets  int64[asset_capacity]     assetID of each column
+#   close   float64[dates x assets]   NaN where no bar exists
+#   volume  float64[dates x assets]
+#
+# A tiny control segment ("<name>_ctl") holds the current generation and a
+# dirty flag. Writers take a file lock, build or grow a segment and publish
+# it by bumping the generation; readers re-attach when it changes.
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from pymysql import cursors
+
+logger = logging.getLogger("prices")
+
+HEADER_CELLS = 4
+CONTROL_CELLS = 2  # generation, dirty
+FETCH_BATCH = 50000
+
+
+def _unregister(shm):
+    # Segments outlive the process that created them; stop the resource
+    # tracker from unlinking them when a worker exits (Python < 3.13).
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+def _to_days(values):
+    return np.asarray(values, dtype="datetime64[s]").astype("datetime64[D]").astype(np.int64)
+
+
+class PriceStore:
+    """
+    Shared date x asset matrices of PriceHistory closes and volumes.
+
+    The store loads lazily on first use. Call append_bars() when new bars
+    are written and invalidate() when existing history changes; the next
+    read in any process then sees the update.
+    """
+
+    def __init__(self, name="stratify_prices"):
+        self.name = name
+        self.enabled = True
+        self._connection_factory = None
+        self._lock = threading.RLock()
+        self._ctl = None
+        self._shm = None
+        self._generation = -1
+        self._views = None
+        self._col_order = None
+        self._col_count = -1
+
+    def init_app(self, app, connection_factory):
+        """
+        Configure the store from PRICE_STORE_NAME / PRICE_STORE_ENABLED.
+
+        Args:
+        - app (Flask): The Flask application instance.
+        - connection_factory (callable): Returns a context manager yielding a
+          database connection, e.g. db.connection.
+        """
+        app.config.setdefault("PRICE_STORE_NAME", self.name)
+        app.config.setdefault("PRICE_STORE_ENABLED", True)
+        self.name = app.config["PRICE_STORE_NAME"]
+        self.enabled = app.config["PRICE_STORE_ENABLED"]
+        self._connection_factory = connection_factory
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def matrix(self, asset_ids=None, start_date=None, end_date=None):
+        """
+        Slice of the price matrices for the given assets and date range.
+
+        Args:
+        - asset_ids (array-like, optional): Columns to return, in this order.
+          Unknown assets come back as all-NaN columns. Defaults to all assets.
+        - start_date, end_date (date/datetime/str, optional): Inclusive bounds.
+
+        Returns:
+        - tuple: (dates datetime64[D], asset_ids int64, close float64,
+          volume float64). The matrices are private copies.
+        """
+        with self._lock:
+            self._ensure_current()
+            dates, assets, close, volume = self._views
+
+            lo = 0 if start_date is None else np.searchsorted(dates, _to_days([start_date])[0], "left")
+            hi = len(dates) if end_date is None else np.searchsorted(dates, _to_days([end_date])[0], "right")
+
+            if asset_ids is None:
+                cols = np.arange(len(assets))
+                asset_ids = assets.copy()
+            else:
+                asset_ids = np.asarray(asset_ids, dtype=np.int64)
+                cols = self._columns(asset_ids)
+
+            known = cols >= 0
+            out_close = np.full((hi - lo, len(asset_ids)), np.nan)
+            out_volume = np.full((hi - lo, len(asset_ids)), np.nan)
+            out_close[:, known] = close[lo:hi, cols[known]]
+            out_volume[:, known] = volume[lo:hi, cols[known]]
+            return dates[lo:hi].astype("datetime64[D]"), asset_ids, out_close, out_volume
+
+    def latest(self, asset_ids, count=2):
+        """
+        The last `count` non-missing closes per asset, oldest first.
+
+        Returns:
+        - ndarray: len(asset_ids) x count matrix, NaN-padded on the left.
+        """
+        with self._lock:
+            self._ensure_current()
+            _, _, close, _ = self._views
+            cols = self._columns(np.asarray(asset_ids, dtype=np.int64))
+            out = np.full((len(cols), count), np.nan)
+            for i, col in enumerate(cols.tolist()):
+                if col < 0:
+                    continue
+                series = close[:, col]
+                values = series[~np.isnan(series)][-count:]
+                if len(values):
+                    out[i, count - len(values):] = values
+            return out
+
+    def stats(self):
+        """Dimensions and generation of the attached segment."""
+        with self._lock:
+            if self._views is None:
+                return {"loaded": False, "generation": self._generation}
+            dates, assets, _, _ = self._views
+            return {
+                "loaded": True,
+                "generation": self._generation,
+                "dates": int(len(dates)),
+                "assets": int(len(assets)),
+                "first_date": str(dates[:1].astype("datetime64[D]")[0]) if len(dates) else None,
+                "last_date": str(dates[-1:].astype("datetime64[D]")[0]) if len(dates) else None,
+                "segment_bytes": self._shm.size,
+            }
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def load(self, conn):
+        """
+        Rebuild the store from the PriceHistory table and publish it.
+
+        Rows are streamed with an unbuffered cursor in batches so the whole
+        table is never materialised as Python dicts.
+        """
+        asset_parts, date_parts, close_parts, volume_parts = [], [], [], []
+        cursor = conn.cursor(cursors.SSCursor)
+        try:
+            cursor.execute("SELECT assetID, Date, closePrice, Volume FROM PriceHistory")
+            while True:
+                rows = cursor.fetchmany(FETCH_BATCH)
+                if not rows:
+                    break
+                asset_col, date_col, close_col, volume_col = zip(*rows)
+                asset_parts.append(np.asarray(asset_col, dtype=np.int64))
+                date_parts.append(_to_days(date_col))
+                close_parts.append(np.asarray(close_col, dtype=np.float64))
+                volume_parts.append(np.asarray(volume_col, dtype=np.float64))
+        finally:
+            cursor.close()
+
+        def concat(parts, dtype):
+            return np.concatenate(parts) if parts else np.array([], dtype=dtype)
+
+        bars = (
+            concat(asset_parts, np.int64),
+            concat(date_parts, np.int64),
+            concat(close_parts, np.float64),
+            concat(volume_parts, np.float64),
+        )
+        with self._lock, self._file_lock():
+            self._publish(*self._pivot(np.array([], np.int64), np.array([], np.int64), None, None, *bars))
+        logger.info(f"Loaded {len(bars[0])} price bars into shared memory")
+
+    def append_bars(self, asset_ids, dates, closes, volumes):
+        """
+        Merge new or corrected bars into the store without touching MySQL.
+
+        Bars for dates after the last stored date and for known assets are
+        written in place when the segment has spare capacity; anything else
+        (new assets beyond capacity, back-filled dates) builds a new
+        generation from the current matrices.
+
+        Args:
+        - asset_ids, dates, closes, volumes (array-like): Parallel bar columns.
+        """
+        asset_ids = np.asarray(asset_ids, dtype=np.int64)
+        days = _to_days(dates)
+        closes = np.asarray(closes, dtype=np.float64)
+        volumes = np.asarray(volumes, dtype=np.float64)
+        if len(asset_ids) == 0:
+            return
+
+        with self._lock, self._file_lock():
+            if not self._attach_current():
+                return  # nothing loaded yet; the first read loads everything
+            if self._dirty():
+                return  # a full reload is already pending
+
+            header = self._header()
+            n_dates, n_assets, date_cap, asset_cap = (int(v) for v in header)
+            stored_dates = self._segment_array(HEADER_CELLS, date_cap, np.int64)[:n_dates]
+            stored_assets = self._segment_array(HEADER_CELLS + date_cap, asset_cap, np.int64)[:n_assets]
+
+            new_dates = np.setdiff1d(days, stored_dates)
+            new_assets = np.setdiff1d(asset_ids, stored_assets)
+            appendable = (
+                (len(new_dates) == 0 or n_dates == 0 or new_dates[0] > stored_dates[-1])
+                and n_dates + len(new_dates) <= date_cap
+                and n_assets + len(new_assets) <= asset_cap
+            )
+            if not appendable:
+                dates_all, assets_all, close, volume = self._views_for(self._shm, header)
+                self._publish(*self._pivot(
+                    dates_all.copy(), assets_all.copy(), close.copy(), volume.copy(),
+                    asset_ids, days, closes, volumes,
+                ))
+                return
+
+            dates_buf = self._segment_array(HEADER_CELLS, date_cap, np.int64)
+            assets_buf = self._segment_array(HEADER_CELLS + date_cap, asset_cap, np.int64)
+            dates_buf[n_dates:n_dates + len(new_dates)] = new_dates
+            assets_buf[n_assets:n_assets + len(new_assets)] = new_assets
+            all_dates = dates_buf[:n_dates + len(new_dates)]
+            all_assets = assets_buf[:n_assets + len(new_assets)]
+
+            order = np.argsort(all_assets)
+            rows = np.searchsorted(all_dates, days)
+            cols = order[np.searchsorted(all_assets[order], asset_ids)]
+            close_buf, volume_buf = self._matrix_buffers(self._shm, date_cap, asset_cap)
+            close_buf[rows, cols] = closes
+            volume_buf[rows, cols] = volumes
+
+            # Publish the new extents last so readers never see unwritten rows
+            header[0] = len(all_dates)
+            header[1] = len(all_assets)
+
+    def invalidate(self):
+        """Mark the store stale in every process; the next read reloads it."""
+        with self._lock:
+            if self._open_control(create=False):
+                np.ndarray((CONTROL_CELLS,), np.int64, self._ctl.buf)[1] = 1
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    @contextmanager
+    def _file_lock(self):
+        path = os.path.join(tempfile.gettempdir(), f"{self.name}.lock")
+        with open(path, "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _open_control(self, create):
+        if self._ctl is not None:
+            return True
+        try:
+            self._ctl = shared_memory.SharedMemory(name=f"{self.name}_ctl")
+        except FileNotFoundError:
+            if not create:
+                return False
+            try:
+                self._ctl = shared_memory.SharedMemory(
+                    name=f"{self.name}_ctl", create=True, size=CONTROL_CELLS * 8
+                )
+                ctl = np.ndarray((CONTROL_CELLS,), np.int64, self._ctl.buf)
+                ctl[0] = -1
+                ctl[1] = 1
+            except FileExistsError:
+                self._ctl = shared_memory.SharedMemory(name=f"{self.name}_ctl")
+        _unregister(self._ctl)
+        return True
+
+    def _control(self):
+        return np.ndarray((CONTROL_CELLS,), np.int64, self._ctl.buf)
+
+    def _dirty(self):
+        ctl = self._control()
+        return ctl[0] < 0 or ctl[1] != 0
+
+    def _attach_current(self):
+        """Attach to the published generation; False if none exists."""
+        if not self._open_control(create=False):
+            return False
+        generation = int(self._control()[0])
+        if generation < 0:
+            return False
+        if generation != self._generation:
+            try:
+                shm = shared_memory.SharedMemory(name=f"{self.name}_g{generation}")
+            except FileNotFoundError:
+                return False
+            _unregister(shm)
+            self._release_segment()
+            self._shm = shm
+            self._generation = generation
+            # A new generation may order its asset column differently
+            self._col_count = -1
+        return True
+
+    def _ensure_current(self):
+        if not self._attach_current() or self._dirty():
+            if self._connection_factory is None:
+                raise RuntimeError("PriceStore used before init_app()")
+            with self._connection_factory() as conn:
+                with self._file_lock():
+                    # Another process may have reloaded while we waited
+                    self._open_control(create=True)
+                    reload = not self._attach_current() or self._dirty()
+                if reload:
+                    self.load(conn)
+            self._attach_current()
+        self._refresh_views()
+
+    def _refresh_views(self):
+        header = self._header()
+        n_assets = int(header[1])
+        self._views = self._views_for(self._shm, header)
+        if n_assets != self._col_count:
+            self._col_order = np.argsort(self._views[1])
+            self._col_count = n_assets
+
+    def _columns(self, asset_ids):
+        assets = self._views[1]
+        if len(assets) == 0:
+            return np.full(len(asset_ids), -1, dtype=np.int64)
+        order = self._col_order
+        pos = np.searchsorted(assets[order], asset_ids)
+        pos = np.minimum(pos, len(assets) - 1)
+        cols = order[pos]
+        return np.where(assets[cols] == asset_ids, cols, -1)
+
+    def _header(self):
+        return np.ndarray((HEADER_CELLS,), np.int64, self._shm.buf)
+
+    def _segment_array(self, offset_cells, length, dtype):
+        return np.ndarray((length,), dtype, self._shm.buf, offset=offset_cells * 8)
+
+    @staticmethod
+    def _matrix_buffers(shm, date_cap, asset_cap):
+        offset = (HEADER_CELLS + date_cap + asset_cap) * 8
+        size = date_cap * asset_cap
+        close = np.ndarray((date_cap, asset_cap), np.float64, shm.buf, offset=offset)
+        volume = np.ndarray((date_cap, asset_cap), np.float64, shm.buf, offset=offset + size * 8)
+        return close, volume
+
+    @classmethod
+    def _views_for(cls, shm, header):
+        n_dates, n_assets, date_cap, asset_cap = (int(v) for v in header)
+        dates = np.ndarray((n_dates,), np.int64, shm.buf, offset=HEADER_CELLS * 8)
+        assets = np.ndarray((n_assets,), np.int64, shm.buf, offset=(HEADER_CELLS + date_cap) * 8)
+        close, volume = cls._matrix_buffers(shm, date_cap, asset_cap)
+        return (
+            dates,
+            assets,
+            close[:n_dates, :n_assets],
+            volume[:n_dates, :n_assets],
+        )
+
+    @staticmethod
+    def _pivot(dates, assets, close, volume, bar_assets, bar_days, bar_close, bar_volume):
+        """Merge bars into (possibly empty) matrices, returning new arrays."""
+        dates = np.asarray(dates, dtype=np.int64)
+        all_dates = np.union1d(dates, bar_days)
+        all_assets = np.concatenate((assets, np.setdiff1d(bar_assets, assets)))
+
+        new_close = np.full((len(all_dates), len(all_assets)), np.nan)
+        new_volume = np.full((len(all_dates), len(all_assets)), np.nan)
+        if close is not None and len(dates):
+            rows = np.searchsorted(all_dates, dates)
+            new_close[rows, :len(assets)] = close
+            new_volume[rows, :len(assets)] = volume
+
+        order = np.argsort(all_assets)
+        rows = np.searchsorted(all_dates, bar_days)
+        cols = order[np.searchsorted(all_assets[order], bar_assets)]
+        new_close[rows, cols] = bar_close
+        new_volume[rows, cols] = bar_volume
+        return all_dates, all_assets, new_close, new_volume
+
+    def _publish(self, dates, assets, close, volume):
+        """Write matrices to a new generation segment and make it current."""
+        self._open_control(create=True)
+        ctl = self._control()
+        generation = int(ctl[0]) + 1
+
+        # Leave headroom so daily appends rarely force a new generation
+        date_cap = max(len(dates) + 256, int(len(dates) * 1.25))
+        asset_cap = max(len(assets) + 64, int(len(assets) * 1.1))
+        cells = HEADER_CELLS + date_cap + asset_cap + 2 * date_cap * asset_cap
+        shm = shared_memory.SharedMemory(
+            name=f"{self.name}_g{generation}", create=True, size=cells * 8
+        )
+        _unregister(shm)
+
+        header = np.ndarray((HEADER_CELLS,), np.int64, shm.buf)
+        header[:] = (len(dates), len(assets), date_cap, asset_cap)
+        np.ndarray((date_cap,), np.int64, shm.buf, offset=HEADER_CELLS * 8)[:len(dates)] = dates
+        np.ndarray((asset_cap,), np.int64, shm.buf, offset=(HEADER_CELLS + date_cap) * 8)[:len(assets)] = assets
+        close_buf, volume_buf = self._matrix_buffers(shm, date_cap, asset_cap)
+        close_buf[:] = np.nan
+        volume_buf[:] = np.nan
+        close_buf[:len(dates), :len(assets)] = close
+        volume_buf[:len(dates), :len(assets)] = volume
+
+        ctl[0] = generation
+        ctl[1] = 0
+
+        # Processes still attached to the old generation keep their mapping
+        if generation > 0:
+            try:
+                old = shared_memory.SharedMemory(name=f"{self.name}_g{generation - 1}")
+                old.close()
+                old.unlink()
+            except FileNotFoundError:
+                pass
+        self._release_segment()
+        self._shm = shm
+        self._generation = generation
+        self._col_count = -1
+        self._refresh_views()
+
+    def _release_segment(self):
+        self._views = None
+        if self._shm is not None:
+            try:
+                self._shm.close()
+            except BufferError:
+                # numpy views handed out earlier still reference the buffer
+                pass
+            self._shm = None
+
+
+price_store = PriceStore()
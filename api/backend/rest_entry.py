@@ -5,6 +5,19 @@ import logging
 from logging.handlers import RotatingFileHandler
 
 from backend.db_connection import db
+from backend.db_connection.replicas import parse_hosts
+from backend.db_connection.profiler import profiler
+from backend.db_connection.migrations import upgrade as upgrade_schema
+from backend.backtests.jobs import backtest_jobs
+from backend.prices.price_store import price_store
+from backend.assets.quotes import quotes
+from backend.assets.reference import reference
+from backend.portfolios.valuation import valuations
+from backend.common.compression import register_compression
+from backend.common.metrics import metrics
+from backend.common.conditional import register_etag_fallback
+from backend.common.json_provider import FastJSONProvider
+from backend.performance.snapshots import snapshotter
 from backend.simple.simple_routes import simple_routes
 from backend.portfolios.portfolio_routes import portfolios
 from backend.assets.asset_routes import assets
@@ -60,6 +73,11 @@ def create_app():
     # app.config['SECRET_KEY'] = 'someCrazyS3cR3T!Key.!'
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
 
+    # Responses are encoded with orjson when installed; Decimals go out as
+    # numbers unless JSON_DECIMAL_AS=string
+    app.config["JSON_DECIMAL_AS"] = os.getenv("JSON_DECIMAL_AS", "float")
+    app.json = FastJSONProvider(app)
+
     # # these are for the DB object to be able to connect to MySQL.
     # app.config['MYSQL_DATABASE_USER'] = 'root'
     app.config["MYSQL_DATABASE_USER"] = os.getenv("DB_USER").strip()
@@ -70,10 +88,88 @@ def create_app():
         "DB_NAME"
     ).strip()  # Change this to your DB name
 
-    # Initialize the database object with the settings above.
-    app.logger.info("current_app(): starting the database connection")
+    # Connection pool sizing and recycling (see backend/db_connection/pool.py)
+    app.config["MYSQL_POOL_MIN_SIZE"] = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    app.config["MYSQL_POOL_MAX_SIZE"] = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    app.config["MYSQL_POOL_TIMEOUT"] = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    app.config["MYSQL_POOL_IDLE_TIMEOUT"] = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))
+    app.config["MYSQL_POOL_MAX_LIFETIME"] = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))
+    app.config["MYSQL_POOL_PING_INTERVAL"] = float(os.getenv("DB_POOL_PING_INTERVAL", "0"))
+
+    # Read replicas for GET requests (see backend/db_connection/replicas.py)
+    app.config["MYSQL_REPLICA_HOSTS"] = parse_hosts(
+        os.getenv("DB_REPLICA_HOSTS", ""), app.config["MYSQL_DATABASE_PORT"]
+    )
+    app.config["MYSQL_REPLICA_MAX_LAG"] = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+    app.config["MYSQL_REPLICA_LAG_CHECK"] = float(os.getenv("DB_REPLICA_LAG_CHECK", "2"))
+
+    # Initialize the database connection pool with the settings above.
+    app.logger.info("current_app(): starting the database connection pool")
     db.init_app(app)
 
+    # Apply pending schema migrations (api/migrations) before anything else reads the DB
+    app.config["DB_MIGRATE_ON_START"] = os.getenv("DB_MIGRATE_ON_START", "1") == "1"
+    if app.config["DB_MIGRATE_ON_START"]:
+        try:
+            with db.connection() as conn:
+                applied = upgrade_schema(conn)
+            app.logger.info(f"current_app(): applied schema migrations {applied}")
+        except Exception as e:
+            app.logger.error(f"current_app(): schema migrations failed: {e}")
+
+    # PriceHistory matrices shared between workers via shared memory
+    app.config["PRICE_STORE_NAME"] = os.getenv("PRICE_STORE_NAME", "stratify_prices")
+    app.config["PRICE_STORE_ENABLED"] = os.getenv("PRICE_STORE_ENABLED", "1") == "1"
+    price_store.init_app(app, db.connection)
+
+    # Quote mode of /asset/assets:batch serves from a cache refreshed on this TTL
+    app.config["QUOTE_CACHE_TTL"] = float(os.getenv("QUOTE_CACHE_TTL", "5"))
+    quotes.init_app(app)
+
+    # Asset/Sector reference cache: version poll interval and safety-net TTL (seconds)
+    app.config["REFERENCE_CACHE_POLL"] = float(os.getenv("REFERENCE_CACHE_POLL", "1"))
+    app.config["REFERENCE_CACHE_TTL"] = float(os.getenv("REFERENCE_CACHE_TTL", "300"))
+    reference.init_app(app)
+
+    # Portfolio valuation cache: version poll interval and safety-net TTL (seconds)
+    app.config["VALUATION_CACHE_POLL"] = float(os.getenv("VALUATION_CACHE_POLL", "1"))
+    app.config["VALUATION_CACHE_TTL"] = float(os.getenv("VALUATION_CACHE_TTL", "300"))
+    valuations.init_app(app)
+
+    # Backtests queued through the API run on this worker pool
+    app.config["BACKTEST_WORKERS"] = int(os.getenv("BACKTEST_WORKERS", "2"))
+    # Parameter sweeps fan out over a process pool (defaults to one per CPU)
+    app.config["BACKTEST_SWEEP_WORKERS"] = int(os.getenv("BACKTEST_SWEEP_WORKERS", "0")) or None
+    backtest_jobs.init_app(app)
+
+    # PortfolioPerformance snapshots are taken on this interval (0 disables)
+    app.config["PERFORMANCE_SNAPSHOT_INTERVAL"] = int(os.getenv("PERFORMANCE_SNAPSHOT_INTERVAL", "86400"))
+    snapshotter.init_app(app)
+
+    # Per-endpoint latency, DB/serialization time, rows, bytes and pool wait
+    # (/system/metrics); registered first so its after_request hook runs last
+    app.config["METRICS_ENABLED"] = os.getenv("METRICS_ENABLED", "1") == "1"
+    app.config["METRICS_WINDOW"] = int(os.getenv("METRICS_WINDOW", "2048"))
+    metrics.init_app(app)
+
+    # Statement statistics by SQL fingerprint and the slow-query log
+    # (/system/slow-queries); slow statements are EXPLAINed unless disabled
+    app.config["SQL_PROFILER_ENABLED"] = os.getenv("SQL_PROFILER_ENABLED", "1") == "1"
+    app.config["SLOW_QUERY_MS"] = float(os.getenv("SLOW_QUERY_MS", "100"))
+    app.config["SLOW_QUERY_LOG_SIZE"] = int(os.getenv("SLOW_QUERY_LOG_SIZE", "200"))
+    app.config["SLOW_QUERY_EXPLAIN"] = os.getenv("SLOW_QUERY_EXPLAIN", "1") == "1"
+    profiler.init_app(app)
+
+    # gzip/brotli response compression; registered before the ETag fallback so
+    # it runs after it and compresses the final body
+    app.config["COMPRESS_LEVEL"] = int(os.getenv("COMPRESS_LEVEL", "6"))
+    app.config["COMPRESS_BROTLI_QUALITY"] = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+    app.config["COMPRESS_MIN_SIZE"] = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    register_compression(app)
+
+    # JSON GETs without a version-based ETag get a content-hash one
+    register_etag_fallback(app)
+
     # Register the routes from each Blueprint with the app object
     # and give a url prefix to each
     app.logger.info("create_app(): registering blueprints with Flask app object.")
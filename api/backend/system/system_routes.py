@@ -1,11 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 import logging
 import time
 
+from backend.db_connection import db
+from backend.common.conditional import versioned
+from backend.common.metrics import PROMETHEUS_MIMETYPE, metrics
+from backend.db_connection.profiler import profiler
+
+# Orderings accepted by /slow-queries?sort=
+FINGERPRINT_SORTS = ("total_ms", "avg_ms", "max_ms", "calls", "rows")
+
 system = Blueprint('system', __name__)
 logger = logging.getLogger('system')
 
 @system.route('/config', methods=['GET'])
+@versioned(max_age=60)
 def get_system_config():
     """
     Get current system configuration.
@@ -52,3 +61,85 @@ def trigger_backup():
     """
     backup_id = f"BK-{int(time.time())}"
     return jsonify({"status": "started", "backup_id": backup_id, "message": "Database backup initiated"}), 200
+
+@system.route('/db-pool', methods=['GET'])
+def get_db_pool_stats():
+    """
+    Get database connection pool usage for monitoring.
+
+    Returns:
+    - JSON: Pool size, idle/in-use counts, checkout and timeout counters,
+      and borrow wait times in milliseconds; with read replicas configured,
+      a 'replicas' list with each replica's lag, health, reads served and
+      pool counters.
+    """
+    return jsonify({"success": True, "data": db.stats()}), 200
+
+
+@system.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Request metrics of this API process in the Prometheus text format.
+
+    Returns:
+    - text/plain: Per-endpoint latency histograms; DB, serialization and
+      pool-wait seconds; statements, rows and response bytes; connection
+      pool gauges and replica lag.
+    """
+    return Response(metrics.prometheus(db.stats()), mimetype=PROMETHEUS_MIMETYPE)
+
+@system.route('/metrics/summary', methods=['GET'])
+def get_metrics_summary():
+    """
+    Request metrics of this API process summarised per blueprint.
+
+    Returns:
+    - JSON: p50/p95/p99 latency, error count, average DB, serialization and
+      pool-wait milliseconds, rows and response bytes per blueprint (slowest
+      first), plus the connection pool stats.
+    """
+    return jsonify({
+        "success": True,
+        "data": {"blueprints": metrics.summary(), "pool": db.stats()}
+    }), 200
+
+@system.route('/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """
+    Slow statements and the busiest SQL fingerprints of this API process.
+
+    Query parameters:
+    - limit (int, optional): Slow-log entries to return, newest first (default 50).
+    - top (int, optional): Fingerprints to return (default 20).
+    - sort (str, optional): Fingerprint order: total_ms (default), avg_ms, max_ms, calls or rows.
+
+    Returns:
+    - JSON: The slow-query threshold, slow-log entries (SQL with parameters,
+      route, execute/fetch milliseconds, rows, EXPLAIN plan) and per-fingerprint
+      totals with calls per route.
+    """
+    sort = request.args.get("sort", "total_ms")
+    if sort not in FINGERPRINT_SORTS:
+        return jsonify({
+            "success": False,
+            "error": f"sort must be one of: {', '.join(FINGERPRINT_SORTS)}",
+            "status_code": 400
+        }), 400
+    limit = request.args.get("limit", 50, type=int)
+    top = request.args.get("top", 20, type=int)
+    return jsonify({
+        "success": True,
+        "data": {
+            "threshold_ms": profiler.slow_seconds * 1000,
+            "slow": profiler.slow_queries(limit),
+            "fingerprints": profiler.fingerprints(top, sort),
+        }
+    }), 200
+
+@system.route('/slow-queries', methods=['DELETE'])
+def reset_slow_queries():
+    """
+    Clear the slow-query log and fingerprint statistics.
+    """
+    profiler.reset()
+    return jsonify({"success": True, "message": "Slow-query log cleared"}), 200
@@ -0,0 +1,138 @@
+# Atomic trade booking.
+#
+# A trade is validated, recorded in Transaction and applied to Position by
+# the book_trade stored procedure (migration 0005), inside one MySQL
+# transaction. The API sends a single CALL instead of separate existence
+# checks, the insert, the position update and the commit. book_trades
+# books a whole blotter the same way: every trade or none.
+#
+# Booked positions carry a running average cost; POST
+# /transaction/ledger/rebuild re-derives lot-based costs from the ledger.
+import datetime
+import json
+
+# MYSQL_ERRNO values SIGNALled by apply_trade
+TRADE_NOT_FOUND = 31001
+TRADE_REJECTED = 31002
+
+TRADE_TYPES = ("BUY", "SELL")
+
+# Most trades accepted in one blotter
+MAX_BLOTTER_SIZE = 5000
+
+
+def parse_trade(data):
+    """
+    Validate a trade from a request body.
+
+    Args:
+    - data (dict): portfolioID, assetID, transactionType ('BUY' or 'SELL'),
+      quantity (whole shares), price and optional transactionDate.
+
+    Returns:
+    - dict: The trade with normalized types.
+
+    Raises:
+    - ValueError: If a field is missing or malformed (dates are ISO 8601).
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Each trade must be a JSON object")
+    for field in ("portfolioID", "assetID", "transactionType", "quantity", "price"):
+        if data.get(field) is None:
+            raise ValueError(f"Missing required field: {field}")
+    kind = str(data["transactionType"]).upper()
+    if kind not in TRADE_TYPES:
+        raise ValueError(f"Invalid transactionType: {data['transactionType']}. Use BUY or SELL")
+    try:
+        quantity = float(data["quantity"])
+        trade = {
+            "portfolioID": int(data["portfolioID"]),
+            "assetID": int(data["assetID"]),
+            "transactionType": kind,
+            "quantity": int(quantity),
+            "price": round(float(data["price"]), 2),
+            "transactionDate": None,
+        }
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("portfolioID, assetID, quantity and price must be numbers")
+    if quantity != trade["quantity"] or quantity <= 0:
+        raise ValueError("quantity must be a positive number of whole shares")
+    if trade["price"] < 0:
+        raise ValueError("price must not be negative")
+    if data.get("transactionDate"):
+        try:
+            date = datetime.datetime.fromisoformat(str(data["transactionDate"]))
+        except ValueError:
+            raise ValueError(f"Invalid transactionDate: {data['transactionDate']}")
+        trade["transactionDate"] = date.strftime("%Y-%m-%d %H:%M:%S")
+    return trade
+
+
+def book_trade(conn, trade):
+    """
+    Book one trade in a single round trip.
+
+    Args:
+    - conn (Connection): DictCursor connection; book_trade commits itself.
+    - trade (dict): Output of parse_trade().
+
+    Returns:
+    - dict: transactionID, positionID, portfolioID, assetID, the position's
+      new Quantity (0 once a SELL closes it) and AvgCostBasis, plus the
+      asset's TickerSymbol and CurrentPrice.
+
+    Raises:
+    - pymysql.Error: TRADE_NOT_FOUND / TRADE_REJECTED for invalid trades;
+      nothing was written.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "CALL book_trade(%s, %s, %s, %s, %s, %s)",
+            (
+                trade["portfolioID"], trade["assetID"], trade["transactionType"],
+                trade["quantity"], trade["price"], trade["transactionDate"],
+            ),
+        )
+        return cursor.fetchone()
+    finally:
+        # Also reads the CALL's trailing status result
+        cursor.close()
+
+
+def book_trades(conn, trades):
+    """
+    Book a blotter of trades in one transaction and one round trip.
+
+    Trades are applied in order, so a blotter may buy and then sell the
+    same asset. The first invalid trade rolls back the whole blotter.
+
+    Args:
+    - conn (Connection): DictCursor connection; book_trades commits itself.
+    - trades (list): Outputs of parse_trade().
+
+    Returns:
+    - list: One dict per trade with transactionID, positionID, portfolioID,
+      assetID and the position's Quantity and AvgCostBasis after it.
+
+    Raises:
+    - pymysql.Error: TRADE_NOT_FOUND / TRADE_REJECTED, with the message
+      prefixed by 'Trade <index>: '.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("CALL book_trades(%s)", (json.dumps(trades),))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return json.loads(row["trades"]) if row else []
+
+
+def error_status(error):
+    """HTTP status for a database error raised while booking."""
+    code = error.args[0] if error.args else None
+    if code == TRADE_NOT_FOUND:
+        return 404
+    if code == TRADE_REJECTED:
+        return 400
+    return 500
@@ -0,0 +1,507 @@
+# Transaction ledger replay.
+#
+# Positions are derived from the Transaction table instead of being edited
+# by hand: every portfolio's BUY and SELL rows are replayed in
+# (transactionDate, transactionID) order into tax lots, which give the
+# position's quantity, its average cost and the P&L realized by each sale.
+# Sales close lots first-in-first-out, last-in-first-out, or by specific
+# identification (the lots named in TaxLotSelection, FIFO for the rest).
+# A sale larger than the holding opens a short lot that later buys cover.
+#
+# The lots reached after a replay are saved per portfolio and method in
+# LedgerCheckpoint, so the next replay only reads transactions after the
+# checkpoint. Transactions are append-only; a checkpoint whose transaction
+# count no longer matches the table (a backdated insert or a delete) is
+# discarded and that portfolio is replayed from the start.
+#
+# Run from the api directory:
+#   python -m backend.transactions.ledger [--portfolio N] [--method fifo|lifo|specific]
+#       [--full] [--dry-run]
+import argparse
+import datetime
+import json
+import logging
+import sys
+import time
+from collections import deque
+
+from backend.db_connection.migrations import connect_from_env
+from backend.db_connection.timing import TimedSSCursor
+from backend.portfolios.valuation import valuations
+
+try:
+    import orjson
+except ImportError:  # checkpoints are encoded with the standard library
+    orjson = None
+
+logger = logging.getLogger("ledger")
+
+METHODS = ("fifo", "lifo", "specific")
+DEFAULT_METHOD = "fifo"
+
+# Signed direction of each transaction type; other types do not move lots
+SIDES = {"BUY": 1, "SELL": -1}
+
+# Rows read from the server-side cursor per round trip
+FETCH_SIZE = 10000
+
+# Positions deleted per statement
+DELETE_BATCH = 1000
+
+TRANSACTIONS_SQL = """
+SELECT t.transactionID, t.portfolioID, t.assetID, t.transactionType, t.Quantity,
+       CAST(t.pricePerShare AS DOUBLE), t.transactionDate
+FROM Transaction t
+"""
+
+CHECKPOINTS_SQL = """
+SELECT c.portfolioID, c.lastTransactionDate, c.lastTransactionID, c.transactionCount, c.state,
+       (SELECT COUNT(*) FROM Transaction t
+        WHERE t.portfolioID = c.portfolioID
+          AND (t.transactionDate, t.transactionID) <= (c.lastTransactionDate, c.lastTransactionID)) AS replayed
+FROM LedgerCheckpoint c
+WHERE c.method = %s
+"""
+
+SAVE_CHECKPOINT_SQL = """
+INSERT INTO LedgerCheckpoint
+    (portfolioID, method, lastTransactionDate, lastTransactionID, transactionCount, state, updatedAt)
+VALUES (%s, %s, %s, %s, %s, %s, %s) AS new
+ON DUPLICATE KEY UPDATE lastTransactionDate = new.lastTransactionDate,
+                        lastTransactionID = new.lastTransactionID,
+                        transactionCount = new.transactionCount,
+                        state = new.state, updatedAt = new.updatedAt
+"""
+
+UPSERT_POSITION_SQL = """
+INSERT INTO Position (portfolioID, assetID, Quantity, AvgCostBasis)
+VALUES (%s, %s, %s, %s) AS new
+ON DUPLICATE KEY UPDATE Quantity = new.Quantity, AvgCostBasis = new.AvgCostBasis
+"""
+
+
+class Book:
+    """
+    Open tax lots and realized P&L of one portfolio, per asset.
+
+    Each lot is a list [transactionID, acquired, quantity, price]; quantity
+    is negative for short lots. All open lots of an asset have the same
+    sign, oldest first.
+    """
+
+    __slots__ = ("lots", "realized", "last", "count", "changed")
+
+    # last is the (transactionDate, transactionID) replayed most recently
+    # and count the number of transactions replayed, including skipped ones
+
+    def __init__(self):
+        self.lots = {}
+        self.realized = {}
+        self.last = None
+        self.count = 0
+        self.changed = False
+
+    def apply(self, transaction_id, date, asset_id, quantity, price, method=DEFAULT_METHOD, selection=None):
+        """
+        Replay one transaction.
+
+        Args:
+        - transaction_id (int): Its transactionID, which names the lot it opens.
+        - date (datetime): Its transactionDate.
+        - asset_id (int): The asset traded.
+        - quantity (int): Shares, positive to buy and negative to sell.
+        - price (float): Price per share.
+        - method (str): 'fifo', 'lifo' or 'specific'.
+        - selection (list, optional): (lot transactionID, quantity) pairs to
+          close first under specific identification.
+        """
+        if not quantity:
+            return
+        lots = self.lots.get(asset_id)
+        if lots is None:
+            lots = self.lots[asset_id] = deque()
+
+        realized = 0.0
+        if lots and (lots[0][2] > 0) != (quantity > 0):
+            if selection:
+                quantity, realized = _close_selected(lots, selection, quantity, price)
+            lifo = method == "lifo"
+            while quantity and lots:
+                lot = lots[-1] if lifo else lots[0]
+                held = lot[2]
+                if held > 0:
+                    closed = min(held, -quantity)
+                    realized += closed * (price - lot[3])
+                    held -= closed
+                    quantity += closed
+                else:
+                    closed = min(-held, quantity)
+                    realized += closed * (lot[3] - price)
+                    held += closed
+                    quantity -= closed
+                if held:
+                    lot[2] = held
+                elif lifo:
+                    lots.pop()
+                else:
+                    lots.popleft()
+            if realized:
+                self.realized[asset_id] = self.realized.get(asset_id, 0.0) + realized
+        if quantity:
+            lots.append([transaction_id, date, quantity, price])
+
+    def positions(self):
+        """
+        Net holdings derived from the open lots.
+
+        Returns:
+        - dict: assetID -> (quantity, average cost per share) for every
+          asset with a non-zero quantity.
+        """
+        holdings = {}
+        for asset_id, lots in self.lots.items():
+            quantity = sum(lot[2] for lot in lots)
+            if quantity:
+                holdings[asset_id] = (quantity, sum(lot[2] * lot[3] for lot in lots) / quantity)
+        return holdings
+
+    def to_state(self):
+        """JSON text of the lots and realized P&L, for LedgerCheckpoint.state."""
+        # Column lists per asset keep large books quick to save and load
+        lots = {}
+        for asset_id, open_lots in self.lots.items():
+            if open_lots:
+                lots[str(asset_id)] = [list(column) for column in zip(*open_lots)]
+        state = {"lots": lots, "realized": {str(asset_id): value for asset_id, value in self.realized.items()}}
+        if orjson is not None:
+            return orjson.dumps(state).decode()
+        return json.dumps(state, default=datetime.datetime.isoformat)
+
+    @classmethod
+    def from_state(cls, text, last, count):
+        """Rebuild a Book saved by to_state()."""
+        state = orjson.loads(text) if orjson is not None else json.loads(text)
+        book = cls()
+        fromisoformat = datetime.datetime.fromisoformat
+        book.lots = {
+            int(asset_id): deque(map(list, zip(ids, map(fromisoformat, dates), quantities, prices)))
+            for asset_id, (ids, dates, quantities, prices) in state["lots"].items()
+        }
+        book.realized = {int(asset_id): value for asset_id, value in state["realized"].items()}
+        book.last = last
+        book.count = count
+        return book
+
+
+def _close_selected(lots, selection, quantity, price):
+    """Close the named lots first; returns the quantity left and the P&L realized."""
+    realized = 0.0
+    by_id = {lot[0]: lot for lot in lots}
+    for lot_id, wanted in selection:
+        lot = by_id.get(lot_id)
+        if lot is None or not quantity:
+            continue
+        held = lot[2]
+        closed = min(abs(held), abs(quantity), wanted)
+        if held > 0:
+            realized += closed * (price - lot[3])
+            lot[2] = held - closed
+            quantity += closed
+        else:
+            realized += closed * (lot[3] - price)
+            lot[2] = held + closed
+            quantity -= closed
+        if not lot[2]:
+            lots.remove(lot)
+    return quantity, realized
+
+
+def replay(conn, portfolio_id=None, method=DEFAULT_METHOD, full=False):
+    """
+    Bring portfolio books up to date with the Transaction table.
+
+    Starts from each portfolio's checkpoint for the method (unless full or
+    the checkpoint is stale) and streams the later transactions through a
+    server-side cursor, ordered by portfolio, date and ID. Nothing is
+    written.
+
+    Args:
+    - conn (Connection): DictCursor connection to read with.
+    - portfolio_id (int, optional): Replay only this portfolio.
+    - method (str): 'fifo', 'lifo' or 'specific'.
+    - full (bool): Ignore checkpoints and replay all history.
+
+    Returns:
+    - tuple: (books, stats) where books maps portfolioID to Book (books
+      with new transactions have changed set) and stats counts the
+      transactions replayed and skipped, stale checkpoints and seconds.
+
+    Raises:
+    - ValueError: If method is unknown.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown lot method: {method}. Use one of {', '.join(METHODS)}")
+    started = time.perf_counter()
+    stats = {"transactions": 0, "skipped": 0, "stale_checkpoints": 0}
+    cursor = conn.cursor()
+    books, stale = ({}, []) if full else _load_checkpoints(cursor, portfolio_id, method)
+    stats["stale_checkpoints"] = len(stale)
+    for stale_id in stale:
+        # Replayed from scratch; an empty book still clears its positions
+        books[stale_id] = Book()
+        books[stale_id].changed = True
+    selections = _load_selections(cursor, portfolio_id) if method == "specific" else {}
+    cursor.close()
+
+    query, params = TRANSACTIONS_SQL, []
+    conditions = []
+    if not full:
+        query += " LEFT JOIN LedgerCheckpoint c ON c.portfolioID = t.portfolioID AND c.method = %s"
+        params.append(method)
+        skip = [pid for pid in books if books[pid].last is None]
+        if skip:
+            query += f" AND c.portfolioID NOT IN ({', '.join(['%s'] * len(skip))})"
+            params += skip
+        conditions.append(
+            "(c.portfolioID IS NULL OR (t.transactionDate, t.transactionID) > (c.lastTransactionDate, c.lastTransactionID))"
+        )
+    if portfolio_id is not None:
+        conditions.append("t.portfolioID = %s")
+        params.append(portfolio_id)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY t.portfolioID, t.transactionDate, t.transactionID"
+
+    stream = conn.cursor(TimedSSCursor)
+    try:
+        stream.execute(query, params)
+        current, book = None, None
+        while True:
+            rows = stream.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            for transaction_id, pid, asset_id, kind, quantity, price, date in rows:
+                if pid != current:
+                    current, book = pid, books.get(pid)
+                    if book is None:
+                        book = books[pid] = Book()
+                    book.changed = True
+                book.last = (date, transaction_id)
+                book.count += 1
+                side = SIDES.get(kind.upper())
+                if side is None:
+                    stats["skipped"] += 1
+                    continue
+                book.apply(transaction_id, date, asset_id, side * quantity, price, method,
+                           selections.get(transaction_id))
+            stats["transactions"] += len(rows)
+    finally:
+        stream.close()
+    stats["transactions"] -= stats["skipped"]
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return books, stats
+
+
+def _load_checkpoints(cursor, portfolio_id, method):
+    query, params = CHECKPOINTS_SQL, [method]
+    if portfolio_id is not None:
+        query += " AND c.portfolioID = %s"
+        params.append(portfolio_id)
+    cursor.execute(query, params)
+    books, stale = {}, []
+    for row in cursor.fetchall():
+        if row["replayed"] != row["transactionCount"]:
+            logger.warning(
+                f"Ledger checkpoint of portfolio {row['portfolioID']} covers {row['transactionCount']} "
+                f"transactions but {row['replayed']} exist; replaying it from the start"
+            )
+            stale.append(row["portfolioID"])
+            continue
+        books[row["portfolioID"]] = Book.from_state(
+            row["state"], (row["lastTransactionDate"], row["lastTransactionID"]), row["transactionCount"]
+        )
+    return books, stale
+
+
+def _load_selections(cursor, portfolio_id):
+    query = """
+        SELECT s.sellTransactionID, s.lotTransactionID, s.Quantity
+        FROM TaxLotSelection s
+        JOIN Transaction t ON t.transactionID = s.sellTransactionID
+    """
+    params = []
+    if portfolio_id is not None:
+        query += " WHERE t.portfolioID = %s"
+        params.append(portfolio_id)
+    cursor.execute(query + " ORDER BY s.sellTransactionID, s.lotTransactionID", params)
+    selections = {}
+    for row in cursor.fetchall():
+        selections.setdefault(row["sellTransactionID"], []).append((row["lotTransactionID"], row["Quantity"]))
+    return selections
+
+
+def rebuild(conn, portfolio_id=None, method=DEFAULT_METHOD, full=False):
+    """
+    Replay the ledger and write the result to Position and LedgerCheckpoint.
+
+    Only portfolios with transactions since their checkpoint are written.
+    Their Position rows are replaced by the replayed holdings: quantities
+    and average costs are upserted, positions the ledger no longer holds
+    are deleted. Portfolios without any transactions are left alone. The
+    whole rebuild is one transaction.
+
+    Args:
+    - conn (Connection): DictCursor connection; committed on success and
+      rolled back on error.
+    - portfolio_id (int, optional): Rebuild only this portfolio.
+    - method (str): Lot method used for average costs and realized P&L.
+    - full (bool): Ignore checkpoints and replay all history.
+
+    Returns:
+    - dict: replay() stats plus the portfolios and positions written,
+      positions deleted, their IDs ('portfolio_ids'), total seconds and,
+      when positions changed, the bumped 'valuation_version'.
+    """
+    started = time.perf_counter()
+    books, stats = replay(conn, portfolio_id, method, full)
+    changed = {pid: book for pid, book in books.items() if book.changed}
+
+    cursor = conn.cursor()
+    try:
+        upserts, deletes = [], []
+        if changed:
+            held = {pid: book.positions() for pid, book in changed.items()}
+            for pid, holdings in held.items():
+                upserts += [
+                    (pid, asset_id, quantity, round(cost, 2))
+                    for asset_id, (quantity, cost) in holdings.items()
+                ]
+            for ids in _chunks(list(changed), DELETE_BATCH):
+                cursor.execute(
+                    f"SELECT positionID, portfolioID, assetID FROM Position "
+                    f"WHERE portfolioID IN ({', '.join(['%s'] * len(ids))})",
+                    ids,
+                )
+                deletes += [
+                    row["positionID"] for row in cursor.fetchall()
+                    if row["assetID"] not in held[row["portfolioID"]]
+                ]
+        if upserts:
+            cursor.executemany(UPSERT_POSITION_SQL, upserts)
+        for ids in _chunks(deletes, DELETE_BATCH):
+            cursor.execute(f"DELETE FROM Position WHERE positionID IN ({', '.join(['%s'] * len(ids))})", ids)
+
+        # updatedAt is a parameter rather than NOW() so executemany can send
+        # the checkpoints as multi-row INSERTs
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        saved = [
+            (pid, method, book.last[0], book.last[1], book.count, book.to_state(), now)
+            for pid, book in changed.items() if book.last is not None
+        ]
+        if saved:
+            cursor.executemany(SAVE_CHECKPOINT_SQL, saved)
+        emptied = [pid for pid, book in changed.items() if book.last is None]
+        for ids in _chunks(emptied, DELETE_BATCH):
+            cursor.execute(
+                f"DELETE FROM LedgerCheckpoint WHERE method = %s AND portfolioID IN ({', '.join(['%s'] * len(ids))})",
+                [method] + ids,
+            )
+        if upserts or deletes:
+            # API workers drop their cached valuations on their next read
+            stats["valuation_version"] = valuations.bump(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    stats.update(
+        portfolios=len(changed),
+        portfolio_ids=sorted(changed),
+        positions_written=len(upserts),
+        positions_deleted=len(deletes),
+        seconds=round(time.perf_counter() - started, 3),
+    )
+    return stats
+
+
+def tax_lots(conn, portfolio_id, method=DEFAULT_METHOD):
+    """
+    Open tax lots, positions and realized P&L of one portfolio.
+
+    Replays from the portfolio's checkpoint without writing anything.
+
+    Args:
+    - conn (Connection): DictCursor connection to read with.
+    - portfolio_id (int): The portfolio.
+    - method (str): 'fifo', 'lifo' or 'specific'.
+
+    Returns:
+    - dict: realizedPnL total and one entry per asset ever traded with
+      quantity, avgCostBasis, realizedPnL and its open lots
+      (transactionID, acquired, quantity, costBasis), ordered by assetID.
+    """
+    books, _ = replay(conn, portfolio_id, method)
+    book = books.get(portfolio_id) or Book()
+    holdings = book.positions()
+    assets = []
+    for asset_id in sorted(set(book.lots) | set(book.realized)):
+        quantity, cost = holdings.get(asset_id, (0, None))
+        assets.append({
+            "assetID": asset_id,
+            "quantity": quantity,
+            "avgCostBasis": round(cost, 4) if cost is not None else None,
+            "realizedPnL": round(book.realized.get(asset_id, 0.0), 2),
+            "lots": [
+                {"transactionID": lot[0], "acquired": lot[1], "quantity": lot[2], "costBasis": lot[3]}
+                for lot in book.lots.get(asset_id, ())
+            ],
+        })
+    return {
+        "portfolioID": portfolio_id,
+        "method": method,
+        "transactions": book.count,
+        "realizedPnL": round(sum(book.realized.values(), 0.0), 2),
+        "assets": assets,
+    }
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.transactions.ledger")
+    parser.add_argument("--portfolio", type=int, help="rebuild only this portfolio")
+    parser.add_argument("--method", choices=METHODS, default=DEFAULT_METHOD)
+    parser.add_argument("--full", action="store_true", help="ignore checkpoints and replay all history")
+    parser.add_argument("--dry-run", action="store_true", help="replay without writing positions or checkpoints")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    conn = connect_from_env()
+    try:
+        if args.dry_run:
+            books, stats = replay(conn, args.portfolio, args.method, args.full)
+            stats["portfolios"] = sum(book.changed for book in books.values())
+        else:
+            stats = rebuild(conn, args.portfolio, args.method, args.full)
+    finally:
+        conn.close()
+    rate = round(stats["transactions"] / stats["seconds"]) if stats["seconds"] else stats["transactions"]
+    print(
+        f"{stats['transactions']:,} transactions replayed ({args.method}) into {stats['portfolios']:,} "
+        f"portfolios in {stats['seconds']}s ({rate:,} rows/s), {stats['skipped']:,} skipped, "
+        f"{stats['stale_checkpoints']} stale checkpoints"
+        + (
+            f"; {stats['positions_written']:,} positions written, {stats['positions_deleted']:,} deleted"
+            if not args.dry_run else ""
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,38 +1,78 @@
+import datetime
+import time
+
 from flask import Blueprint, jsonify, request, current_app
 from backend.db_connection import db
-from mysql.connector import Error
+from backend.common.pagination import Keyset
+from backend.common.streaming import stream_rows, wants_stream
+from backend.common.columnar import stream_table, wants_columnar
+from backend.common import bulk
+from backend.portfolios.valuation import valuations
+from backend.transactions import booking, ledger
+from pymysql import Error
 
 transactions = Blueprint("transactions", __name__)
 
+# Sort key for keyset pagination of get_transactions
+TRANSACTION_KEYSET = Keyset(("transactionDate", "transactionID"), ("transactionDate", "transactionID"), descending=True)
+
+# Base query of get_transactions; filters and the page clause are appended
+LIST_TRANSACTIONS_SQL = """
+SELECT transactionID, portfolioID, assetID, transactionType,
+       Quantity, pricePerShare, transactionDate
+FROM Transaction
+WHERE 1=1
+"""
+
+INSERT_TRANSACTION_SQL = """
+INSERT INTO Transaction (portfolioID, assetID, transactionType, Quantity, pricePerShare, transactionDate)
+VALUES (%s, %s, %s, %s, %s, %s)
+"""
+INSERT_LOT_SQL = "INSERT INTO TaxLotSelection (sellTransactionID, lotTransactionID, Quantity) VALUES (%s, %s, %s)"
+
 
 @transactions.route("/transactions", methods=["GET"])
 def get_transactions():
     """Get transactions with optional portfolio filter."""
     try:
         current_app.logger.info("Starting get_transactions request")
+        try:
+            page = TRANSACTION_KEYSET.page(request.args)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
         cursor = db.get_db().cursor()
 
         portfolio_id = request.args.get("portfolioID")
-        query = """
-            SELECT transactionID, portfolioID, assetID, transactionType,
-                   quantity, price, transactionDate, notes
-            FROM Transaction
-            WHERE 1=1
-        """
+        query = LIST_TRANSACTIONS_SQL
         params = []
         if portfolio_id:
             query += " AND portfolioID = %s"
             params.append(int(portfolio_id))
 
-        query += " ORDER BY transactionDate DESC"
+        fmt = wants_columnar()
+        if fmt is not None or wants_stream():
+            # Whole result set as Arrow/Parquet or NDJSON, read through a server-side cursor
+            cursor.close()
+            page_sql, page_params = page.clause(limit=False)
+            if fmt is not None:
+                return stream_table(query + page_sql, params + page_params, fmt)
+            return stream_rows(query + page_sql, params + page_params)
+
+        page_sql, page_params = page.clause()
+        query += page_sql
+        params += page_params
 
         current_app.logger.debug(f"Executing query: {query} with params: {params}")
         cursor.execute(query, params)
-        rows = cursor.fetchall()
+        rows, next_cursor = page.finish(cursor.fetchall())
         cursor.close()
 
         current_app.logger.info(f"Successfully retrieved {len(rows)} transactions")
-        return jsonify({"success": True, "data": rows}), 200
+        return jsonify({"success": True, "data": rows, "next_cursor": next_cursor}), 200
     except Error as e:
         current_app.logger.error(f"Database error in get_transactions: {str(e)}")
         return jsonify({
@@ -44,7 +84,24 @@ def get_transactions():
 
 @transactions.route("/transactions", methods=["POST"])
 def create_transaction():
-    """Create a new transaction (buy/sell)."""
+    """
+    Create a new transaction (buy/sell).
+
+    Request body (JSON):
+    - portfolioID (int): The portfolio trading.
+    - assetID (int): The asset traded.
+    - transactionType (str): 'BUY' or 'SELL'.
+    - quantity (int): Shares traded.
+    - price (float): Price per share.
+    - transactionDate (str, optional): Defaults to now.
+    - lots (list, optional): For a SELL under specific-lot accounting, the
+      lots it closes as {"transactionID": <BUY id>, "quantity": n} objects.
+
+    Returns:
+    - JSON: The new transactionID. Only the transaction is recorded; use
+      POST /transaction/trades to update the position with it, or rebuild
+      positions with POST /transaction/ledger/rebuild.
+    """
     try:
         current_app.logger.info("Starting create_transaction request")
         data = request.get_json()
@@ -59,22 +116,27 @@ def create_transaction():
 
         cursor = db.get_db().cursor()
         insert_sql = """
-            INSERT INTO Transaction (portfolioID, assetID, transactionType, quantity, price, transactionDate, notes)
-            VALUES (%s, %s, %s, %s, %s, COALESCE(%s, NOW()), %s)
+            INSERT INTO Transaction (portfolioID, assetID, transactionType, Quantity, pricePerShare, transactionDate)
+            VALUES (%s, %s, %s, %s, %s, COALESCE(%s, NOW()))
         """
         params = (
             int(data["portfolioID"]),
             int(data["assetID"]),
             data["transactionType"],
-            float(data["quantity"]),
+            int(data["quantity"]),
             float(data["price"]),
             data.get("transactionDate"),
-            data.get("notes", "")
         )
         current_app.logger.debug(f"Executing query: {insert_sql} with params: {params}")
         cursor.execute(insert_sql, params)
-        db.get_db().commit()
         new_id = cursor.lastrowid
+        lots = data.get("lots") or []
+        if lots:
+            cursor.executemany(
+                INSERT_LOT_SQL,
+                [(new_id, int(lot["transactionID"]), int(lot["quantity"])) for lot in lots],
+            )
+        db.get_db().commit()
         cursor.close()
 
         current_app.logger.info(f"Successfully created transaction {new_id}")
@@ -82,8 +144,7 @@ def create_transaction():
             "success": True,
             "data": {
                 "message": "Transaction recorded successfully",
-                "transactionID": new_id,
-                "note": "TODO: update positions and cash balances"
+                "transactionID": new_id
             }
         }), 201
     except Error as e:
@@ -95,3 +156,323 @@ def create_transaction():
             "status_code": 500
         }), 500
 
+
+def _parse_transaction(item):
+    # One item of a create_transactions batch: a trade plus optional lots
+    transaction = booking.parse_trade(item)
+    lots = item.get("lots") or []
+    if lots and transaction["transactionType"] != "SELL":
+        raise ValueError("lots may only be given for a SELL")
+    if not isinstance(lots, list):
+        raise ValueError("lots must be a list")
+    try:
+        transaction["lots"] = [(int(lot["transactionID"]), int(lot["quantity"])) for lot in lots]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Each lot must be {"transactionID": <BUY id>, "quantity": n}')
+    return transaction
+
+
+@transactions.route("/transactions:bulk", methods=["POST"])
+def create_transactions():
+    """
+    Record many transactions in one transaction.
+
+    Every item is validated before anything is written; one invalid item
+    rejects the whole batch. Like create_transaction, only the Transaction
+    rows (and tax-lot selections) are written; POST /transaction/trades/batch
+    books trades into positions as well.
+
+    Request body (JSON):
+    - A list of create_transaction bodies (portfolioID, assetID,
+      transactionType, quantity, price, optional transactionDate and lots),
+      or {"transactions": [...]}; at most 5000.
+
+    Returns:
+    - JSON: 201 with one {"index", "transactionID"} result per item in
+      request order and the rows written per second, or 400 listing the
+      invalid items by index.
+    """
+    started = time.perf_counter()
+    try:
+        current_app.logger.info("Starting create_transactions request")
+        try:
+            items = bulk.read_items(request.get_json(silent=True), "transactions")
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
+        parsed, errors = bulk.parse_items(items, _parse_transaction)
+
+        conn = db.get_db()
+        cursor = conn.cursor()
+        bulk.check_exists(cursor, parsed, errors, "portfolioID", "Portfolio", "Portfolio")
+        bulk.check_exists(cursor, parsed, errors, "assetID", "Asset", "Asset")
+        lot_ids = {lot_id for t in parsed if t is not None for lot_id, _ in t["lots"]}
+        if lot_ids:
+            found = bulk.existing(cursor, "Transaction", "transactionID", lot_ids)
+            for index, t in enumerate(parsed):
+                for lot_id, _ in (t["lots"] if t is not None else []):
+                    if lot_id not in found:
+                        errors.append({"index": index, "error": f"Lot transaction not found: {lot_id}"})
+        if errors:
+            cursor.close()
+            return bulk.invalid(errors, len(items))
+
+        # One timestamp for undated rows keeps the INSERT a plain VALUES list
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [
+            (t["portfolioID"], t["assetID"], t["transactionType"], t["quantity"], t["price"],
+             t["transactionDate"] or now)
+            for t in parsed
+        ]
+        new_ids = bulk.insert_many(cursor, INSERT_TRANSACTION_SQL, rows)
+        lots = [
+            (new_id, lot_id, quantity)
+            for new_id, t in zip(new_ids, parsed)
+            for lot_id, quantity in t["lots"]
+        ]
+        if lots:
+            bulk.execute_many(cursor, INSERT_LOT_SQL, lots)
+        conn.commit()
+        cursor.close()
+
+        current_app.logger.info(f"Successfully recorded {len(new_ids)} transactions")
+        return bulk.created(
+            "Transactions recorded successfully",
+            [{"index": index, "transactionID": new_id} for index, new_id in enumerate(new_ids)],
+            started,
+        )
+    except Error as e:
+        db.get_db().rollback()
+        current_app.logger.error(f"Database error in create_transactions: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
+
+
+def _bump_valuations(conn):
+    # The booking procedures commit themselves; publish the change right after
+    cursor = conn.cursor()
+    try:
+        version = valuations.bump(cursor)
+        conn.commit()
+    finally:
+        cursor.close()
+    return version
+
+
+@transactions.route("/trades", methods=["POST"])
+def book_trade():
+    """
+    Book a trade: record the transaction and update the position atomically.
+
+    Portfolio and asset are validated, the Transaction row inserted and the
+    Position upserted (a BUY re-averages AvgCostBasis, a SELL reduces the
+    quantity and closes the position at zero) by one stored-procedure call
+    in a single database transaction.
+
+    Request body (JSON):
+    - portfolioID (int): The portfolio trading.
+    - assetID (int): The asset traded.
+    - transactionType (str): 'BUY' or 'SELL'.
+    - quantity (int): Whole shares traded.
+    - price (float): Price per share.
+    - transactionDate (str, optional): ISO 8601; defaults to now.
+
+    Returns:
+    - JSON: The new transactionID, the positionID and the position's new
+      Quantity and AvgCostBasis; 404 if the portfolio or asset does not
+      exist, 400 for an invalid trade or a SELL larger than the holding.
+    """
+    try:
+        try:
+            trade = booking.parse_trade(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
+        current_app.logger.info(
+            f"Starting book_trade: {trade['transactionType']} {trade['quantity']} of asset "
+            f"{trade['assetID']} in portfolio {trade['portfolioID']}"
+        )
+        result = booking.book_trade(db.get_db(), trade)
+        version = _bump_valuations(db.get_db())
+        closed = result["Quantity"] == 0
+        valuations.on_position(
+            result["portfolioID"],
+            result["assetID"],
+            position_id=result["positionID"],
+            quantity=None if closed else result["Quantity"],
+            cost_basis=None if closed else result["AvgCostBasis"],
+            ticker=result["TickerSymbol"],
+            price=result["CurrentPrice"],
+            version=version,
+        )
+
+        current_app.logger.info(f"Successfully booked transaction {result['transactionID']}")
+        return jsonify({
+            "success": True,
+            "data": {key: result[key] for key in
+                     ("transactionID", "positionID", "portfolioID", "assetID", "Quantity", "AvgCostBasis")}
+        }), 201
+    except Error as e:
+        status = booking.error_status(e)
+        log = current_app.logger.warning if status < 500 else current_app.logger.error
+        log(f"Database error in book_trade: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": e.args[1] if status < 500 else str(e),
+            "status_code": status
+        }), status
+
+
+@transactions.route("/trades/batch", methods=["POST"])
+def book_trades():
+    """
+    Book an order blotter: every trade or none, in one database round trip.
+
+    Trades are applied in order, so one blotter may open and later trim the
+    same position. The first invalid trade rolls the whole blotter back.
+
+    Request body (JSON):
+    - trades (list): Trades as accepted by POST /trades (a bare list is
+      accepted too), at most MAX_BLOTTER_SIZE.
+
+    Returns:
+    - JSON: One result per trade (transactionID, positionID, portfolioID,
+      assetID and the position's Quantity and AvgCostBasis after it); on
+      error the message names the failing trade's 0-based index.
+    """
+    try:
+        data = request.get_json(silent=True)
+        items = data.get("trades") if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                "success": False,
+                "error": "Request body must contain a non-empty 'trades' list",
+                "status_code": 400
+            }), 400
+        if len(items) > booking.MAX_BLOTTER_SIZE:
+            return jsonify({
+                "success": False,
+                "error": f"A blotter holds at most {booking.MAX_BLOTTER_SIZE} trades",
+                "status_code": 400
+            }), 400
+        trades = []
+        for index, item in enumerate(items):
+            try:
+                trades.append(booking.parse_trade(item))
+            except ValueError as e:
+                return jsonify({
+                    "success": False,
+                    "error": f"Trade {index}: {e}",
+                    "status_code": 400
+                }), 400
+
+        current_app.logger.info(f"Starting book_trades with {len(trades)} trades")
+        results = booking.book_trades(db.get_db(), trades)
+        version = _bump_valuations(db.get_db())
+        for portfolio_id in {trade["portfolioID"] for trade in trades}:
+            valuations.invalidate(portfolio_id=portfolio_id, version=version)
+
+        current_app.logger.info(f"Successfully booked {len(results)} trades")
+        return jsonify({"success": True, "data": results}), 201
+    except Error as e:
+        status = booking.error_status(e)
+        log = current_app.logger.warning if status < 500 else current_app.logger.error
+        log(f"Database error in book_trades: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": e.args[1] if status < 500 else str(e),
+            "status_code": status
+        }), status
+
+
+@transactions.route("/ledger/rebuild", methods=["POST"])
+def rebuild_ledger():
+    """
+    Rebuild Position rows by replaying the Transaction ledger.
+
+    Request body (JSON, optional):
+    - portfolioID (int, optional): Rebuild only this portfolio (default: all).
+    - method (str, optional): Lot method for average cost and realized P&L:
+      'fifo' (default), 'lifo' or 'specific'.
+    - full (bool, optional): Replay all history instead of starting from
+      the last checkpoint.
+
+    Returns:
+    - JSON: Transactions replayed and skipped, stale checkpoints, portfolios
+      and positions written, positions deleted and seconds taken.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        method = str(data.get("method", ledger.DEFAULT_METHOD)).lower()
+        if method not in ledger.METHODS:
+            return jsonify({
+                "success": False,
+                "error": f"Invalid lot method: {method}. Use one of {', '.join(ledger.METHODS)}",
+                "status_code": 400
+            }), 400
+        portfolio_id = data.get("portfolioID")
+        portfolio_id = int(portfolio_id) if portfolio_id is not None else None
+        current_app.logger.info(f"Starting rebuild_ledger ({method}, portfolio {portfolio_id or 'all'})")
+
+        stats = ledger.rebuild(db.get_db(), portfolio_id, method, full=bool(data.get("full")))
+        version = stats.pop("valuation_version", None)
+        for rebuilt in stats.pop("portfolio_ids"):
+            valuations.invalidate(portfolio_id=rebuilt, version=version)
+
+        current_app.logger.info(
+            f"Replayed {stats['transactions']} transactions into {stats['portfolios']} portfolios "
+            f"in {stats['seconds']}s"
+        )
+        return jsonify({"success": True, "data": stats}), 200
+    except Error as e:
+        current_app.logger.error(f"Database error in rebuild_ledger: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
+
+
+@transactions.route("/ledger/portfolios/<int:portfolio_id>/lots", methods=["GET"])
+def get_tax_lots(portfolio_id):
+    """
+    Open tax lots and realized P&L of a portfolio, replayed from its ledger.
+
+    Args:
+    - portfolio_id (int): The portfolio.
+
+    Query parameters:
+    - method (str, optional): 'fifo' (default), 'lifo' or 'specific'.
+
+    Returns:
+    - JSON: Realized P&L total and, per asset traded, the net quantity,
+      average cost, realized P&L and open lots (transactionID, acquired,
+      quantity, costBasis).
+    """
+    try:
+        method = request.args.get("method", ledger.DEFAULT_METHOD).lower()
+        if method not in ledger.METHODS:
+            return jsonify({
+                "success": False,
+                "error": f"Invalid lot method: {method}. Use one of {', '.join(ledger.METHODS)}",
+                "status_code": 400
+            }), 400
+        current_app.logger.info(f"Starting get_tax_lots for portfolio {portfolio_id} ({method})")
+        lots = ledger.tax_lots(db.get_db(), portfolio_id, method)
+        return jsonify({"success": True, "data": lots}), 200
+    except Error as e:
+        current_app.logger.error(f"Database error in get_tax_lots: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
@@ -1,9 +1,17 @@
+import time
+
 from flask import Blueprint, jsonify, request, current_app
 from backend.db_connection import db
-from mysql.connector import Error
+from backend.common import bulk
+from pymysql import Error
 
 watchlists = Blueprint("watchlists", __name__)
 
+INSERT_WATCHLIST_ASSET_SQL = """
+INSERT INTO WatchList_Asset (UserID, WatchListID, assetID)
+VALUES (%s, %s, %s)
+"""
+
 
 @watchlists.route("/watchlists", methods=["GET"])
 def get_watchlists():
@@ -86,6 +94,104 @@ def create_watchlist_item():
         }), 500
 
 
+def _parse_watchlist_asset(item):
+    # One item of a create_watchlist_items batch, in WatchList_Asset's columns
+    bulk.require_fields(item, ("UserID", "WatchListID", "assetID"))
+    try:
+        return {
+            "UserID": int(item["UserID"]),
+            "WatchListID": int(item["WatchListID"]),
+            "assetID": int(item["assetID"]),
+        }
+    except (TypeError, ValueError):
+        raise ValueError("UserID, WatchListID and assetID must be integers")
+
+
+@watchlists.route("/watchlists:bulk", methods=["POST"])
+def create_watchlist_items():
+    """
+    Add many assets to watchlists in one transaction.
+
+    Every item is validated before anything is written; one invalid item
+    rejects the whole batch. Assets already on their watchlist are reported
+    with added false and left as they are, so a batch can be re-sent.
+
+    Request body (JSON):
+    - A list of {"UserID", "WatchListID", "assetID"} objects naming an
+      existing WatchList and Asset, or {"watchlists": [...]}; at most 5000.
+
+    Returns:
+    - JSON: 201 with one {"index", "UserID", "WatchListID", "assetID",
+      "added"} result per item in request order and the rows written per
+      second, or 400 listing the invalid items by index.
+    """
+    started = time.perf_counter()
+    try:
+        current_app.logger.info("Starting create_watchlist_items request")
+        try:
+            items = bulk.read_items(request.get_json(silent=True), "watchlists")
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "status_code": 400
+            }), 400
+        parsed, errors = bulk.parse_items(items, _parse_watchlist_asset)
+
+        conn = db.get_db()
+        cursor = conn.cursor()
+        bulk.check_exists(cursor, parsed, errors, "assetID", "Asset", "Asset")
+
+        # Watchlists of the users named and the assets already on them
+        user_ids = sorted({item["UserID"] for item in parsed if item is not None})
+        lists, listed = set(), set()
+        if user_ids:
+            placeholders = ", ".join(["%s"] * len(user_ids))
+            cursor.execute(
+                f"SELECT UserID, WatchListID FROM WatchList WHERE UserID IN ({placeholders})",
+                user_ids
+            )
+            lists = {(row["UserID"], row["WatchListID"]) for row in cursor.fetchall()}
+            cursor.execute(
+                f"SELECT UserID, WatchListID, assetID FROM WatchList_Asset WHERE UserID IN ({placeholders})",
+                user_ids
+            )
+            listed = {(row["UserID"], row["WatchListID"], row["assetID"]) for row in cursor.fetchall()}
+        for index, item in enumerate(parsed):
+            if item is not None and (item["UserID"], item["WatchListID"]) not in lists:
+                errors.append({
+                    "index": index,
+                    "error": f"Watchlist not found: user {item['UserID']}, watchlist {item['WatchListID']}"
+                })
+        if errors:
+            cursor.close()
+            return bulk.invalid(errors, len(items))
+
+        results, rows = [], []
+        for index, item in enumerate(parsed):
+            key = (item["UserID"], item["WatchListID"], item["assetID"])
+            added = key not in listed
+            if added:
+                # Also skips repeats within the batch
+                listed.add(key)
+                rows.append(key)
+            results.append({"index": index, **item, "added": added})
+        bulk.execute_many(cursor, INSERT_WATCHLIST_ASSET_SQL, rows)
+        conn.commit()
+        cursor.close()
+
+        current_app.logger.info(f"Successfully added {len(rows)} assets to watchlists")
+        return bulk.created("Assets added to watchlists", results, started)
+    except Error as e:
+        db.get_db().rollback()
+        current_app.logger.error(f"Database error in create_watchlist_items: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "status_code": 500
+        }), 500
+
+
 @watchlists.route("/watchlists/<int:watchlist_id>", methods=["DELETE"])
 def delete_watchlist_item(watchlist_id):
     """Delete a watchlist item."""
@@ -0,0 +1,37 @@
+"""
+Secondary indexes for the WHERE / ORDER BY patterns used by the routes.
+
+Each index leads with the equality filter (if any) and continues with the
+sort key, ending in the primary key so keyset pagination can seek on it.
+"""
+from backend.db_connection.migrations import ensure_index
+
+# PriceHistory needs no secondary index: get_price_history, backtest price
+# loads and performance snapshots all seek on its (assetID, Date) primary key.
+INDEXES = [
+    # get_transactions, unfiltered and by portfolio
+    ("Transaction", "idx_transaction_date", ("transactionDate", "transactionID")),
+    ("Transaction", "idx_transaction_portfolio_date", ("portfolioID", "transactionDate", "transactionID")),
+    # get_alerts, unfiltered and by portfolio
+    ("Alert", "idx_alert_trigger", ("triggerTime", "AlertID")),
+    ("Alert", "idx_alert_portfolio_trigger", ("portfolioID", "triggerTime", "AlertID")),
+    # get_audit_events, by time range, user and event type
+    ("AuditEvent", "idx_auditevent_time", ("eventTime", "AuditEventID")),
+    ("AuditEvent", "idx_auditevent_user_time", ("UserID", "eventTime", "AuditEventID")),
+    ("AuditEvent", "idx_auditevent_type_time", ("eventType", "eventTime", "AuditEventID")),
+    # get_all_assets, by ticker and by sector
+    ("Asset", "idx_asset_ticker", ("TickerSymbol", "assetID")),
+    ("Asset", "idx_asset_sector_ticker", ("sectorID", "TickerSymbol", "assetID")),
+    # get_all_portfolios, newest first and by owner
+    ("Portfolio", "idx_portfolio_created", ("dateCreated", "portfolioID")),
+    ("Portfolio", "idx_portfolio_user_created", ("userID", "dateCreated", "portfolioID")),
+    # snapshot de-duplication and firm summaries
+    ("PortfolioPerformance", "idx_performance_portfolio_date", ("portfolioID", "calculationDate")),
+    # get_users
+    ("User", "idx_user_name", ("Name",)),
+]
+
+
+def upgrade(cursor):
+    for table, name, columns in INDEXES:
+        ensure_index(cursor, table, name, columns)
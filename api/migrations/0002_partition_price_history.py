@@ -0,0 +1,13 @@
+"""
+Move PriceHistory to the year-partitioned layout clustered on (assetID, Date).
+
+New databases already get this layout from 00_stratify_schema.sql, which
+makes this a no-op. On large existing tables, run
+`python -m backend.prices.partitioning migrate` ahead of the deploy: the copy
+is checkpointed, so startup then only has the final catch-up and swap left.
+"""
+from backend.prices.partitioning import migrate
+
+
+def upgrade(cursor):
+    migrate(cursor.connection)
@@ -0,0 +1,8 @@
+-- Version counters behind the per-worker reference-data caches
+CREATE TABLE IF NOT EXISTS CacheVersion (
+    name VARCHAR(64) NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (name)
+);
+
+INSERT IGNORE INTO CacheVersion (name, version) VALUES ('reference', 0);
@@ -0,0 +1,27 @@
+-- Replay checkpoints and specific-lot selections for the transaction ledger
+CREATE TABLE IF NOT EXISTS LedgerCheckpoint (
+    portfolioID INT NOT NULL,
+    method VARCHAR(10) NOT NULL,
+    lastTransactionDate DATETIME NOT NULL,
+    lastTransactionID INT NOT NULL,
+    transactionCount INT NOT NULL,
+    state LONGTEXT NOT NULL,
+    updatedAt DATETIME NOT NULL,
+    PRIMARY KEY (portfolioID, method),
+    CONSTRAINT fk_ledgercheckpoint_portfolio FOREIGN KEY (portfolioID)
+        REFERENCES Portfolio(portfolioID)
+        ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS TaxLotSelection (
+    sellTransactionID INT NOT NULL,
+    lotTransactionID INT NOT NULL,
+    Quantity INT NOT NULL,
+    PRIMARY KEY (sellTransactionID, lotTransactionID),
+    CONSTRAINT fk_taxlotselection_sell FOREIGN KEY (sellTransactionID)
+        REFERENCES Transaction(transactionID)
+        ON UPDATE CASCADE ON DELETE CASCADE,
+    CONSTRAINT fk_taxlotselection_lot FOREIGN KEY (lotTransactionID)
+        REFERENCES Transaction(transactionID)
+        ON UPDATE CASCADE ON DELETE CASCADE
+);
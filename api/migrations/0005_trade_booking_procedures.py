@@ -0,0 +1,171 @@
+"""
+Stored procedures behind atomic trade booking (backend/transactions/booking.py).
+
+apply_trade validates a trade, inserts its Transaction row and applies it to
+Position: a BUY upserts on unique_portfolio_asset and re-averages the cost
+basis, a SELL reduces the quantity and deletes the position once it is
+closed. book_trade runs one trade and book_trades a JSON blotter of trades,
+each in a single transaction that is rolled back on the first error.
+
+Validation errors are raised with SQLSTATE 45000 and MYSQL_ERRNO 31001 (the
+portfolio or asset does not exist) or 31002 (the trade itself is invalid).
+"""
+
+APPLY_TRADE = """
+CREATE PROCEDURE apply_trade(
+    IN p_portfolio INT, IN p_asset INT, IN p_type VARCHAR(10), IN p_quantity INT,
+    IN p_price DECIMAL(10,2), IN p_date DATETIME,
+    OUT o_transaction INT, OUT o_position INT, OUT o_quantity INT, OUT o_cost DECIMAL(10,2)
+)
+BEGIN
+    DECLARE v_type VARCHAR(10) DEFAULT UPPER(p_type);
+    DECLARE v_held INT DEFAULT NULL;
+    DECLARE v_message VARCHAR(128);
+
+    IF v_type IS NULL OR v_type NOT IN ('BUY', 'SELL') THEN
+        SET v_message = LEFT(CONCAT('Invalid transactionType: ', COALESCE(p_type, 'NULL'), '. Use BUY or SELL'), 128);
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_message, MYSQL_ERRNO = 31002;
+    END IF;
+    IF p_quantity IS NULL OR p_quantity <= 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'quantity must be a positive number of shares', MYSQL_ERRNO = 31002;
+    END IF;
+    IF p_price IS NULL OR p_price < 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'price must not be negative', MYSQL_ERRNO = 31002;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM Portfolio WHERE portfolioID = p_portfolio) THEN
+        SET v_message = LEFT(CONCAT('Portfolio not found: ', COALESCE(p_portfolio, 'NULL')), 128);
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_message, MYSQL_ERRNO = 31001;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM Asset WHERE assetID = p_asset) THEN
+        SET v_message = LEFT(CONCAT('Asset not found: ', COALESCE(p_asset, 'NULL')), 128);
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_message, MYSQL_ERRNO = 31001;
+    END IF;
+
+    -- Locks the position (or the gap it would be inserted into) until commit,
+    -- so concurrent trades of the same holding are applied one at a time
+    SELECT positionID, Quantity INTO o_position, v_held
+    FROM Position
+    WHERE portfolioID = p_portfolio AND assetID = p_asset
+    FOR UPDATE;
+
+    IF v_type = 'SELL' AND COALESCE(v_held, 0) < p_quantity THEN
+        SET v_message = LEFT(CONCAT('Insufficient quantity: portfolio ', p_portfolio, ' holds ',
+                                    COALESCE(v_held, 0), ' of asset ', p_asset), 128);
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_message, MYSQL_ERRNO = 31002;
+    END IF;
+
+    INSERT INTO Transaction (transactionDate, transactionType, Quantity, pricePerShare, portfolioID, assetID)
+    VALUES (COALESCE(p_date, NOW()), v_type, p_quantity, p_price, p_portfolio, p_asset);
+    SET o_transaction = LAST_INSERT_ID();
+
+    IF v_type = 'BUY' THEN
+        INSERT INTO Position (portfolioID, assetID, Quantity, AvgCostBasis)
+        VALUES (p_portfolio, p_asset, p_quantity, p_price) AS new
+        ON DUPLICATE KEY UPDATE
+            AvgCostBasis = ROUND((Position.Quantity * Position.AvgCostBasis + new.Quantity * new.AvgCostBasis)
+                                 / (Position.Quantity + new.Quantity), 2),
+            Quantity = Position.Quantity + new.Quantity;
+        IF o_position IS NULL THEN
+            SET o_position = LAST_INSERT_ID();
+        END IF;
+        SELECT Quantity, AvgCostBasis INTO o_quantity, o_cost FROM Position WHERE positionID = o_position;
+    ELSEIF v_held = p_quantity THEN
+        DELETE FROM Position WHERE positionID = o_position;
+        SET o_quantity = 0;
+    ELSE
+        UPDATE Position SET Quantity = Quantity - p_quantity WHERE positionID = o_position;
+        SELECT Quantity, AvgCostBasis INTO o_quantity, o_cost FROM Position WHERE positionID = o_position;
+    END IF;
+END
+"""
+
+BOOK_TRADE = """
+CREATE PROCEDURE book_trade(
+    IN p_portfolio INT, IN p_asset INT, IN p_type VARCHAR(10), IN p_quantity INT,
+    IN p_price DECIMAL(10,2), IN p_date DATETIME
+)
+BEGIN
+    DECLARE v_transaction INT;
+    DECLARE v_position INT;
+    DECLARE v_quantity INT;
+    DECLARE v_cost DECIMAL(10,2);
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+
+    START TRANSACTION;
+    CALL apply_trade(p_portfolio, p_asset, p_type, p_quantity, p_price, p_date,
+                     v_transaction, v_position, v_quantity, v_cost);
+    COMMIT;
+
+    SELECT v_transaction AS transactionID, v_position AS positionID,
+           p_portfolio AS portfolioID, p_asset AS assetID,
+           v_quantity AS Quantity, v_cost AS AvgCostBasis,
+           a.TickerSymbol, a.CurrentPrice
+    FROM Asset a
+    WHERE a.assetID = p_asset;
+END
+"""
+
+BOOK_TRADES = """
+CREATE PROCEDURE book_trades(IN p_blotter JSON)
+BEGIN
+    DECLARE v_count INT DEFAULT JSON_LENGTH(p_blotter);
+    DECLARE v_index INT DEFAULT 0;
+    DECLARE v_trade JSON;
+    DECLARE v_results JSON DEFAULT JSON_ARRAY();
+    DECLARE v_transaction INT;
+    DECLARE v_position INT;
+    DECLARE v_quantity INT;
+    DECLARE v_cost DECIMAL(10,2);
+    DECLARE v_message VARCHAR(512);
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        GET DIAGNOSTICS CONDITION 1 v_message = MESSAGE_TEXT;
+        ROLLBACK;
+        -- Name the failing trade (0-based, in blotter order)
+        SET v_message = LEFT(CONCAT('Trade ', v_index, ': ', v_message), 128);
+        RESIGNAL SET MESSAGE_TEXT = v_message;
+    END;
+
+    START TRANSACTION;
+    WHILE v_index < v_count DO
+        SET v_trade = JSON_EXTRACT(p_blotter, CONCAT('$[', v_index, ']'));
+        CALL apply_trade(
+            JSON_VALUE(v_trade, '$.portfolioID' RETURNING SIGNED),
+            JSON_VALUE(v_trade, '$.assetID' RETURNING SIGNED),
+            JSON_VALUE(v_trade, '$.transactionType'),
+            JSON_VALUE(v_trade, '$.quantity' RETURNING SIGNED),
+            JSON_VALUE(v_trade, '$.price' RETURNING DECIMAL(10,2)),
+            JSON_VALUE(v_trade, '$.transactionDate' RETURNING DATETIME),
+            v_transaction, v_position, v_quantity, v_cost
+        );
+        SET v_results = JSON_ARRAY_APPEND(v_results, '$', JSON_OBJECT(
+            'transactionID', v_transaction,
+            'positionID', v_position,
+            'portfolioID', JSON_VALUE(v_trade, '$.portfolioID' RETURNING SIGNED),
+            'assetID', JSON_VALUE(v_trade, '$.assetID' RETURNING SIGNED),
+            'Quantity', v_quantity,
+            'AvgCostBasis', v_cost
+        ));
+        SET v_index = v_index + 1;
+    END WHILE;
+    COMMIT;
+
+    SELECT v_results AS trades;
+END
+"""
+
+PROCEDURES = [
+    ("apply_trade", APPLY_TRADE),
+    ("book_trade", BOOK_TRADE),
+    ("book_trades", BOOK_TRADES),
+]
+
+
+def upgrade(cursor):
+    for name, body in PROCEDURES:
+        cursor.execute(f"DROP PROCEDURE IF EXISTS {name}")
+        cursor.execute(body)
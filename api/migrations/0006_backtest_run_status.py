@@ -0,0 +1,27 @@
+"""
+Record the outcome of queued backtest runs on the Backtest row.
+
+runStatus (queued/running/done/failed) and runError are written by the
+job worker, so every API process, and any process after a restart, can
+report a run's status instead of only the one that ran it. Rows created
+before this migration keep NULL and are reported as unknown.
+"""
+
+COLUMNS = [
+    ("runStatus", "VARCHAR(10) NULL"),
+    ("runError", "TEXT NULL"),
+]
+
+
+def upgrade(cursor):
+    cursor.execute(
+        """
+        SELECT COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Backtest'
+        """
+    )
+    existing = {row["COLUMN_NAME"].lower() for row in cursor.fetchall()}
+    for column, definition in COLUMNS:
+        # New databases already get these columns from 00_stratify_schema.sql
+        if column.lower() not in existing:
+            cursor.execute(f"ALTER TABLE Backtest ADD COLUMN {column} {definition}")
@@ -0,0 +1,91 @@
+# Conditional GETs against the API.
+#
+# Streamlit reruns a page's whole script on every widget interaction, so the
+# same GETs repeat constantly. get() remembers each 200 response together
+# with its ETag and revalidates it with If-None-Match; when the API answers
+# 304 Not Modified the remembered response is returned instead.
+#
+# get_frame() fetches a table as an Apache Arrow IPC stream from endpoints
+# that support it and reads it straight into a DataFrame.
+import json
+import threading
+
+import pandas as pd
+import requests
+
+try:
+    import pyarrow as pa
+except ImportError:  # get_frame() falls back to JSON
+    pa = None
+
+MAX_ENTRIES = 256
+
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+_responses = {}
+_lock = threading.Lock()
+
+
+def get(url, params=None, **kwargs):
+    """
+    Drop-in replacement for requests.get() that revalidates remembered responses.
+
+    Returns:
+    - requests.Response: The new response, or the remembered 200 response
+      when the API answered 304.
+    """
+    headers = dict(kwargs.pop("headers", None) or {})
+    key = (url, tuple(sorted((params or {}).items())), headers.get("Accept"))
+    with _lock:
+        cached = _responses.get(key)
+
+    if cached is not None:
+        headers["If-None-Match"] = cached.headers["ETag"]
+    response = requests.get(url, params=params, headers=headers, **kwargs)
+
+    if response.status_code == 304 and cached is not None:
+        return cached
+    if response.status_code == 200 and "ETag" in response.headers:
+        with _lock:
+            if key not in _responses and len(_responses) >= MAX_ENTRIES:
+                _responses.pop(next(iter(_responses)))
+            _responses[key] = response
+    return response
+
+
+def get_frame(url, params=None, **kwargs):
+    """
+    GET a table as a DataFrame, as an Arrow IPC stream when the API supports it.
+
+    The Arrow body is read in place (no per-value decoding) and the schema
+    metadata the API attaches, e.g. a backtest's metrics, is decoded into
+    frame.attrs. A JSON reply is accepted too: its "data" rows become the
+    frame and the other top-level keys go into frame.attrs.
+
+    Returns:
+    - pandas.DataFrame: The table.
+
+    Raises:
+    - requests.HTTPError: If the API did not answer 200.
+    """
+    headers = dict(kwargs.pop("headers", None) or {})
+    if pa is not None:
+        headers["Accept"] = f"{ARROW_MIMETYPE}, application/json;q=0.5"
+    response = get(url, params=params, headers=headers, **kwargs)
+    if response.status_code != 200:
+        raise requests.HTTPError(f"{response.status_code} from {url}", response=response)
+
+    if response.headers.get("Content-Type", "").startswith(ARROW_MIMETYPE):
+        table = pa.ipc.open_stream(pa.py_buffer(response.content)).read_all()
+        metadata = table.schema.metadata or {}
+        frame = table.to_pandas(date_as_object=False, split_blocks=True, self_destruct=True)
+        frame.attrs = {
+            key.decode(): json.loads(value)
+            for key, value in metadata.items() if key != b"pandas"
+        }
+        return frame
+
+    payload = response.json()
+    frame = pd.DataFrame(payload.get("data") or [])
+    frame.attrs = {key: value for key, value in payload.items() if key != "data"}
+    return frame
@@ -11,6 +11,7 @@ import plotly.express as px
 sys.path.append("..")
 from stratify_theme import apply_stratify_theme
 from modules.nav import SideBarLinks
+from modules import api_client
 
 apply_stratify_theme()
 SideBarLinks()
@@ -54,17 +55,22 @@ st.markdown(
 )
 # FETCH DATA
 
-# In a real app, we'd pass the ID via query params or session state
-backtest_id = "BT-1001" 
+# The dashboard stores the selected backtest in session state
+backtest_id = st.session_state.get("backtest_id", 1)
 
+results_url = f"http://web-api:4000/backtest/results/{backtest_id}"
 try:
-    # Fetch from our new backend route
-    response = requests.get(f"http://web-api:4000/backtest/results/{backtest_id}")
-    if response.status_code == 200:
-        data = response.json()
-    else:
-        st.error("Failed to fetch backtest data.Try again")
-        data = None
+    # Equity curve as an Arrow table; the metrics and trade log ride along in
+    # its attrs, so the backtest is run once per page load
+    df_curve = api_client.get_frame(results_url, params={"frame": "equity"})
+    data = df_curve.attrs
+    if "equity_curve" in data:
+        # The API answered with the JSON report
+        df_curve = pd.DataFrame({"date": data["dates"], "equity": data["equity_curve"]})
+    df_trades = pd.DataFrame(data.get("trades") or [])
+except requests.HTTPError:
+    st.error("Failed to fetch backtest data.Try again")
+    data = None
 except:
     st.error("Backend connection failed. Using mock data.")
     data = None
@@ -86,10 +92,7 @@ if data:
 
     st.markdown("### 📈 Equity Curve")
     
-    df_curve = pd.DataFrame({
-        "Date": data['dates'],
-        "Equity": data['equity_curve']
-    })
+    df_curve = df_curve.rename(columns={"date": "Date", "equity": "Equity"})
     
     fig = px.line(df_curve, x="Date", y="Equity", template="plotly_dark")
     fig.update_traces(line_color='#3b82f6', line_width=3)
@@ -99,7 +102,6 @@ if data:
 
     st.markdown("### 📝 Trade Log")
     
-    df_trades = pd.DataFrame(data['trades'])
     st.dataframe(df_trades, use_container_width=True, hide_index=True)
 
     st.markdown("<br>", unsafe_allow_html=True)
@@ -17,6 +17,7 @@ st.set_page_config(
 )
 
 from modules.nav import SideBarLinks
+from modules import api_client
 from stratify_theme import apply_stratify_theme
 
 apply_stratify_theme()
@@ -74,16 +75,16 @@ st.markdown(
 # FETCH DATA
 
 config_data = {}
-logs_data = []
+metrics_data = {}
 
 try:
-    config_res = requests.get("http://web-api:4000/system/config")
+    config_res = api_client.get("http://web-api:4000/system/config")
     if config_res.status_code == 200:
         config_data = config_res.json()
         
-    logs_res = requests.get("http://web-api:4000/system/logs")
-    if logs_res.status_code == 200:
-        logs_data = logs_res.json()
+    metrics_res = requests.get("http://web-api:4000/system/metrics/summary", timeout=3)
+    if metrics_res.status_code == 200:
+        metrics_data = metrics_res.json().get("data", {})
 except:
     st.error("Backend connection failed. Using mock data.")
     config_data = {
@@ -160,7 +161,7 @@ with c2:
     st.markdown('</div>', unsafe_allow_html=True)
 # USER MANAGEMENT & ALERTS
 st.markdown("---")
-tab1, tab2, tab3 = st.tabs(["User Management", "Alert Configuration", "System Logs"])
+tab1, tab2, tab3 = st.tabs(["User Management", "Alert Configuration", "API Performance"])
 
 with tab1:
     st.markdown("### 👥 User Management")
@@ -304,23 +305,40 @@ with tab2:
                 st.warning(f"Could not connect to API: {str(e)}. Alert may not be saved.")
 
 with tab3:
-    st.markdown("### 📜 Recent System Logs")
+    st.markdown("### ⏱️ API Performance")
 
-    if logs_data:
-        df_logs = pd.DataFrame(logs_data)
+    blueprints = metrics_data.get("blueprints", [])
+    pool = metrics_data.get("pool", {})
+    if pool:
+        p1, p2, p3, p4 = st.columns(4)
+        p1.metric("Pool In Use", f"{pool.get('in_use', 0)} / {pool.get('max_size', 0)}")
+        p2.metric("Idle Connections", pool.get("idle", 0))
+        p3.metric("Avg Pool Wait", f"{pool.get('wait_ms_avg', 0.0):.2f} ms")
+        p4.metric("Pool Timeouts", pool.get("timeouts", 0))
+
+    if blueprints:
+        df_metrics = pd.DataFrame(blueprints)
         st.dataframe(
-            df_logs,
+            df_metrics,
             use_container_width=True,
             hide_index=True,
             column_config={
-                "timestamp": "Time",
-                "level": "Level",
-                "source": "Source",
-                "message": "Message"
+                "blueprint": "Blueprint",
+                "requests": "Requests",
+                "errors": "5xx",
+                "p50_ms": st.column_config.NumberColumn("p50 (ms)", format="%.1f"),
+                "p95_ms": st.column_config.NumberColumn("p95 (ms)", format="%.1f"),
+                "p99_ms": st.column_config.NumberColumn("p99 (ms)", format="%.1f"),
+                "avg_db_ms": st.column_config.NumberColumn("Avg DB (ms)", format="%.1f"),
+                "avg_serialize_ms": st.column_config.NumberColumn("Avg Encode (ms)", format="%.1f"),
+                "avg_pool_wait_ms": st.column_config.NumberColumn("Avg Pool Wait (ms)", format="%.2f"),
+                "rows": "Rows Fetched",
+                "response_bytes": "Bytes Sent",
             }
         )
+        st.caption("Percentiles cover each blueprint's most recent requests since the API process started.")
     else:
-        st.info("No logs available.")
+        st.info("No requests recorded yet.")
 # FOOTER
 
 st.markdown("<br><br>", unsafe_allow_html=True)
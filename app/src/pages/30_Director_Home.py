@@ -5,7 +5,6 @@
 import sys
 import streamlit as st
 import pandas as pd
-import requests
 
 sys.path.append("..")
 from stratify_loader import show_stratify_loader  # noqa: E402
@@ -17,6 +16,7 @@ st.set_page_config(
 )
 
 from modules.nav import SideBarLinks
+from modules import api_client
 from stratify_theme import apply_stratify_theme
 
 apply_stratify_theme()
@@ -82,15 +82,15 @@ alerts_data = []
 activity_data = {}
 
 try:
-    summary_res = requests.get("http://web-api:4000/director/summary")
+    summary_res = api_client.get("http://web-api:4000/director/summary")
     if summary_res.status_code == 200:
         summary_data = summary_res.json()
         
-    alerts_res = requests.get("http://web-api:4000/director/alerts")
+    alerts_res = api_client.get("http://web-api:4000/director/alerts")
     if alerts_res.status_code == 200:
         alerts_data = alerts_res.json()
         
-    activity_res = requests.get("http://web-api:4000/director/activity")
+    activity_res = api_client.get("http://web-api:4000/director/activity")
     if activity_res.status_code == 200:
         activity_data = activity_res.json()
 except:
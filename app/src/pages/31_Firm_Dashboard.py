@@ -5,12 +5,12 @@
 import sys
 import streamlit as st
 import pandas as pd
-import requests
 import plotly.express as px
 
 sys.path.append("..")
 from stratify_theme import apply_stratify_theme
 from modules.nav import SideBarLinks
+from modules import api_client
 
 apply_stratify_theme()
 SideBarLinks()
@@ -49,7 +49,7 @@ st.markdown(
 
 # FETCH DATA
 try:
-    response = requests.get("http://web-api:4000/performance/firm/summary")
+    response = api_client.get("http://web-api:4000/performance/firm/summary")
     if response.status_code == 200:
         data = response.json()
     else:
@@ -7,7 +7,8 @@ CREATE TABLE IF NOT EXISTS User (
                                     Name VARCHAR(50) NOT NULL,
                                     Email VARCHAR(50) NOT NULL,
                                     Role VARCHAR(30) NOT NULL,
-                                    PRIMARY KEY (UserID)
+                                    PRIMARY KEY (UserID),
+                                    KEY idx_user_name (Name)
 );
 
 CREATE TABLE IF NOT EXISTS Sector (
@@ -17,6 +18,15 @@ CREATE TABLE IF NOT EXISTS Sector (
                                       PRIMARY KEY (sectorID)
 );
 
+-- Version counters behind the per-worker reference-data caches
+CREATE TABLE IF NOT EXISTS CacheVersion (
+    name VARCHAR(64) NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (name)
+);
+
+INSERT IGNORE INTO CacheVersion (name, version) VALUES ('reference', 0);
+
 CREATE TABLE IF NOT EXISTS AlertRule (
                                          alertRuleID INT AUTO_INCREMENT,
                                          Name VARCHAR(50) NOT NULL,
@@ -78,6 +88,8 @@ CREATE TABLE IF NOT EXISTS Asset (
                                      CurrentPrice DECIMAL(10,2) NOT NULL,
                                      sectorID INT NOT NULL,
                                      PRIMARY KEY (assetID),
+                                     KEY idx_asset_ticker (TickerSymbol, assetID),
+                                     KEY idx_asset_sector_ticker (sectorID, TickerSymbol, assetID),
                                      CONSTRAINT fk_asset_sector FOREIGN KEY (sectorID)
                                          REFERENCES Sector(sectorID)
                                          ON UPDATE CASCADE ON DELETE RESTRICT
@@ -90,6 +102,8 @@ CREATE TABLE IF NOT EXISTS Portfolio (
                                          dateCreated DATETIME NOT NULL,
                                          userID INT NOT NULL,
                                          PRIMARY KEY (portfolioID),
+                                         KEY idx_portfolio_created (dateCreated, portfolioID),
+                                         KEY idx_portfolio_user_created (userID, dateCreated, portfolioID),
                                          CONSTRAINT fk_portfolio_user FOREIGN KEY (userID)
                                              REFERENCES User(UserID)
                                              ON UPDATE CASCADE ON DELETE RESTRICT
@@ -114,6 +128,9 @@ CREATE TABLE IF NOT EXISTS AuditEvent (
                                           resourceID INT NOT NULL,
                                           UserID INT NOT NULL,
                                           PRIMARY KEY (AuditEventID),
+                                          KEY idx_auditevent_time (eventTime, AuditEventID),
+                                          KEY idx_auditevent_user_time (UserID, eventTime, AuditEventID),
+                                          KEY idx_auditevent_type_time (eventType, eventTime, AuditEventID),
                                           CONSTRAINT fk_auditevent_user FOREIGN KEY (UserID)
                                               REFERENCES User(UserID)
                                               ON UPDATE CASCADE ON DELETE RESTRICT
@@ -172,6 +189,8 @@ CREATE TABLE IF NOT EXISTS Transaction (
                                            portfolioID INT NOT NULL,
                                            assetID INT NOT NULL,
                                            PRIMARY KEY (transactionID),
+                                           KEY idx_transaction_date (transactionDate, transactionID),
+                                           KEY idx_transaction_portfolio_date (portfolioID, transactionDate, transactionID),
                                            CONSTRAINT fk_transaction_portfolio FOREIGN KEY (portfolioID)
                                                REFERENCES Portfolio(portfolioID)
                                                ON UPDATE CASCADE ON DELETE RESTRICT,
@@ -180,17 +199,63 @@ CREATE TABLE IF NOT EXISTS Transaction (
                                                ON UPDATE CASCADE ON DELETE RESTRICT
 );
 
+-- Ledger replay state per portfolio and lot method (backend/transactions/ledger.py)
+CREATE TABLE IF NOT EXISTS LedgerCheckpoint (
+                                                portfolioID INT NOT NULL,
+                                                method VARCHAR(10) NOT NULL,
+                                                lastTransactionDate DATETIME NOT NULL,
+                                                lastTransactionID INT NOT NULL,
+                                                transactionCount INT NOT NULL,
+                                                state LONGTEXT NOT NULL,
+                                                updatedAt DATETIME NOT NULL,
+                                                PRIMARY KEY (portfolioID, method),
+                                                CONSTRAINT fk_ledgercheckpoint_portfolio FOREIGN KEY (portfolioID)
+                                                    REFERENCES Portfolio(portfolioID)
+                                                    ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Lots a SELL closes under specific identification
+CREATE TABLE IF NOT EXISTS TaxLotSelection (
+                                               sellTransactionID INT NOT NULL,
+                                               lotTransactionID INT NOT NULL,
+                                               Quantity INT NOT NULL,
+                                               PRIMARY KEY (sellTransactionID, lotTransactionID),
+                                               CONSTRAINT fk_taxlotselection_sell FOREIGN KEY (sellTransactionID)
+                                                   REFERENCES Transaction(transactionID)
+                                                   ON UPDATE CASCADE ON DELETE CASCADE,
+                                               CONSTRAINT fk_taxlotselection_lot FOREIGN KEY (lotTransactionID)
+                                                   REFERENCES Transaction(transactionID)
+                                                   ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Clustered on (assetID, Date) and partitioned by year; partitioned tables
+-- cannot carry foreign keys, so Asset deletes check for price history in the API.
 CREATE TABLE IF NOT EXISTS PriceHistory (
-                                            priceID INT AUTO_INCREMENT,
-                                            Date DATETIME NOT NULL,
+                                            assetID INT NOT NULL,
+                                            Date DATE NOT NULL,
                                             openPrice DECIMAL(10,2) NOT NULL,
+                                            highPrice DECIMAL(10,2) NULL,
+                                            lowPrice DECIMAL(10,2) NULL,
                                             closePrice DECIMAL(10,2) NOT NULL,
+                                            adjClosePrice DECIMAL(10,2) NULL,
                                             Volume BIGINT NOT NULL,
-                                            assetID INT NOT NULL,
-                                            PRIMARY KEY (priceID),
-                                            CONSTRAINT fk_pricehistory_asset FOREIGN KEY (assetID)
-                                                REFERENCES Asset(assetID)
-                                                ON UPDATE CASCADE ON DELETE RESTRICT
+                                            PRIMARY KEY (assetID, Date)
+)
+PARTITION BY RANGE COLUMNS (Date) (
+    PARTITION p2015 VALUES LESS THAN ('2016-01-01'),
+    PARTITION p2016 VALUES LESS THAN ('2017-01-01'),
+    PARTITION p2017 VALUES LESS THAN ('2018-01-01'),
+    PARTITION p2018 VALUES LESS THAN ('2019-01-01'),
+    PARTITION p2019 VALUES LESS THAN ('2020-01-01'),
+    PARTITION p2020 VALUES LESS THAN ('2021-01-01'),
+    PARTITION p2021 VALUES LESS THAN ('2022-01-01'),
+    PARTITION p2022 VALUES LESS THAN ('2023-01-01'),
+    PARTITION p2023 VALUES LESS THAN ('2024-01-01'),
+    PARTITION p2024 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p2025 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p2026 VALUES LESS THAN ('2027-01-01'),
+    PARTITION p2027 VALUES LESS THAN ('2028-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
 );
 
 CREATE TABLE IF NOT EXISTS Alert (
@@ -201,6 +266,8 @@ CREATE TABLE IF NOT EXISTS Alert (
                                      alertRuleID INT NOT NULL,
                                      portfolioID INT,
                                      PRIMARY KEY (AlertID),
+                                     KEY idx_alert_trigger (triggerTime, AlertID),
+                                     KEY idx_alert_portfolio_trigger (portfolioID, triggerTime, AlertID),
                                      CONSTRAINT fk_alert_alertrule FOREIGN KEY (alertRuleID)
                                          REFERENCES AlertRule(alertRuleID)
                                          ON UPDATE CASCADE ON DELETE RESTRICT,
@@ -216,6 +283,7 @@ CREATE TABLE IF NOT EXISTS PortfolioPerformance (
                                                     calculationDate DATETIME NOT NULL,
                                                     totalReturn DECIMAL(10,2) NOT NULL,
                                                     PRIMARY KEY (portfolioID, performanceID),
+                                                    KEY idx_performance_portfolio_date (portfolioID, calculationDate),
                                                     CONSTRAINT fk_portfolioperformance_portfolio FOREIGN KEY (portfolioID)
                                                         REFERENCES Portfolio(portfolioID)
                                                         ON UPDATE CASCADE ON DELETE CASCADE
@@ -331,6 +399,8 @@ CREATE TABLE IF NOT EXISTS Backtest (
                                         finalValue DECIMAL(15,2) NOT NULL,
                                         portfolioID INT NOT NULL,
                                         strategyID INT NOT NULL,
+                                        runStatus VARCHAR(10) NULL,
+                                        runError TEXT NULL,
                                         PRIMARY KEY (backtestID),
                                         CONSTRAINT fk_backtest_portfolio FOREIGN KEY (portfolioID)
                                             REFERENCES Portfolio(portfolioID)
@@ -0,0 +1,36 @@
+#!/bin/bash
+# Seeds the db-replica container from the primary (service "db") and starts
+# GTID replication. Sourced by the MySQL image's entrypoint on the replica's
+# first start only (an empty mysql_replica_data volume); to re-seed, remove
+# that volume.
+set -e
+
+SOURCE_HOST="${REPLICA_SOURCE_HOST:-db}"
+SCHEMA="${DB_NAME:-stratify}"
+
+# The primary accepts connections only after its own init scripts have run
+echo "setup-replica: waiting for ${SOURCE_HOST}"
+until mysql -h "$SOURCE_HOST" -uroot -p"$MYSQL_ROOT_PASSWORD" -e "SELECT 1" >/dev/null 2>&1; do
+	sleep 2
+done
+
+# Start from an empty GTID history so the dump's gtid_purged can be applied
+docker_process_sql <<<"RESET BINARY LOGS AND GTIDS;"
+
+echo "setup-replica: copying ${SCHEMA} from ${SOURCE_HOST}"
+mysqldump -h "$SOURCE_HOST" -uroot -p"$MYSQL_ROOT_PASSWORD" \
+	--databases "$SCHEMA" --single-transaction --set-gtid-purged=ON \
+	--routines --triggers --events \
+	| docker_process_sql
+
+docker_process_sql <<-EOSQL
+	CHANGE REPLICATION SOURCE TO
+		SOURCE_HOST='${SOURCE_HOST}',
+		SOURCE_USER='root',
+		SOURCE_PASSWORD='${MYSQL_ROOT_PASSWORD}',
+		SOURCE_AUTO_POSITION=1,
+		GET_SOURCE_PUBLIC_KEY=1;
+	START REPLICA;
+	SET PERSIST super_read_only = ON;
+EOSQL
+echo "setup-replica: replicating from ${SOURCE_HOST}"
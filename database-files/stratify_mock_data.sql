@@ -414,7 +414,8 @@ INSERT INTO Transaction (transactionDate, transactionType, Quantity, pricePerSha
 ('2024-02-25 15:44:00', 'SELL', 11, 117.24, 19, 39);
 
 
-INSERT INTO PriceHistory (Date, openPrice, closePrice, Volume, assetID) VALUES
+-- PriceHistory is keyed on (assetID, Date); IGNORE keeps the first bar of any repeated day
+INSERT IGNORE INTO PriceHistory (Date, openPrice, closePrice, Volume, assetID) VALUES
 
 ('2024-02-26 09:30:00', 29.84, 28.7, 52983691, 30),
 ('2024-03-21 09:30:00', 420.8, 423.64, 74903018, 24),